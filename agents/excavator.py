@@ -1,10 +1,21 @@
 import os
+import time
 from git import Repo
 from typing import Dict, List, Any, Optional
 from collections import Counter
-from tools.git_tool import get_commits, get_file_changes
+from memory.cache_paths import repo_cache_dir
+from memory.commit_cache import CommitCache
+from tools.blob_reader import get_blob_reader
+from tools.commit_table import CommitTable
+from tools.dependency_history import DependencyHistory
+from tools.embedding_pipeline import EmbeddingPipeline, prioritize_files
+from tools.file_discovery import discover_files
+from tools.file_metrics import FileMetricsEngine, language_of, summarize_metrics
 from tools.file_tool import read_file_safe
-from tools.rag_tool import embed_and_store
+from tools.hotspots import HotspotEngine
+from tools.ownership import OwnershipEngine, summarize_ownership
+from tools.refactors import detect_refactors, load_episodes, save_episodes
+from tools.symbol_index import SymbolIndex
 
 
 class ExcavatorAgent:
@@ -13,217 +24,243 @@ class ExcavatorAgent:
     reads files, and prepares structured data for downstream agents.
     """
 
-    def __init__(self, repo_path: str, vector_store: Optional[Any] = None):
+    def __init__(self, repo_path: str, vector_store: Optional[Any] = None, recent_commits: int = 100,
+                 max_embed_files: Optional[int] = None, embed_batch_size: int = 128):
         self.repo_path = repo_path
         self.vector_store = vector_store
+        self.recent_commits = recent_commits
+        self.max_embed_files = max_embed_files
+        self.embed_batch_size = embed_batch_size
         try:
             self.repo = Repo(repo_path)
         except Exception as e:
             print(f"[Excavator] Warning: Could not initialize repo: {e}")
             self.repo = None
+        self.commit_cache = None
+        self.hotspot_engine: Optional[HotspotEngine] = None
 
     def run(self) -> Dict[str, Any]:
         """Main function to extract codebase + commit history."""
         print("[Excavator] Starting excavation...")
 
-        commits = self._get_commits_summary()
+        history = self._sync_history()
+        commits = history.table(self.recent_commits) if history else CommitTable.empty()
+        history_stats = history.stats() if history else {}
         code_files = self._collect_code_files()
         file_metrics = self._analyze_files(code_files)
-        hotspots = self._identify_hotspots(commits)
+        ownership = self._analyze_ownership()
+        hotspots = self._identify_hotspots(history)
+        hotspot_details = self._hotspot_details()
+        refactor_episodes = self._refactor_episodes(history)
+        dependency_events = self._dependency_history()
+        self._update_symbol_index()
         language_breakdown = self._language_breakdown(code_files)
 
-        # Store key file samples for RAG (not all files to avoid memory overload)
+        # Store files and chunks for RAG, key files first
         self._embed_key_files(code_files)
 
-        print(f"[Excavator] Found {len(commits)} commits, {len(code_files)} files, {len(hotspots)} hotspots")
+        print(f"[Excavator] Found {history_stats.get('total_commits', 0)} commits, {len(code_files)} files, {len(hotspots)} hotspots")
         return {
+            "repo_id": self.repo_path if history else None,
             "commits": commits,
+            "history_stats": history_stats,
             "files_count": len(code_files),
             "file_metrics": file_metrics,
+            "ownership": ownership,
             "hotspots": hotspots,
+            "hotspot_details": hotspot_details,
+            "refactor_episodes": refactor_episodes,
+            "dependency_events": dependency_events,
             "language_breakdown": language_breakdown,
             "sample_files": code_files[:10]  # Show first 10 files as samples
         }
 
     def _collect_code_files(self) -> List[str]:
-        """Return list of source code files only."""
-        extensions = (".py", ".js", ".ts", ".java", ".md")
-        code_files = []
-
-        for root, _, files in os.walk(self.repo_path):
-            for f in files:
-                if f.endswith(extensions):
-                    rel_path = os.path.relpath(os.path.join(root, f), self.repo_path)
-                    code_files.append(rel_path)
-
+        """Return source code files only, from the git index or an ignore-aware walk."""
+        start = time.perf_counter()
+        code_files = list(discover_files(self.repo_path))
+        print(f"[Excavator] Discovered {len(code_files)} code files in {time.perf_counter() - start:.2f}s")
         return code_files
 
-    def _get_commits_summary(self) -> List[Dict[str, Any]]:
-        """Extract and summarize commit history."""
+    def _sync_history(self) -> Optional[CommitCache]:
+        """Bring the on-disk commit cache up to date with HEAD.
+
+        Only commits that are not cached yet are streamed from git, so the
+        cost of a run is proportional to the new commits, not the history.
+        """
         if not self.repo:
-            return []
-        
+            return None
+
         try:
-            commits = list(self.repo.iter_commits())
-            return [
-                {
-                    "hash": c.hexsha[:7],
-                    "author": c.author.name,
-                    "date": c.committed_datetime.isoformat(),
-                    "message": c.message.strip().split('\n')[0],
-                    "files_changed": len(c.stats.files)
-                }
-                for c in commits[:100]  # Last 100 commits for analysis
-            ]
+            if self.commit_cache is None:
+                self.commit_cache = CommitCache(self.repo_path)
+            new_commits = self.commit_cache.update_from_git(self.repo_path)
+            print(f"[Excavator] Ingested {new_commits} new commits into the commit cache")
+            return self.commit_cache
         except Exception as e:
             print(f"[Excavator] Error getting commits: {e}")
-            return []
+            return None
 
-    def _identify_hotspots(self, commits: List[Dict[str, Any]]) -> Dict[str, int]:
-        """Find most frequently modified files (hotspots)."""
+    def _dependency_history(self) -> Optional[List[Dict[str, Any]]]:
+        """Dependency added/removed/upgraded events from manifest diffs, oldest first.
+
+        The events are persisted with the HEAD they cover; later runs only
+        walk the manifest changes since then.
+        """
         if not self.repo:
-            return {}
-        
+            return None
+        try:
+            start = time.perf_counter()
+            path = os.path.join(repo_cache_dir(self.repo_path), "dependency_history.json")
+            history = DependencyHistory.load(path)
+            old_head = history.head
+            new_events = history.update(self.repo_path)
+            if history.head != old_head:
+                history.save(path)
+            events = [{**e._asdict(), "summary": e.describe()} for e in history.events]
+            print(f"[Excavator] Found {len(events)} dependency changes ({new_events} new) "
+                  f"in {time.perf_counter() - start:.2f}s")
+            return events
+        except Exception as e:
+            print(f"[Excavator] Error reading dependency history: {e}")
+            return None
+
+    def _refactor_episodes(self, history: Optional[CommitCache]) -> Optional[List[Dict[str, Any]]]:
+        """Structural refactor episodes (moves, renames, balanced churn) over the full history.
+
+        The episodes are persisted with the HEAD they were computed at and
+        reused while HEAD is unchanged.
+        """
+        if not history:
+            return None
         try:
-            file_change_count = Counter()
-            for commit in commits:
-                try:
-                    c = self.repo.commit(commit["hash"])
-                    for file_path in c.stats.files.keys():
-                        file_change_count[file_path] += 1
-                except Exception:
-                    pass
-            return dict(file_change_count.most_common(15))  # Top 15 hotspots
+            start = time.perf_counter()
+            path = os.path.join(history.cache_dir, "refactors.json")
+            episodes = load_episodes(path, history.head)
+            if episodes is None:
+                episodes = detect_refactors(history.iter_records())
+                save_episodes(path, history.head, episodes)
+            print(f"[Excavator] Found {len(episodes)} refactor episodes in {time.perf_counter() - start:.2f}s")
+            return [{**e._asdict(), "summary": e.describe()} for e in episodes]
         except Exception as e:
-            print(f"[Excavator] Error identifying hotspots: {e}")
+            print(f"[Excavator] Error detecting refactors: {e}")
+            return None
+
+    def _update_symbol_index(self):
+        """Index which commits shaped each top-level function and class; only new commits are walked."""
+        if not self.repo:
+            return
+        start = time.perf_counter()
+        index = None
+        try:
+            index = SymbolIndex(self.repo_path)
+            walked = index.update()
+            print(f"[Excavator] Symbol index updated with {walked} commits in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            print(f"[Excavator] Error updating symbol index: {e}")
+        finally:
+            if index is not None:
+                index.close()
+
+    def _identify_hotspots(self, history: Optional[CommitCache]) -> Dict[str, float]:
+        """Rank files by time-decayed line churn over the full history."""
+        if not history:
             return {}
+        try:
+            self.hotspot_engine = self._load_hotspot_engine(history)
+        except Exception as e:
+            print(f"[Excavator] Error building hotspot engine: {e}")
+            return history.top_paths(15)
+        return {h["path"]: h["churn"] for h in self.hotspot_engine.top_hotspots(15)}  # Top 15 hotspots
+
+    def _load_hotspot_engine(self, history: CommitCache) -> HotspotEngine:
+        """Reuse the persisted engine while HEAD is unchanged, else rebuild it in one pass."""
+        directory = os.path.join(history.cache_dir, "hotspots")
+        engine = HotspotEngine.load(directory)
+        if engine is not None and engine.head == history.head:
+            return engine
+        start = time.perf_counter()
+        engine = HotspotEngine.build(history.iter_records())
+        engine.head = history.head
+        engine.save(directory)
+        print(f"[Excavator] Built hotspot engine over {len(engine)} files in {time.perf_counter() - start:.2f}s")
+        return engine
+
+    def _hotspot_details(self, limit: int = 15, coupled: int = 3) -> List[Dict[str, Any]]:
+        """Per-hotspot churn, ownership spread and the files most often changed with it."""
+        if self.hotspot_engine is None:
+            return []
+        details = self.hotspot_engine.top_hotspots(limit)
+        for detail in details:
+            detail["coupled_with"] = self.hotspot_engine.coupled_files(detail["path"], coupled)
+        return details
 
     def _language_breakdown(self, code_files: List[str]) -> Dict[str, int]:
         """Analyze programming language distribution."""
-        ext_map = {
-            '.py': 'Python',
-            '.js': 'JavaScript',
-            '.ts': 'TypeScript',
-            '.java': 'Java',
-            '.md': 'Markdown',
-            '.json': 'JSON',
-            '.yaml': 'YAML',
-            '.xml': 'XML',
-            '.go': 'Go',
-            '.rs': 'Rust',
-        }
-        
-        lang_count = Counter()
-        for f in code_files:
-            ext = os.path.splitext(f)[1].lower()
-            lang = ext_map.get(ext, 'Other')
-            lang_count[lang] += 1
-        
-        return dict(lang_count.most_common())
+        return dict(Counter(language_of(f) for f in code_files).most_common())
 
     def _analyze_files(self, code_files: List[str]) -> Dict[str, Any]:
-        """Analyze file statistics."""
-        total_lines = 0
-        largest_files = []
-        
-        for f in code_files[:50]:  # Sample first 50 files
-            try:
-                content = read_file_safe(os.path.join(self.repo_path, f))
-                if content:
-                    lines = len(content.split('\n'))
-                    total_lines += lines
-                    largest_files.append((f, lines))
-            except Exception:
-                pass
-        
-        largest_files.sort(key=lambda x: x[1], reverse=True)
-        
-        return {
-            "total_files": len(code_files),
-            "estimated_total_lines": total_lines * (len(code_files) / max(50, len(code_files))),
-            "largest_files": largest_files[:5]
-        }
+        """Exact line/byte/comment statistics for every file, cached per blob."""
+        start = time.perf_counter()
+        engine = FileMetricsEngine(self.repo_path)
+        try:
+            metrics = engine.measure(code_files)
+        except Exception as e:
+            print(f"[Excavator] Error measuring files: {e}")
+            metrics = []
+        finally:
+            engine.close()
+        print(f"[Excavator] Measured {len(metrics)} files in {time.perf_counter() - start:.2f}s")
+        return summarize_metrics(metrics)
+
+    def _analyze_ownership(self) -> Dict[str, Any]:
+        """Surviving lines per author and directory from blame, re-blaming only changed files."""
+        if not self.repo:
+            return {}
+        start = time.perf_counter()
+        engine = OwnershipEngine(self.repo_path)
+        try:
+            table = engine.measure()
+        except Exception as e:
+            print(f"[Excavator] Error computing ownership: {e}")
+            return {}
+        finally:
+            engine.close()
+        print(f"[Excavator] Computed ownership of {table.files} files in {time.perf_counter() - start:.2f}s")
+        return summarize_ownership(table)
+
+    def _head_reader(self):
+        """Read files as committed at HEAD from the object store; untracked files come from the work tree."""
+        if not self.repo:
+            return None
+        reader = get_blob_reader(self.repo_path)
+
+        def read(path: str) -> Optional[str]:
+            data = reader.read("HEAD", path)
+            if data is None:
+                return read_file_safe(os.path.join(self.repo_path, path))
+            return data.decode("utf-8", errors="ignore")
+        return read
 
     def _embed_key_files(self, code_files: List[str]):
-        """Embed key files and code chunks for RAG-based Q&A."""
+        """Embed files and code chunks for RAG-based Q&A through the batched pipeline."""
         if not self.vector_store:
             return
         
         print(f"[Excavator] Embedding code files for RAG context...")
-        embedded = 0
-        
-        # Strategy: embed top 50 files by size/importance
-        files_to_embed = []
-        
-        # Priority 1: README, docs, config
-        key_patterns = ('README', 'setup.py', 'main.py', 'index.', 'app.', 'package.json', 'requirements', 'config')
-        for f in code_files:
-            if any(pattern.lower() in f.lower() for pattern in key_patterns):
-                files_to_embed.append(f)
-        
-        # Priority 2: Add more Python files if we have room
-        for f in code_files:
-            if f.endswith('.py') and len(files_to_embed) < 40:
-                files_to_embed.append(f)
-        
-        # Remove duplicates while preserving order
-        files_to_embed = list(dict.fromkeys(files_to_embed))[:40]
-        
-        for f in files_to_embed:
-            try:
-                full_path = os.path.join(self.repo_path, f)
-                content = read_file_safe(full_path)
-                
-                if not content:
-                    continue
-                
-                # Skip massive files
-                if len(content) > 100000:
-                    content = content[:100000]
-                
-                # Store full file content
-                file_doc = f"# File: {f}\n\n{content}"
-                embed_and_store(file_doc, metadata={"filename": f, "type": "file"}, store=self.vector_store)
-                embedded += 1
-                
-                # Also store chunks for better retrieval
-                for chunk in self._chunk_code(content, f):
-                    embed_and_store(chunk, metadata={"filename": f, "type": "chunk"}, store=self.vector_store)
-                    
-            except Exception as e:
-                pass  # Silent fail on individual files
-        
-        print(f"[Excavator] Embedded {embedded} files into RAG vector store")
-
-    def _chunk_code(self, content: str, filename: str, chunk_size: int = 1000) -> List[str]:
-        """Split code into semantically meaningful chunks."""
-        chunks = []
-        lines = content.split('\n')
-        current_chunk = []
-        
-        for i, line in enumerate(lines):
-            current_chunk.append(line)
-            
-            # Check if we should break at this line
-            should_break = False
-            
-            # Break on class/function definitions (Python)
-            if any(keyword in line for keyword in ['def ', 'class ', 'async def ', '@']):
-                if current_chunk and len('\n'.join(current_chunk)) > 100:
-                    should_break = True
-            
-            # Break when chunk gets large enough
-            if len('\n'.join(current_chunk)) > chunk_size:
-                should_break = True
-            
-            if should_break and current_chunk:
-                chunk_text = f"### {filename} ###\n" + '\n'.join(current_chunk)
-                chunks.append(chunk_text)
-                current_chunk = []
-        
-        # Add remaining content
-        if current_chunk:
-            chunk_text = f"### {filename} ###\n" + '\n'.join(current_chunk)
-            chunks.append(chunk_text)
+        files_to_embed = prioritize_files(code_files, self.max_embed_files)
+        file_metadata = {}
+        if self.commit_cache is not None:
+            file_metadata = {
+                path: {"commit": sha[:7], "timestamp": ts}
+                for path, (sha, ts) in self.commit_cache.last_modified().items()
+            }
+        pipeline = EmbeddingPipeline(self.vector_store, batch_size=self.embed_batch_size)
+        try:
+            stats = pipeline.embed_files(self.repo_path, files_to_embed, file_metadata, self._head_reader())
+        except Exception as e:
+            print(f"[Excavator] Error embedding files: {e}")
+            return
         
-        return chunks
\ No newline at end of file
+        print(f"[Excavator] Embedded {stats['documents']} documents from {len(files_to_embed)} files "
+              f"({stats['docs_per_sec']} docs/s)")
@@ -1,8 +1,27 @@
-from typing import Dict, Any, List, Optional
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple, Union
 from collections import Counter
+import numpy as np
+from memory.commit_cache import CommitCache
+from tools.activity import activity_summary, describe_activity
+from tools.commit_classifier import ClassifiedBatch, get_classifier
+from tools.commit_stream import CommitRecord
+from tools.commit_table import CommitTable, as_table
+from tools.commit_windows import (CommitWindow, commit_line, content_key, estimate_tokens, pack_texts,
+                                  pack_windows, period_label)
 from tools.git_tool import get_commits
+from tools.ownership import describe_ownership
 from tools.rag_tool import search_context
-from agents.llm import call_llm
+from agents.llm import call_llm, is_stub_response
+
+# Agents accept either the columnar table or legacy commit dicts
+Commits = Union[CommitTable, List[Dict[str, Any]]]
+# parallel_map(items, worker) -> results in input order
+ParallelMap = Callable[[List[Any], Callable[[Any], Any]], List[Any]]
+# Subjects git and hosting services write for merge commits
+_MERGE_SUBJECT = re.compile(r"^Merge (pull request|branch|remote-tracking branch|tag)\b")
 
 
 class HistorianAgent:
@@ -11,126 +30,324 @@ class HistorianAgent:
     and summarizes important events in the codebase.
     """
 
-    def __init__(self, vector_store: Optional[Any] = None):
+    def __init__(self, vector_store: Optional[Any] = None, map_reduce: bool = True, window_tokens: int = 3000,
+                 max_workers: int = 8, parallel_map: Optional[ParallelMap] = None):
         self.vector_store = vector_store
+        self.map_reduce = map_reduce
+        self.window_tokens = window_tokens
+        self.max_workers = max_workers
+        # AgentManager routes this through its shared worker pool
+        self.parallel_map = parallel_map
 
     def run(self, excavation_data: Dict[str, Any]) -> Dict[str, Any]:
+        result, prompt = self._prepare(excavation_data)
+        result["timeline_summary"] = call_llm(prompt)
+        print("[Historian] Timeline analysis complete.")
+        return result
+
+    def run_stream(self, excavation_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Iterator[str]]:
+        """Like `run`, but stream the LLM timeline summary.
+
+        Returns the statistics immediately together with an iterator over
+        the summary text; `timeline_summary` in the result is filled in once
+        the iterator has been consumed.
+        """
+        result, prompt = self._prepare(excavation_data)
+        result["timeline_summary"] = ""
+
+        def tokens() -> Iterator[str]:
+            parts = []
+            for token in call_llm(prompt, stream=True):
+                parts.append(token)
+                yield token
+            result["timeline_summary"] = "".join(parts)
+            print("[Historian] Timeline analysis complete.")
+
+        return result, tokens()
+
+    def _prepare(self, excavation_data: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """Compute commit statistics and build the timeline prompt."""
         print("[Historian] Analyzing commit timeline...")
 
         commits = excavation_data.get("commits", [])
         patterns = excavation_data.get("commit_patterns", {})
         file_metrics = excavation_data.get("file_metrics", {})
         hotspots = excavation_data.get("hotspots", {})
+        hotspot_details = excavation_data.get("hotspot_details", [])
+        ownership = excavation_data.get("ownership", {})
         language_breakdown = excavation_data.get("language_breakdown", {})
+        history_stats = excavation_data.get("history_stats", {})
+        # Every label for the recent window comes from one classifier pass
+        batch = _classify(commits)
         
-        # For remote repos, patterns are already computed
-        if not patterns:
-            patterns = self._analyze_commit_patterns(commits)
+        # Full-history statistics from the commit cache take precedence over the
+        # recent commit window; for remote repos, patterns may already be computed
+        if history_stats:
+            patterns = {
+                "types": history_stats.get("types", {}),
+                "keywords": history_stats.get("keywords", {}),
+                "top_authors": history_stats.get("top_authors", {}),
+            }
+        elif not patterns:
+            patterns = self._analyze_commit_patterns(commits, batch)
+        commit_count = history_stats.get("total_commits", len(commits))
+        author_count = history_stats.get("author_count", len(patterns.get("top_authors", {})))
         
-        # Detect library changes and refactors
-        library_changes = self._detect_library_changes(commits)
-        refactor_events = self._detect_refactors(commits)
+        # Detect library changes and refactors; manifest diffs and rename/numstat
+        # episodes (local repos) are authoritative, commit messages are the fallback
+        dependency_events = excavation_data.get("dependency_events")
+        if dependency_events is not None:
+            library_changes = self._summarize_dependency_events(dependency_events)
+        else:
+            library_changes = self._detect_library_changes(commits, batch)
+        refactor_episodes = excavation_data.get("refactor_episodes")
+        if refactor_episodes is not None:
+            refactor_events = [e["summary"] for e in refactor_episodes[:5]]
+        else:
+            refactor_events = self._detect_refactors(commits, batch)
+        hotspot_lines = self._summarize_hotspots(hotspot_details)
 
-        # Use LLM to generate insights
-        timeline_summary = call_llm(
-            f"""
+        # Activity series over the full history (or the recent window), and a
+        # period-by-period summary of the whole history, not just the aggregates
+        history_section = ""
+        repo_id = excavation_data.get("repo_id")
+        if repo_id:
+            history = CommitCache(repo_id)
+            try:
+                activity = activity_summary(history.table(), history.directory_activity())
+                period_summaries = self.summarize_history(history) if self.map_reduce else ""
+            finally:
+                history.close()
+            if period_summaries:
+                history_section = f"**History by Period:**\n{period_summaries}\n"
+        else:
+            activity = activity_summary(as_table(commits))
+        activity_lines = "\n            ".join(f"- {line}" for line in describe_activity(activity)) or "- (no commits)"
+        ownership_lines = ("\n            ".join(f"- {line}" for line in describe_ownership(ownership))
+                           or "- (no blame data available)")
+
+        # Prompt for the LLM insights
+        prompt = f"""
             Analyze this Git repository based on commit history:
 
             **Statistics:**
-            - Total Commits: {len(commits)}
+            - Total Commits: {commit_count}
+            - Active Period: {history_stats.get('first_commit_date', 'unknown')} to {history_stats.get('last_commit_date', 'unknown')}
+            - Codebase Size: {file_metrics.get('total_files', 0)} files, {file_metrics.get('total_lines', 0)} lines ({file_metrics.get('code_lines', 0)} code, {file_metrics.get('comment_lines', 0)} comment, {file_metrics.get('blank_lines', 0)} blank)
             - Commit Types: {patterns.get('types', {})}
             - Top Authors: {patterns.get('top_authors', {})}
             - Common Keywords: {list(patterns.get('keywords', {}).keys())[:5]}
 
+            **Activity Over Time:**
+            {activity_lines}
+
             **Notable Events:**
             - Library Changes: {library_changes}
             - Major Refactors: {refactor_events}
 
+            **Hotspots (recent churn, author spread, files changed together):**
+            {hotspot_lines}
+
+            **Code Ownership (who wrote the lines that exist today, from blame):**
+            {ownership_lines}
+
+            {history_section}
             Based on this commit history, provide insights on:
             1. What is the nature of this project?
             2. What development patterns do you see?
-            3. Who are the main contributors?
-            4. What is the commit velocity and activity level?
+            3. Who are the main contributors, and who owns the code as it stands today?
+            4. What is the commit velocity and activity level, and how has it changed over time?
             5. What technical focus areas are evident from commit messages?
             6. What major technology shifts or refactors happened?
             7. Why might they have made these architectural decisions?
 
             Be specific and actionable, not generic. Reference specific commits where relevant.
             """
-        )
-
-        print("[Historian] Timeline analysis complete.")
 
         return {
-            "timeline_summary": timeline_summary,
-            "commit_count": len(commits),
-            "author_count": len(patterns.get("top_authors", {})),
+            "commit_count": commit_count,
+            "author_count": author_count,
             "top_authors": patterns.get("top_authors", {}),
             "hotspots": hotspots,
+            "hotspot_details": hotspot_details,
+            "ownership": ownership,
+            "activity": activity,
             "commit_patterns": patterns,
             "languages": language_breakdown,
             "library_changes": library_changes,
             "refactor_events": refactor_events
-        }
+        }, prompt
+
+    # -----------------------------
+    # Map-reduce history summaries
+    # -----------------------------
+    def summarize_commit(self, commit: Union[CommitRecord, Dict[str, Any]]) -> Dict[str, Any]:
+        """One-line digest of a commit, the unit window summaries are built from."""
+        if isinstance(commit, CommitRecord):
+            return {"commit": commit.sha, "summary": commit_line(commit)}
+        message = (commit.get("message") or "").strip()
+        subject = message.splitlines()[0] if message else ""
+        date = str(commit.get("date", ""))[:10]
+        return {"commit": commit.get("hash"), "summary": f"- {date} {commit.get('hash')} {commit.get('author')}: {subject}"}
+
+    def summarize_window(self, window: CommitWindow) -> str:
+        """Summarise the commits of one time window (map step)."""
+        return call_llm(
+            f"""
+            Summarise this period of a Git repository's history ({window.label}, {len(window.lines)} commits).
+
+            **Commits (date, sha, author: subject, churn):**
+            {window.text}
+
+            In 3-5 sentences, describe what the team worked on, notable features, fixes, refactors
+            or dependency changes, and who drove them. Reference commit shas for key events.
+            """,
+            max_tokens=256,
+        )
 
-    def _analyze_commit_patterns(self, commits: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def summarize_history(self, history: CommitCache) -> str:
+        """Map-reduce summary of the full commit history.
+
+        Commits are packed into token-budgeted windows, uncached windows are
+        summarised concurrently, and the window summaries are merged level by
+        level until they fit one prompt. Every summary is cached in the
+        commit cache under a content key, so re-runs only summarise windows
+        with new commits (and the merges above them).
+        """
+        start = time.perf_counter()
+        windows = pack_windows(history.iter_records(), self.window_tokens)
+        if not windows:
+            return ""
+
+        summaries = self._summaries(history, windows, self.summarize_window,
+                                    lambda w: (w.key, 0, w.start_ts, w.end_ts))
+        items = [
+            (w.key, w.start_ts, w.end_ts, f"### {w.label} ({len(w.lines)} commits)\n{summaries[w.key]}")
+            for w in windows
+        ]
+        merged = self._reduce(history, items)
+        print(f"[Historian] Summarised {len(windows)} history windows in {time.perf_counter() - start:.1f}s")
+        return merged
+
+    def _reduce(self, history: CommitCache, items: List[Tuple[str, int, int, str]]) -> str:
+        """Merge (key, start_ts, end_ts, text) items until they fit the budget."""
+        level = 1
+        while len(items) > 1 and sum(estimate_tokens(text) for *_, text in items) > self.window_tokens:
+            groups = []
+            for indices in pack_texts([text for *_, text in items], self.window_tokens):
+                group = [items[i] for i in indices]
+                key = content_key(*(k for k, *_ in group)) if len(group) > 1 else group[0][0]
+                groups.append((key, group[0][1], group[-1][2], group))
+            summaries = self._summaries(
+                history,
+                [g for g in groups if len(g[3]) > 1],
+                lambda g: self._merge_summaries([text for *_, text in g[3]]),
+                lambda g: (g[0], level, g[1], g[2]),
+            )
+            items = [
+                (key, start_ts, end_ts, f"### {period_label(start_ts, end_ts)}\n{summaries[key]}")
+                if len(group) > 1 else group[0]
+                for key, start_ts, end_ts, group in groups
+            ]
+            level += 1
+        return "\n\n".join(text for *_, text in items)
+
+    def _merge_summaries(self, texts: List[str]) -> str:
+        """Combine consecutive period summaries into one (reduce step)."""
+        joined = "\n\n".join(texts)
+        return call_llm(
+            f"""
+            Merge these consecutive period summaries of a Git repository's history into one summary.
+
+            {joined}
+
+            Keep the chronology, the most significant events, commit shas and people. 4-6 sentences.
+            """,
+            max_tokens=384,
+        )
+
+    def _summaries(self, history: CommitCache, entries: List[Any], summarize: Callable[[Any], str],
+                   row: Callable[[Any], Tuple[str, int, int, int]]) -> Dict[str, str]:
+        """Cached summaries by key, computing the missing ones in parallel."""
+        summaries = history.get_summaries([row(e)[0] for e in entries])
+        missing = [e for e in entries if row(e)[0] not in summaries]
+        if not missing:
+            return summaries
+        results = self._parallel_map(missing, summarize)
+        new_rows = []
+        for entry, summary in zip(missing, results):
+            # The AgentManager pool reports failures as {"error": ...}
+            summary = summary if isinstance(summary, str) else ""
+            key = row(entry)[0]
+            summaries[key] = summary
+            if summary and not is_stub_response(summary):
+                new_rows.append((*row(entry), summary))
+        history.put_summaries(new_rows)
+        print(f"[Historian] Summarised {len(missing)} new periods ({len(entries) - len(missing)} cached)")
+        return summaries
+
+    def _parallel_map(self, items: List[Any], worker: Callable[[Any], Any]) -> List[Any]:
+        if self.parallel_map is not None:
+            return self.parallel_map(items, worker)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(worker, items))
+
+    @staticmethod
+    def classify_message(message: str) -> Tuple[str, List[str]]:
+        """Classify one commit message and extract its keywords."""
+        return get_classifier().classify(message)
+
+    def _analyze_commit_patterns(self, commits: Commits,
+                                 batch: Optional[ClassifiedBatch] = None) -> Dict[str, Any]:
         """Extract patterns from commit messages."""
-        keywords = Counter()
-        message_types = Counter()
-        
-        for c in commits:
-            msg = c.get('message', '').lower()
-            
-            # Classify commit type
-            if any(w in msg for w in ['fix', 'bug', 'issue', 'resolve', 'patch']):
-                message_types['bug_fix'] += 1
-            elif any(w in msg for w in ['feat', 'feature', 'add', 'new', 'implement']):
-                message_types['feature'] += 1
-            elif any(w in msg for w in ['refactor', 'clean', 'improve', 'optimize', 'perf']):
-                message_types['refactor'] += 1
-            elif any(w in msg for w in ['doc', 'readme', 'comment', 'update docs']):
-                message_types['documentation'] += 1
-            else:
-                message_types['other'] += 1
-            
-            # Extract keywords
-            words = [w for w in msg.split() if len(w) > 4 and not w.startswith('#')]
-            keywords.update(words)
-        
+        batch = batch if batch is not None else _classify(commits)
         return {
-            "types": dict(message_types),
-            "keywords": dict(keywords.most_common(10))
+            "types": batch.type_counts(),
+            "keywords": dict(batch.keywords.most_common(10))
         }
 
-    def _analyze_authors(self, commits: List[Dict[str, Any]]) -> Dict[str, int]:
+    def _analyze_authors(self, commits: Commits) -> Dict[str, int]:
         """Count commits per author."""
-        return dict(Counter([c.get('author', 'unknown') for c in commits]).most_common(5))
+        return as_table(commits).author_counts(5)
 
-    def _detect_library_changes(self, commits: List[Dict[str, Any]]) -> List[str]:
+    def _detect_library_changes(self, commits: Commits,
+                                batch: Optional[ClassifiedBatch] = None) -> List[str]:
         """Detect when libraries/dependencies were added or changed."""
-        changes = []
-        keywords = ['import', 'require', 'install', 'pip', 'npm', 'maven', 'cargo', 'from', 'as']
-        
-        for commit in commits[:50]:  # Check recent commits
-            msg = commit.get('message', '').lower()
-            # Look for dependency/library mentions
-            if any(word in msg for word in ['library', 'dependency', 'dependencies', 'package', 'upgrade', 'switch', 'migrate', 'adopt', 'integrate']):
-                if any(keyword in msg for keyword in keywords):
-                    changes.append(f"[{commit.get('hash')}] {commit.get('message')[:80]}")
-        
-        return changes[:5]  # Top 5 library changes
+        batch = batch if batch is not None else _classify(commits)
+        # A dependency change mentioned together with an ecosystem term (pip, npm, import, ...)
+        rows = np.flatnonzero(get_classifier().select(batch, "dependency", "ecosystem"))
+        return [f"[{commits[i].get('hash')}] {commits[i].get('message', '')[:80]}" for i in rows[:5]]  # Top 5 library changes
+
+    def _summarize_dependency_events(self, events: List[Dict[str, Any]], limit: int = 10) -> List[str]:
+        """Overall counts plus the most recent manifest-level dependency changes."""
+        if not events:
+            return []
+        counts = Counter(e["change"] for e in events)
+        overview = ", ".join(f"{n} {change}" for change, n in counts.most_common())
+        return [f"{len(events)} dependency changes across history ({overview})"] + \
+            [e["summary"] for e in events[-limit:]]
 
-    def _detect_refactors(self, commits: List[Dict[str, Any]]) -> List[str]:
+    def _summarize_hotspots(self, details: List[Dict[str, Any]], limit: int = 8) -> str:
+        """One prompt line per hotspot: decayed churn, authors and coupled files."""
+        if not details:
+            return "- (no line-level history available)"
+        lines = []
+        for d in details[:limit]:
+            coupled = ", ".join(f"{c['path']} ({c['confidence']:.0%})" for c in d.get("coupled_with", []))
+            lines.append(
+                f"- {d['path']}: churn {d['churn']}, {d['touches']} commits, "
+                f"{d['authors']} authors (entropy {d['author_entropy']} bits)"
+                + (f"; changes with {coupled}" if coupled else "")
+            )
+        return "\n            ".join(lines)
+
+    def _detect_refactors(self, commits: Commits, batch: Optional[ClassifiedBatch] = None) -> List[str]:
         """Detect major refactoring efforts."""
-        refactors = []
-        
-        for commit in commits:
-            msg = commit.get('message', '').lower()
-            # Look for refactor/restructuring mentions
-            if any(word in msg for word in ['refactor', 'restructure', 'rewrite', 'cleanup', 'reorganize', 'redesign', 'overhaul', 'consolidate', 'merge', 'split']):
-                refactors.append(f"[{commit.get('hash')}] {commit.get('message')[:80]}")
-        
-        return refactors[:5]  # Top 5 refactors
+        batch = batch if batch is not None else _classify(commits)
+        rows = np.flatnonzero(get_classifier().select(batch, "restructure"))
+        # "merge*" is a restructure term, but merge commits themselves are not refactors
+        rows = [i for i in rows if not _MERGE_SUBJECT.match(commits[i].get("message", ""))]
+        return [f"[{commits[i].get('hash')}] {commits[i].get('message', '')[:80]}" for i in rows[:5]]  # Top 5 refactors
 
     def answer_why(self, query: str) -> str:
         """Answer queries like: why was X library introduced?"""
@@ -149,3 +366,7 @@ class HistorianAgent:
             Provide a clear and direct answer.
             """
         )
+
+
+def _classify(commits: Commits) -> ClassifiedBatch:
+    return as_table(commits).classify()
@@ -1,57 +1,159 @@
 """Simple LLM wrapper used by agents.
 
-This module exposes `call_llm(prompt, ...)` which will try to call
-OpenAI's ChatCompletion API if `openai` is available and
-`OPENAI_API_KEY` is set in the environment. Otherwise it returns a
-harmless stub (the prompt truncated) so the repository remains usable
-without credentials during development and static analysis.
+This module exposes `call_llm(prompt, ...)` which calls an
+OpenAI-compatible chat completion API through the shared async client in
+`agents.llm_client` when `OPENAI_API_KEY` is set (or `OPENAI_BASE_URL`
+points at another server). Otherwise it returns a harmless stub (the
+prompt truncated) so the repository remains usable without credentials
+during development and static analysis. `acall_llm` is the async
+variant for running many prompts concurrently, and `stream_llm` (or
+`call_llm(..., stream=True)`) yields the response in fragments as they
+are generated.
+
+Real responses are stored in a disk-backed response cache
+(`agents.llm_cache`), so re-running an analysis on an unchanged
+repository makes no network calls.
 """
-from typing import Optional
-import os
+from typing import Iterator, Optional, Union
 import logging
+from agents.llm_cache import cache_key, get_response_cache
+from agents.llm_client import DEFAULT_BASE_URL, get_client, iter_sync, run_shared, run_sync
+
+STUB_PREFIX = "[LLM STUB]"
 
 
-def call_llm(prompt: str, model: str = "gpt-3.5-turbo", max_tokens: int = 512, temperature: float = 0.0) -> str:
+def call_llm(prompt: str, model: str = "gpt-3.5-turbo", max_tokens: int = 512, temperature: float = 0.0,
+             use_cache: bool = True, stream: bool = False) -> Union[str, Iterator[str]]:
     """Call an LLM to get a text response.
 
-    Attempts to use the `openai` package and the `OPENAI_API_KEY`
-    environment variable. If the library or key is unavailable, a
-    deterministic stub response is returned so the rest of the code can
-    run and static analyzers (like Pylance) can resolve the import.
+    Uses the shared async client (timeouts, retries, rate limits) when
+    `OPENAI_API_KEY` is set. If the key is unavailable or the call fails,
+    a deterministic stub response is returned so the rest of the code can
+    run. Responses are served from the response cache when available.
+
+    With `stream=True` an iterator of text fragments is returned instead
+    (see `stream_llm`).
     """
-    try:
-        import openai  # type: ignore
+    if stream:
+        return stream_llm(prompt, model, max_tokens, temperature, use_cache=use_cache)
 
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            logging.warning("OPENAI_API_KEY not set; returning stub response from call_llm")
-            return _stub_response(prompt)
+    cache = get_response_cache() if use_cache else None
+    key = cache_key(model, prompt, max_tokens, temperature)
+    cached = _cache_get(cache, key)
+    if cached is not None:
+        return cached
 
-        openai.api_key = api_key
+    response = _call_openai(prompt, model, max_tokens, temperature)
+    # Stubs are never cached so a later run with credentials gets a real answer
+    if response is not None:
+        _cache_put(cache, key, response, model)
+    return response if response is not None else _stub_response(prompt)
 
-        # Use ChatCompletion API (works with openai v2.x compatibility layer)
-        resp = openai.ChatCompletion.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens,
-            temperature=temperature,
-        )
 
-        # Compatibility: handle different response shapes safely
-        try:
-            message = resp['choices'][0]['message']['content']
-        except Exception:
-            # fallback for older/newer shapes
-            message = resp['choices'][0].get('text', '')
+def stream_llm(prompt: str, model: str = "gpt-3.5-turbo", max_tokens: int = 512, temperature: float = 0.0,
+               use_cache: bool = True) -> Iterator[str]:
+    """Yield the response to `prompt` in fragments as they are generated.
+
+    Cached responses and stubs are yielded as a single fragment. A stream
+    is only cached once it completes; if it breaks off midway the text
+    received so far is kept and nothing is cached.
+    """
+    cache = get_response_cache() if use_cache else None
+    key = cache_key(model, prompt, max_tokens, temperature)
+    cached = _cache_get(cache, key)
+    if cached is not None:
+        yield cached
+        return
 
-        return message.strip()
+    client = get_client()
+    if not _has_backend(client):
+        logging.warning("OPENAI_API_KEY not set; returning stub response from stream_llm")
+        yield _stub_response(prompt)
+        return
 
+    parts = []
+    try:
+        for fragment in iter_sync(client.stream(prompt, model=model, max_tokens=max_tokens, temperature=temperature)):
+            parts.append(fragment)
+            yield fragment
+    except Exception as exc:
+        logging.warning("stream_llm: LLM stream failed (%s)", exc)
+        if not parts:
+            yield _stub_response(prompt)
+        return
+    _cache_put(cache, key, "".join(parts).strip(), model)
+
+
+def _call_openai(prompt: str, model: str, max_tokens: int, temperature: float) -> Optional[str]:
+    """Return the completion text, or None when no real response is available."""
+    client = get_client()
+    if not _has_backend(client):
+        logging.warning("OPENAI_API_KEY not set; returning stub response from call_llm")
+        return None
+    try:
+        return run_sync(client.complete(prompt, model=model, max_tokens=max_tokens, temperature=temperature))
     except Exception as exc:  # pragma: no cover - best-effort runtime behavior
-        logging.warning("call_llm: openai call failed (%s); returning stub", exc)
+        logging.warning("call_llm: LLM call failed (%s); returning stub", exc)
+        return None
+
+
+async def acall_llm(prompt: str, model: str = "gpt-3.5-turbo", max_tokens: int = 512, temperature: float = 0.0,
+                    use_cache: bool = True) -> str:
+    """Async variant of `call_llm` for running many prompts concurrently.
+
+    Requests run on the shared client loop, so its concurrency cap and rate
+    limits apply across every caller.
+    """
+    cache = get_response_cache() if use_cache else None
+    key = cache_key(model, prompt, max_tokens, temperature)
+    cached = _cache_get(cache, key)
+    if cached is not None:
+        return cached
+
+    client = get_client()
+    if not _has_backend(client):
+        return _stub_response(prompt)
+    try:
+        response = await run_shared(
+            client.complete(prompt, model=model, max_tokens=max_tokens, temperature=temperature)
+        )
+    except Exception as exc:
+        logging.warning("acall_llm: LLM call failed (%s); returning stub", exc)
         return _stub_response(prompt)
+    _cache_put(cache, key, response, model)
+    return response
+
+
+def _has_backend(client) -> bool:
+    """A key is required for the default endpoint; other servers may not need one."""
+    return bool(client.api_key) or client.base_url != DEFAULT_BASE_URL
+
+
+def _cache_get(cache, key: str) -> Optional[str]:
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception as exc:
+        logging.warning("call_llm: response cache read failed (%s)", exc)
+        return None
+
+
+def _cache_put(cache, key: str, response: str, model: str):
+    if cache is None:
+        return
+    try:
+        cache.put(key, response, model=model)
+    except Exception as exc:
+        logging.warning("call_llm: response cache write failed (%s)", exc)
+
+
+def is_stub_response(response: str) -> bool:
+    """True for placeholder responses, which callers should not persist."""
+    return response.startswith(STUB_PREFIX)
 
 
 def _stub_response(prompt: str, length: int = 100) -> str:
     """Return a stable, trimmed representation of the prompt for local use."""
     cleaned = " ".join(prompt.split())
-    return f"[LLM STUB] {cleaned[:length]}{'...' if len(cleaned) > length else ''}"
+    return f"{STUB_PREFIX} {cleaned[:length]}{'...' if len(cleaned) > length else ''}"
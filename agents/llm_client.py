@@ -0,0 +1,331 @@
+"""
+Asyncio-native client for OpenAI-compatible chat completion APIs.
+
+One `httpx.AsyncClient` connection pool is shared by every call. Calls are
+limited by a concurrency cap and by token buckets for requests/min and
+tokens/min, retried with jittered exponential backoff on 429/5xx and
+transport errors (honouring Retry-After), and bounded by a per-call
+deadline. Completions can also be streamed as server-sent events, in
+which case retries only happen before the first token arrives.
+`base_url` may point at any compatible server, including a
+local stub, which is how the client is exercised without credentials.
+
+Synchronous code reaches the client through `run_sync` and `iter_sync`,
+which execute coroutines on a dedicated background event loop so that the
+pool and the limits are shared across threads (Streamlit sessions, worker
+pools).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import httpx
+
+DEFAULT_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when a completion cannot be obtained within the retry budget."""
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to `per_minute` units."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0):
+        # Requests larger than the bucket would wait forever; cap them
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Rough token cost of a request (~4 characters per prompt token)."""
+    return len(prompt) // 4 + max_tokens
+
+
+class AsyncLLMClient:
+    def __init__(self, api_key: Optional[str] = None, base_url: str = DEFAULT_BASE_URL,
+                 max_concurrency: int = 8, requests_per_minute: float = 500, tokens_per_minute: float = 200_000,
+                 max_retries: int = 5, timeout: float = 60.0, backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._request_bucket: Optional[TokenBucket] = None
+        self._token_bucket: Optional[TokenBucket] = None
+
+    def _ensure_started(self):
+        # Created lazily so they bind to the loop that actually runs the calls
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._request_bucket = TokenBucket(self.requests_per_minute)
+            self._token_bucket = TokenBucket(self.tokens_per_minute)
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    @staticmethod
+    def _payload(prompt: str, model: str, max_tokens: int, temperature: float, **extra: Any) -> Dict[str, Any]:
+        return {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            **extra,
+        }
+
+    async def complete(self, prompt: str, model: str = "gpt-3.5-turbo", max_tokens: int = 512,
+                       temperature: float = 0.0, deadline: Optional[float] = None) -> str:
+        """Return the completion text; raises LLMError or asyncio.TimeoutError."""
+        self._ensure_started()
+        payload = self._payload(prompt, model, max_tokens, temperature)
+        return await asyncio.wait_for(
+            self._with_retries(payload, estimate_tokens(prompt, max_tokens)),
+            timeout=deadline if deadline is not None else self.timeout * (self.max_retries + 1),
+        )
+
+    async def _with_retries(self, payload: Dict[str, Any], cost: int) -> str:
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.max_retries + 1):
+            await self._request_bucket.acquire(1)
+            await self._token_bucket.acquire(cost)
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    response = await self._client.post("/chat/completions", json=payload, headers=self._headers())
+                if response.status_code == 200:
+                    return _extract_text(response.json())
+                if response.status_code not in RETRY_STATUSES:
+                    raise LLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+                last_error = LLMError(f"HTTP {response.status_code}")
+                retry_after = _retry_after_seconds(response)
+            except httpx.TransportError as e:
+                last_error = e
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        raise LLMError(f"LLM request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    async def stream(self, prompt: str, model: str = "gpt-3.5-turbo", max_tokens: int = 512,
+                     temperature: float = 0.0, deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield completion text fragments as the server produces them.
+
+        The deadline bounds the whole stream; raises LLMError or
+        asyncio.TimeoutError.
+        """
+        self._ensure_started()
+        payload = self._payload(prompt, model, max_tokens, temperature, stream=True)
+        budget = deadline if deadline is not None else self.timeout * (self.max_retries + 1)
+        end = time.monotonic() + budget
+        fragments = self._stream_with_retries(payload, estimate_tokens(prompt, max_tokens))
+        try:
+            while True:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    fragment = await asyncio.wait_for(fragments.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    return
+                yield fragment
+        finally:
+            await fragments.aclose()
+
+    async def _stream_with_retries(self, payload: Dict[str, Any], cost: int) -> AsyncIterator[str]:
+        last_error: Optional[BaseException] = None
+        started = False
+        for attempt in range(self.max_retries + 1):
+            await self._request_bucket.acquire(1)
+            await self._token_bucket.acquire(cost)
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    async with self._client.stream("POST", "/chat/completions", json=payload,
+                                                   headers=self._headers()) as response:
+                        if response.status_code == 200:
+                            async for line in response.aiter_lines():
+                                fragment = _parse_sse_line(line)
+                                if fragment is _SSE_DONE:
+                                    return
+                                if fragment:
+                                    started = True
+                                    yield fragment
+                            return
+                        await response.aread()
+                        if response.status_code not in RETRY_STATUSES:
+                            raise LLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+                        last_error = LLMError(f"HTTP {response.status_code}")
+                        retry_after = _retry_after_seconds(response)
+            except httpx.TransportError as e:
+                # Text already handed to the caller cannot be taken back
+                if started:
+                    raise LLMError(f"LLM stream interrupted: {e}") from e
+                last_error = e
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        raise LLMError(f"LLM request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        return max(delay, retry_after or 0.0)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def _extract_text(data: Dict[str, Any]) -> str:
+    choice = data["choices"][0]
+    message = choice.get("message") or {}
+    return (message.get("content") or choice.get("text") or "").strip()
+
+
+_SSE_DONE = object()
+
+
+def _parse_sse_line(line: str):
+    """Text fragment carried by one server-sent event line ("" if none)."""
+    if not line.startswith("data:"):
+        return ""
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return _SSE_DONE
+    try:
+        choice = json.loads(data)["choices"][0]
+    except (ValueError, KeyError, IndexError):
+        return ""
+    delta = choice.get("delta") or {}
+    return delta.get("content") or choice.get("text") or ""
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# -----------------------------
+# Shared client + background loop for synchronous callers
+# -----------------------------
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_client: Optional[AsyncLLMClient] = None
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-client-loop", daemon=True).start()
+        return _loop
+
+
+def get_client() -> AsyncLLMClient:
+    """Process-wide client configured from the environment."""
+    global _client
+    with _loop_lock:
+        if _client is None:
+            _client = AsyncLLMClient(
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+                requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")),
+                tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000")),
+                timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+            )
+        return _client
+
+
+def configure_client(**kwargs: Any) -> AsyncLLMClient:
+    """Replace the process-wide client, e.g. to point it at a stub server."""
+    global _client
+    client = AsyncLLMClient(**kwargs)
+    with _loop_lock:
+        old, _client = _client, client
+    if old is not None:
+        try:
+            run_sync(old.aclose())
+        except Exception as exc:
+            logging.debug("configure_client: closing previous client failed (%s)", exc)
+    return client
+
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """Run a coroutine on the shared background loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result(timeout)
+
+
+def iter_sync(aiterable: AsyncIterator[Any]) -> Iterator[Any]:
+    """Drive an async iterator on the shared background loop, yielding here.
+
+    Closing the returned generator early cancels the underlying iteration.
+    """
+    items: "queue.Queue" = queue.Queue()
+    end = object()
+
+    async def pump():
+        try:
+            async for item in aiterable:
+                items.put((item, None))
+            items.put((end, None))
+        except Exception as exc:
+            items.put((end, exc))
+        finally:
+            await aiterable.aclose()
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _background_loop())
+    try:
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        future.cancel()
+
+
+async def run_shared(coro):
+    """Await a coroutine on the shared loop from any other event loop."""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _background_loop()))
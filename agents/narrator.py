@@ -1,6 +1,17 @@
-from typing import Optional, Any, Dict
+import os
+import re
+from typing import Optional, Any, Dict, Iterator, List
 from tools.rag_tool import search_context
 from agents.llm import call_llm
+from memory.commit_cache import CommitCache
+from tools.blob_reader import get_blob_reader
+from tools.commit_table import as_table
+from tools.symbol_index import SymbolIndex
+
+# Words in a question that look like a file name or path
+_PATH_TOKEN = re.compile(r"[\w.-]*(?:/[\w.-]+)+|[\w-]+\.[A-Za-z]\w{0,5}\b")
+# Identifiers in a question; group 1 is set when it is written like code (`name`, name(), snake_case, camelCase)
+_IDENTIFIER = re.compile(r"`([A-Za-z_]\w*)`|([A-Za-z_]\w*)\(|\b([A-Za-z_]\w{2,})\b")
 
 
 class NarratorAgent:
@@ -16,7 +27,13 @@ class NarratorAgent:
 
     def generate_report(self, data: Dict[str, Any]) -> str:
         """Create a comprehensive narrative from all agent outputs."""
-        
+        return call_llm(self._report_prompt(data))
+
+    def generate_report_stream(self, data: Dict[str, Any]) -> Iterator[str]:
+        """Like `generate_report`, but yields the narrative as it is generated."""
+        return call_llm(self._report_prompt(data), stream=True)
+
+    def _report_prompt(self, data: Dict[str, Any]) -> str:
         # Extract key data
         commit_count = data.get("commit_count", 0)
         author_count = data.get("author_count", 0)
@@ -28,8 +45,7 @@ class NarratorAgent:
         refactors = data.get("refactor_events", [])
         hotspots = data.get("hotspots", {})
         
-        report = call_llm(
-            f"""
+        return f"""
             You are a technical storyteller writing an executive report about a software project's evolution.
 
             ## Project Analysis Summary
@@ -61,15 +77,21 @@ class NarratorAgent:
 
             Make it engaging, specific, and grounded in the data provided.
             """
-        )
-        
-        return report
 
     def answer(self, question: str, excavation_data: Optional[Dict] = None, historian_data: Optional[Dict] = None) -> str:
         """Answer developer questions using RAG context and historical data."""
-        
+        return call_llm(self._answer_prompt(question, historian_data, excavation_data))
+
+    def answer_stream(self, question: str, excavation_data: Optional[Dict] = None,
+                      historian_data: Optional[Dict] = None) -> Iterator[str]:
+        """Like `answer`, but yields the answer as it is generated."""
+        return call_llm(self._answer_prompt(question, historian_data, excavation_data), stream=True)
+
+    def _answer_prompt(self, question: str, historian_data: Optional[Dict] = None,
+                       excavation_data: Optional[Dict] = None) -> str:
         # Retrieve relevant code context
-        rag_context = search_context(question, self.vector_store, k=5)
+        # Chunks only: whole-file documents would crowd their own chunks out of the top-k
+        rag_context = search_context(question, self.vector_store, k=5, where={"type": "chunk"})
         
         # Build enriched context
         context_parts = [rag_context]
@@ -87,11 +109,22 @@ class NarratorAgent:
             refactors = historian_data.get("refactor_events", [])
             if refactors:
                 context_parts.append(f"Recent Refactoring:\n" + "\n".join(refactors))
+
+        # Latest commits (a CommitTable or legacy dicts) as concrete anchors
+        commits = as_table((excavation_data or {}).get("commits"))
+        if len(commits):
+            recent = "\n".join(f"[{c['hash']}] {c['author']}: {c['message'][:80]}" for c in commits[:10])
+            context_parts.append(f"Recent Commits:\n{recent}")
+
+        # History of the files and symbols the question names, from the on-disk indexes
+        repo_id = (excavation_data or {}).get("repo_id")
+        for section in (self._file_history(question, repo_id), self._symbol_history(question, repo_id)):
+            if section:
+                context_parts.append(section)
         
         full_context = "\n\n".join(context_parts)
         
-        answer = call_llm(
-            f"""
+        return f"""
             You are an expert code archaeologist helping developers understand legacy code.
 
             **Developer Question:**
@@ -106,14 +139,62 @@ class NarratorAgent:
             explain the likely architectural or business reasons. Reference specific code patterns or commit messages
             when possible to support your answer.
             """
-        )
-        
-        return answer
 
-    def answer_why(self, query: str) -> str:
+    def _file_history(self, question: str, repo_id: Optional[str], per_file: int = 15) -> str:
+        """Recent commits of each known file mentioned in the question, renames followed."""
+        names = [m.group().rstrip(".") for m in _PATH_TOKEN.finditer(question)]
+        if not repo_id or not names:
+            return ""
+        exists = None
+        if os.path.isdir(repo_id):
+            # Local repos: prefer files that exist at HEAD over removed ones
+            reader = get_blob_reader(repo_id)
+            exists = lambda path: reader.read_objects([f"HEAD:{path}"])[0] is not None
+        history = CommitCache(repo_id)
+        try:
+            sections: List[str] = []
+            for path in history.match_paths(names, exists=exists):
+                entries = history.file_history(path, per_file)
+                lines = "\n".join(
+                    f"[{e['hash']}] {e['date'][:10]} {e['author']}: {e['message'][:80]} "
+                    f"(+{e['added']}/-{e['deleted']}{'' if e['path'] == path else ', as ' + e['path']})"
+                    for e in entries
+                )
+                sections.append(f"History of {path}:\n{lines}")
+        finally:
+            history.close()
+        return "\n\n".join(sections)
+
+    def _symbol_history(self, question: str, repo_id: Optional[str], limit: int = 3) -> str:
+        """Commits that shaped the functions and classes the question names."""
+        if not repo_id or not os.path.isdir(repo_id):
+            return ""  # the symbol index only exists for local repositories
+        code_like, words = [], []
+        for match in _IDENTIFIER.finditer(question):
+            name = match.group(1) or match.group(2) or match.group(3)
+            looks_like_code = not match.group(3) or "_" in name or name[1:] != name[1:].lower()
+            (code_like if looks_like_code else words).append(name)
+        if not code_like and not words:
+            return ""
+        index = SymbolIndex(repo_id)
+        try:
+            symbols = index.lookup(code_like + words, limit)
+        finally:
+            index.close()
+        sections = []
+        for s in symbols:
+            lines = "\n".join(f"[{c['hash']}] {c['author']}: {c['message'][:80]}" for c in s["commits"])
+            sections.append(f"Commits that shaped {s['kind']} {s['name']} ({s['path']}:{s['start_line']}-{s['end_line']}):"
+                            f"\n{lines}")
+        return "\n\n".join(sections)
+
+    def answer_why(self, query: str, excavation_data: Optional[Dict] = None) -> str:
         """Specialized method for 'why' questions about architecture and design decisions."""
         
-        rag_context = search_context(query, self.vector_store, k=8)
+        rag_context = search_context(query, self.vector_store, k=5, where={"type": "chunk"})
+        symbol_history = self._symbol_history(query, (excavation_data or {}).get("repo_id"))
+        if symbol_history:
+            rag_context = f"{rag_context}\n\n{symbol_history}"
         
         return call_llm(
             f"""
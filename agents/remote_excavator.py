@@ -3,7 +3,10 @@ Remote Excavator Agent - analyzes repositories without cloning to disk.
 Works entirely with remote Git APIs and GitHub APIs.
 """
 
+from datetime import datetime
 from typing import Dict, List, Any, Optional
+from memory.commit_cache import BackfillCursor, CommitCache
+from tools.commit_stream import CommitRecord
 from tools.remote_git_tool import RemoteGitTool
 
 
@@ -13,10 +16,14 @@ class RemoteExcavatorAgent:
     Fetches commit history and repository info without cloning.
     """
 
-    def __init__(self, repo_url: str, vector_store: Optional[Any] = None):
+    def __init__(self, repo_url: str, vector_store: Optional[Any] = None,
+                 max_new_commits: int = 1000, recent_commits: int = 100):
         self.repo_url = repo_url
         self.vector_store = vector_store
+        self.max_new_commits = max_new_commits
+        self.recent_commits = recent_commits
         self.git_tool = RemoteGitTool(repo_url)
+        self.commit_cache = CommitCache(repo_url)
 
     def run(self) -> Dict[str, Any]:
         """Analyze remote repository."""
@@ -25,20 +32,89 @@ class RemoteExcavatorAgent:
         # Get repository metadata
         repo_info = self.git_tool.get_repo_info()
         
-        # Get commit history
-        commits = self.git_tool.get_remote_commits(max_commits=100)
+        # Fetch only commits not cached yet, then read the recent window and
+        # full-history statistics from the cache
+        fetched = self._fetch_history()
+        commits = self.commit_cache.table(self.recent_commits)
+        history_stats = self.commit_cache.stats()
+        history_stats["history_complete"] = self.commit_cache.head is not None and self.commit_cache.backfill is None
         
         # Analyze patterns
         patterns = self.git_tool.analyze_commit_patterns(commits)
 
-        print(f"[RemoteExcavator] Found {len(commits)} commits")
+        print(f"[RemoteExcavator] Fetched {fetched} new commits, {history_stats['total_commits']} cached"
+              + ("" if history_stats["history_complete"] else " (older history still to fetch)"))
         
         return {
             "repo_url": self.repo_url,
+            "repo_id": self.repo_url,
             "repo_info": repo_info,
             "commits": commits,
-            "commits_count": len(commits),
+            "history_stats": history_stats,
+            "commits_count": history_stats["total_commits"],
             "commit_patterns": patterns,
             "authors_count": len(patterns.get("top_authors", {})),
             "sample_files": []  # No local files, working remote only
         }
+
+    def _fetch_history(self) -> int:
+        """Fetch up to `max_new_commits` uncached commits; returns how many were fetched.
+
+        An unfinished backfill from an earlier run is continued first. Then
+        commits newer than the cached head are listed. If that listing is cut
+        short (commit budget, rate limit, API error), the new head is recorded
+        together with a cursor, so the next run fetches the rest of the range
+        instead of stopping at the new head and leaving a gap.
+        """
+        cache = self.commit_cache
+        budget = self.max_new_commits
+        fetched = 0
+
+        cursor = cache.backfill
+        if cursor is not None:
+            result = self.git_tool.fetch_commits(budget, stop_at=cursor.stop, start=cursor.start, offset=cursor.offset)
+            self._ingest(result.commits)
+            fetched += len(result.commits)
+            budget -= len(result.commits)
+            if not result.complete:
+                cache.backfill = cursor._replace(offset=result.offset)
+                return fetched
+            cache.backfill = None
+            if budget <= 0:
+                return fetched
+
+        old_head = cache.head
+        result = self.git_tool.fetch_commits(budget, stop_at=old_head)
+        fetched += len(result.commits)
+        if result.start is None:
+            # Nothing was listed (or a fallback without paging): no head to record
+            self._ingest(result.commits)
+            return fetched
+        if not result.complete:
+            # Record the cursor before the head, so an interruption in between only repeats work
+            cache.backfill = BackfillCursor(result.start, result.offset, old_head)
+        self._ingest(result.commits, head=result.start)
+        return fetched
+
+    def _ingest(self, commits: List[Dict[str, Any]], head: Optional[str] = None):
+        """Store API commits (newest first) in the commit cache."""
+        records = [
+            CommitRecord(
+                sha=c["sha"],
+                parents=(),
+                author=c.get("author", "Unknown"),
+                email=c.get("email", ""),
+                timestamp=_parse_timestamp(c.get("date", "")),
+                message=c.get("message", ""),
+                files=(),
+            )
+            for c in commits if c.get("sha")
+        ]
+        self.commit_cache.ingest(records, head=head)
+
+
+def _parse_timestamp(date: str) -> int:
+    try:
+        return int(datetime.fromisoformat(date.replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return 0
@@ -9,13 +9,21 @@ from agents.narrator import NarratorAgent
 from orchestrator.agent_manager import AgentManager
 from memory.session_memory import SessionMemory
 from memory.long_term_memory import LongTermMemory
+from tools.embedding_cache import EmbeddingCache
 from tools.rag_tool import RAGTool
 
 
-def run_cli(repo_path: str):
+STREAM_HEADERS = {
+    "historian": "--- Historian Analysis ---",
+    "narrative": "--- Final Narrative ---",
+}
+
+
+def run_cli(repo_path: str, stream: bool = True):
     session_mem = SessionMemory()
-    long_mem = LongTermMemory()
-    vector_store = RAGTool()
+    embedding_cache = EmbeddingCache()
+    long_mem = LongTermMemory(embedding_cache=embedding_cache)
+    vector_store = RAGTool(embedding_cache=embedding_cache)
 
     excavator = ExcavatorAgent(repo_path, vector_store=vector_store)
     historian = HistorianAgent(vector_store=vector_store)
@@ -30,21 +38,42 @@ def run_cli(repo_path: str):
     )
 
     print("\n🔍 Running multi-agent codebase analysis...\n")
-    result = manager.run_sequential()
+    if not stream:
+        result = manager.run_sequential()
+
+        print("\n--- Excavator Output ---")
+        print(result["excavation"])
+
+        print("\n--- Historian Output ---")
+        print(result["historian"])
+
+        print("\n--- Final Narrative ---")
+        print(result["narrative"])
+        return
+
+    # Print LLM output as it arrives, with a header whenever the stage changes
+    current_stage = []
+
+    def print_token(stage: str, text: str):
+        if current_stage[-1:] != [stage]:
+            current_stage.append(stage)
+            print(f"\n{STREAM_HEADERS[stage]}")
+        print(text, end="", flush=True)
+
+    result = manager.run_sequential(on_token=print_token)
+    print()
 
     print("\n--- Excavator Output ---")
     print(result["excavation"])
 
     print("\n--- Historian Output ---")
-    print(result["historian"])
-
-    print("\n--- Final Narrative ---")
-    print(result["narrative"])
+    print({k: v for k, v in result["historian"].items() if k != "timeline_summary"})
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--repo", default="./examples/sample_repo", help="Path to repo")
+    parser.add_argument("--no-stream", action="store_true", help="Print LLM output only once it is complete")
     args = parser.parse_args()
 
-    run_cli(args.repo)
+    run_cli(args.repo, stream=not args.no_stream)
@@ -0,0 +1,22 @@
+"""
+Location of the per-repository on-disk caches.
+
+Every cache lives under one directory per repository, keyed by a hash of
+the repository's absolute path (or its URL for remote repositories), so
+analysing the same repository again reuses what was computed before.
+"""
+
+import hashlib
+import os
+
+DEFAULT_CACHE_ROOT = os.getenv("ARCHAEOLOGIST_CACHE_DIR", os.path.join("memory_store", "repos"))
+
+
+def repo_cache_dir(repo_id: str, root: str = DEFAULT_CACHE_ROOT) -> str:
+    """Return (and create) the cache directory for a repository path or URL."""
+    if "://" not in repo_id and not repo_id.startswith("git@"):
+        repo_id = os.path.realpath(repo_id)
+    key = hashlib.sha1(repo_id.encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(root, key)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,498 @@
+"""
+Persistent, incrementally updated commit cache backed by SQLite.
+
+Commits are stored once per repository, keyed by SHA, together with their
+per-file numstat. The cache remembers the last ingested HEAD so later runs
+only walk commits that are new since then, and it maintains aggregate
+tables (authors, commit types, keywords, touched paths) as commits are
+ingested, so full-history statistics cost time proportional to the new
+commits rather than to the age of the repository. An index on the
+per-file changes serves as a path -> commits inverted index, so the
+history of one file (following renames) costs time proportional to its
+own commits. Sources that page through history in bounded batches (the
+GitHub API) keep a backfill cursor, so an interrupted walk resumes where
+it stopped instead of leaving a gap below the recorded HEAD.
+"""
+
+import json
+import os
+import sqlite3
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from memory.cache_paths import repo_cache_dir
+from tools.commit_classifier import CommitClassifier, get_classifier
+from tools.commit_stream import CommitRecord, FileChange, iter_commit_records
+from tools.commit_table import CommitTable
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS commits (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha TEXT UNIQUE NOT NULL,
+    parents TEXT,
+    author TEXT,
+    email TEXT,
+    timestamp INTEGER,
+    message TEXT,
+    files_changed INTEGER,
+    added INTEGER,
+    deleted INTEGER,
+    type INTEGER  -- index into commit_classifier.TYPES
+);
+CREATE INDEX IF NOT EXISTS commits_timestamp ON commits(timestamp);
+CREATE TABLE IF NOT EXISTS file_changes (
+    commit_seq INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    old_path TEXT,
+    added INTEGER,
+    deleted INTEGER
+);
+CREATE INDEX IF NOT EXISTS file_changes_commit ON file_changes(commit_seq);
+-- Inverted index: path -> posting list of the commits that touched it
+CREATE INDEX IF NOT EXISTS file_changes_path ON file_changes(path, commit_seq);
+-- Renames by their old name, for following a file forward to its current path
+CREATE INDEX IF NOT EXISTS file_changes_old_path ON file_changes(old_path) WHERE old_path IS NOT NULL;
+CREATE TABLE IF NOT EXISTS author_stats (author TEXT PRIMARY KEY, commits INTEGER, first_ts INTEGER, last_ts INTEGER);
+CREATE TABLE IF NOT EXISTS type_stats (type TEXT PRIMARY KEY, commits INTEGER);
+CREATE TABLE IF NOT EXISTS keyword_stats (word TEXT PRIMARY KEY, count INTEGER);
+CREATE TABLE IF NOT EXISTS path_stats (
+    path TEXT PRIMARY KEY, touches INTEGER, added INTEGER, deleted INTEGER, last_sha TEXT, last_ts INTEGER
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY, level INTEGER, start_ts INTEGER, end_ts INTEGER, summary TEXT NOT NULL
+);
+"""
+
+_BATCH_SIZE = 5000
+# Paths considered per name in match_paths
+_MATCH_CANDIDATES = 20
+
+
+class BackfillCursor(NamedTuple):
+    start: str  # SHA the listing was started from
+    offset: int  # commits of that listing already ingested
+    stop: Optional[str]  # listing ends at this SHA (the previous head); None for the root commit
+
+
+class CommitCache:
+    """On-disk commit store for one repository (local path or remote URL)."""
+
+    def __init__(self, repo_id: str, cache_dir: Optional[str] = None,
+                 classifier: Optional[CommitClassifier] = None):
+        self.repo_id = repo_id
+        self.cache_dir = cache_dir or repo_cache_dir(repo_id)
+        self.classifier = classifier or get_classifier()
+        self.db_path = os.path.join(self.cache_dir, "commits.sqlite")
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+        self._sync_classifier()
+
+    def _migrate(self):
+        """Bring caches written by older versions up to the current schema."""
+        if "type" not in {row[1] for row in self.conn.execute("PRAGMA table_info(commits)")}:
+            with self.conn:
+                self.conn.execute("ALTER TABLE commits ADD COLUMN type INTEGER")
+                # Forces _sync_classifier to fill the new column
+                self.conn.execute("DELETE FROM meta WHERE key = 'classifier'")
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(path_stats)")}
+        if "last_ts" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE path_stats ADD COLUMN last_sha TEXT")
+                self.conn.execute("ALTER TABLE path_stats ADD COLUMN last_ts INTEGER")
+                self.conn.execute(
+                    "UPDATE path_stats SET (last_sha, last_ts) = ("
+                    "SELECT c.sha, c.timestamp FROM file_changes f JOIN commits c ON c.seq = f.commit_seq "
+                    "WHERE f.path = path_stats.path ORDER BY c.timestamp DESC LIMIT 1)"
+                )
+
+    def _sync_classifier(self):
+        """Recompute type/keyword aggregates if the classifier vocabulary changed."""
+        if self._get_meta("classifier") == self.classifier.version:
+            return
+        with self.conn:
+            self.conn.execute("DELETE FROM type_stats")
+            self.conn.execute("DELETE FROM keyword_stats")
+            cursor = self.conn.execute("SELECT seq, message FROM commits")
+            while True:
+                rows = cursor.fetchmany(50000)
+                if not rows:
+                    break
+                self._add_classification([seq for seq, _ in rows], [message or "" for _, message in rows])
+            self._set_meta("classifier", self.classifier.version)
+
+    def _add_classification(self, seqs: List[int], messages: List[str]):
+        batch = self.classifier.classify_batch(messages)
+        self.conn.executemany("UPDATE commits SET type = ? WHERE seq = ?", zip(batch.types.tolist(), seqs))
+        self.conn.executemany(
+            "INSERT INTO type_stats (type, commits) VALUES (?, ?) "
+            "ON CONFLICT(type) DO UPDATE SET commits = commits + excluded.commits",
+            batch.type_counts().items(),
+        )
+        self.conn.executemany(
+            "INSERT INTO keyword_stats (word, count) VALUES (?, ?) "
+            "ON CONFLICT(word) DO UPDATE SET count = count + excluded.count",
+            batch.keywords.items(),
+        )
+
+    # -----------------------------
+    # Ingestion
+    # -----------------------------
+    @property
+    def head(self) -> Optional[str]:
+        return self._get_meta("head")
+
+    @property
+    def backfill(self) -> Optional[BackfillCursor]:
+        """Listing still to be ingested below `head`, for sources that page through history."""
+        value = self._get_meta("backfill")
+        if not value:
+            return None
+        start, offset, stop = json.loads(value)
+        return BackfillCursor(start, offset, stop)
+
+    @backfill.setter
+    def backfill(self, cursor: Optional[BackfillCursor]):
+        with self.conn:
+            if cursor is None:
+                self.conn.execute("DELETE FROM meta WHERE key = 'backfill'")
+            else:
+                self._set_meta("backfill", json.dumps(list(cursor)))
+
+    def update_from_git(self, repo_path: str) -> int:
+        """Ingest commits reachable from HEAD that are not cached yet.
+
+        Returns the number of newly ingested commits. If the cached HEAD is
+        no longer an ancestor of the current one (history was rewritten),
+        the cache is rebuilt from scratch. If `git log` fails partway, the
+        error propagates and HEAD is not recorded, so the next run walks the
+        same range again (commits already stored are skipped).
+        """
+        head = _git(repo_path, "rev-parse", "HEAD")
+        if not head:
+            return 0
+        old_head = self.head
+        if old_head == head:
+            return 0
+
+        revisions = [head]
+        if old_head:
+            if _git_ok(repo_path, "merge-base", "--is-ancestor", old_head, head):
+                revisions.append(f"^{old_head}")
+            else:
+                print("[CommitCache] History was rewritten; rebuilding cache")
+                self.clear()
+
+        return self.ingest(iter_commit_records(repo_path, revisions=revisions), head=head)
+
+    def ingest(self, records: Iterable[CommitRecord], head: Optional[str] = None) -> int:
+        """Store records not seen before and fold them into the aggregates."""
+        added = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= _BATCH_SIZE:
+                added += self._ingest_batch(batch)
+                batch = []
+        if batch:
+            added += self._ingest_batch(batch)
+        if head:
+            with self.conn:
+                self._set_meta("head", head)
+        return added
+
+    def _ingest_batch(self, records: List[CommitRecord]) -> int:
+        authors: Dict[str, List[int]] = {}
+        seqs: List[int] = []
+        messages: List[str] = []
+        paths: Dict[str, List[int]] = {}
+        inserted = 0
+
+        with self.conn:
+            for r in records:
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO commits "
+                    "(sha, parents, author, email, timestamp, message, files_changed, added, deleted) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (r.sha, " ".join(r.parents), r.author, r.email, r.timestamp, r.message,
+                     len(r.files), r.added, r.deleted),
+                )
+                if cur.rowcount == 0:
+                    continue  # already cached
+                inserted += 1
+                seq = cur.lastrowid
+                self.conn.executemany(
+                    "INSERT INTO file_changes (commit_seq, path, old_path, added, deleted) VALUES (?, ?, ?, ?, ?)",
+                    [(seq, f.path, f.old_path, f.added, f.deleted) for f in r.files],
+                )
+
+                entry = authors.setdefault(r.author, [0, r.timestamp, r.timestamp])
+                entry[0] += 1
+                entry[1] = min(entry[1], r.timestamp)
+                entry[2] = max(entry[2], r.timestamp)
+                seqs.append(seq)
+                messages.append(r.message)
+                for f in r.files:
+                    p = paths.setdefault(f.path, [0, 0, 0, r.sha, r.timestamp])
+                    p[0] += 1
+                    p[1] += f.added
+                    p[2] += f.deleted
+                    if r.timestamp > p[4]:
+                        p[3], p[4] = r.sha, r.timestamp
+
+            self.conn.executemany(
+                "INSERT INTO author_stats (author, commits, first_ts, last_ts) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(author) DO UPDATE SET commits = commits + excluded.commits, "
+                "first_ts = MIN(first_ts, excluded.first_ts), last_ts = MAX(last_ts, excluded.last_ts)",
+                [(a, *v) for a, v in authors.items()],
+            )
+            # Classified in one batch pass over the new messages
+            self._add_classification(seqs, messages)
+            self.conn.executemany(
+                "INSERT INTO path_stats (path, touches, added, deleted, last_sha, last_ts) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET touches = touches + excluded.touches, "
+                "added = added + excluded.added, deleted = deleted + excluded.deleted, "
+                "last_sha = CASE WHEN excluded.last_ts >= COALESCE(last_ts, 0) THEN excluded.last_sha ELSE last_sha END, "
+                "last_ts = MAX(COALESCE(last_ts, 0), excluded.last_ts)",
+                [(p, *v) for p, v in paths.items()],
+            )
+        return inserted
+
+    def clear(self):
+        with self.conn:
+            for table in ("meta", "commits", "file_changes", "author_stats", "type_stats", "keyword_stats", "path_stats",
+                          "summaries"):
+                self.conn.execute(f"DELETE FROM {table}")
+            self._set_meta("classifier", self.classifier.version)
+
+    # -----------------------------
+    # Reading
+    # -----------------------------
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM commits").fetchone()[0]
+
+    def iter_records(self, newest_first: bool = False) -> Iterator[CommitRecord]:
+        """Stream cached commits in commit-time order with their file changes."""
+        order = "DESC" if newest_first else "ASC"
+        rows = self.conn.execute(
+            "SELECT c.seq, c.sha, c.parents, c.author, c.email, c.timestamp, c.message, "
+            "f.path, f.old_path, f.added, f.deleted "
+            "FROM commits c LEFT JOIN file_changes f ON f.commit_seq = c.seq "
+            f"ORDER BY c.timestamp {order}, c.seq {order}"
+        )
+        current = None
+        files: List[FileChange] = []
+        for seq, sha, parents, author, email, timestamp, message, path, old_path, added, deleted in rows:
+            if current is None or current[0] != seq:
+                if current is not None:
+                    yield CommitRecord(*current[1:], tuple(files))
+                current = (seq, sha, tuple((parents or "").split()), author, email, timestamp, message)
+                files = []
+            if path is not None:
+                files.append(FileChange(path, added, deleted, old_path))
+        if current is not None:
+            yield CommitRecord(*current[1:], tuple(files))
+
+    def table(self, limit: Optional[int] = None) -> CommitTable:
+        """Columnar table of the most recent `limit` commits (all if None), newest first."""
+        rows = self.conn.execute(
+            "SELECT sha, author, timestamp, message, files_changed, added, deleted, type FROM commits "
+            "ORDER BY timestamp DESC, seq DESC LIMIT ?",
+            (-1 if limit is None else limit,),
+        )
+        return CommitTable.from_rows(rows)
+
+    def directory_activity(self) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """(timestamp, directory id) once per commit and top-level directory it touched, plus directory names.
+
+        Files at the repository root are grouped under ".".
+        """
+        rows = self.conn.execute(
+            "SELECT DISTINCT f.commit_seq, c.timestamp, "
+            "CASE WHEN instr(f.path, '/') > 0 THEN substr(f.path, 1, instr(f.path, '/') - 1) ELSE '.' END "
+            "FROM file_changes f JOIN commits c ON c.seq = f.commit_seq"
+        )
+        names: Dict[str, int] = {}
+        timestamps, ids = [], []
+        for _, timestamp, directory in rows:
+            timestamps.append(timestamp)
+            ids.append(names.setdefault(directory, len(names)))
+        return np.array(timestamps, dtype=np.int64), np.array(ids, dtype=np.int32), list(names)
+
+    def recent(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return summary dicts for the most recent `limit` commits."""
+        return self.table(limit).to_dicts()
+
+    def top_paths(self, limit: int = 15) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT path, touches FROM path_stats ORDER BY touches DESC LIMIT ?", (limit,))
+        return dict(rows.fetchall())
+
+    def last_modified(self) -> Dict[str, Tuple[str, int]]:
+        """Map every path to the (sha, timestamp) of the last commit touching it."""
+        rows = self.conn.execute("SELECT path, last_sha, last_ts FROM path_stats WHERE last_sha IS NOT NULL")
+        return {path: (sha, ts) for path, sha, ts in rows}
+
+    def file_history(self, path: str, limit: Optional[int] = None,
+                     follow_renames: bool = True) -> List[Dict[str, Any]]:
+        """Commits that touched `path`, newest first, with its added/deleted lines.
+
+        With `follow_renames`, the history continues under the old name
+        from the commit that renamed the file, and so on back in time. Each
+        entry records the path the file had in that commit.
+        """
+        history: List[Dict[str, Any]] = []
+        seen = set()
+        bound = None  # (timestamp, seq) of the oldest rename to the current name
+        while path and path not in seen and (limit is None or len(history) < limit):
+            seen.add(path)
+            query = ("SELECT c.seq, c.sha, c.author, c.timestamp, c.message, f.old_path, f.added, f.deleted "
+                     "FROM file_changes f JOIN commits c ON c.seq = f.commit_seq WHERE f.path = ?")
+            params: List[Any] = [path]
+            if bound is not None:
+                # Commit order within one second is not known, so only the rename itself is excluded
+                query += " AND c.timestamp <= ? AND c.seq != ?"
+                params.extend(bound)
+            query += " ORDER BY c.timestamp DESC, c.seq DESC"
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(limit - len(history))
+            renamed_from = None
+            for seq, sha, author, timestamp, message, old_path, added, deleted in self.conn.execute(query, params):
+                history.append({
+                    "hash": sha[:7],
+                    "sha": sha,
+                    "author": author,
+                    "date": _iso(timestamp),
+                    "message": (message or "").strip().split("\n")[0],
+                    "path": path,
+                    "added": added,
+                    "deleted": deleted,
+                })
+                if follow_renames and old_path and old_path != path:
+                    renamed_from, bound = old_path, (timestamp, seq)
+            path = renamed_from
+        return history
+
+    def current_path(self, path: str) -> str:
+        """Follow renames forward: the newest name of the file once called `path`.
+
+        A path that was changed again after being renamed away (re-created)
+        keeps its name.
+        """
+        seen = {path}
+        while True:
+            row = self.conn.execute(
+                "SELECT f.path, c.timestamp FROM file_changes f JOIN commits c ON c.seq = f.commit_seq "
+                "WHERE f.old_path = ? AND f.path != ? ORDER BY c.timestamp DESC, c.seq DESC LIMIT 1",
+                (path, path),
+            ).fetchone()
+            if row is None or row[0] in seen:
+                return path
+            last = self.conn.execute("SELECT last_ts FROM path_stats WHERE path = ?", (path,)).fetchone()
+            if last and last[0] is not None and last[0] > row[1]:
+                return path
+            path = row[0]
+            seen.add(path)
+
+    def match_paths(self, names: Iterable[str], limit: int = 3,
+                    exists: Optional[Callable[[str], bool]] = None) -> List[str]:
+        """Resolve file names or partial paths to the paths those files have today.
+
+        A name matches a path exactly or by its trailing components, and a
+        match that was renamed later resolves to its newest name. Paths that
+        still exist (per `exists`, when given) win, then exact matches, then
+        the most touched path.
+        """
+        found: List[str] = []
+        for name in names:
+            name = name[2:] if name.startswith("./") else name
+            if not name:
+                continue
+            suffix = "%/" + name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            rows = self.conn.execute(
+                "SELECT path FROM path_stats WHERE path = ? OR path LIKE ? ESCAPE '\\' "
+                "ORDER BY path = ? DESC, touches DESC LIMIT ?",
+                (name, suffix, name, _MATCH_CANDIDATES),
+            ).fetchall()
+            best = None
+            for (path,) in rows:
+                current = self.current_path(path)
+                if exists is None or exists(current):
+                    best = current
+                    break
+                best = best or current
+            if best and best not in found:
+                found.append(best)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def stats(self, top_authors: int = 10, top_keywords: int = 15) -> Dict[str, Any]:
+        """Full-history statistics read straight from the aggregate tables."""
+        first_ts, last_ts = self.conn.execute("SELECT MIN(first_ts), MAX(last_ts) FROM author_stats").fetchone()
+        return {
+            "total_commits": len(self),
+            "author_count": self.conn.execute("SELECT COUNT(*) FROM author_stats").fetchone()[0],
+            "top_authors": dict(self.conn.execute(
+                "SELECT author, commits FROM author_stats ORDER BY commits DESC LIMIT ?", (top_authors,)
+            ).fetchall()),
+            "types": dict(self.conn.execute("SELECT type, commits FROM type_stats ORDER BY commits DESC").fetchall()),
+            "keywords": dict(self.conn.execute(
+                "SELECT word, count FROM keyword_stats ORDER BY count DESC LIMIT ?", (top_keywords,)
+            ).fetchall()),
+            "first_commit_date": _iso(first_ts),
+            "last_commit_date": _iso(last_ts),
+        }
+
+    # -----------------------------
+    # Summaries (map-reduce timeline)
+    # -----------------------------
+    def get_summaries(self, keys: List[str]) -> Dict[str, str]:
+        """Cached summaries for the given content keys (missing keys omitted)."""
+        found: Dict[str, str] = {}
+        for i in range(0, len(keys), 500):  # stay under SQLite's variable limit
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self.conn.execute(
+                f"SELECT key, summary FROM summaries WHERE key IN ({placeholders})", chunk
+            ).fetchall())
+        return found
+
+    def put_summaries(self, rows: Iterable[Tuple[str, int, int, int, str]]):
+        """Store (key, level, start_ts, end_ts, summary) rows."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO summaries (key, level, start_ts, end_ts, summary) VALUES (?, ?, ?, ?, ?)",
+                list(rows),
+            )
+
+    def close(self):
+        self.conn.close()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def _iso(timestamp: Optional[int]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _git(repo_path: str, *args: str) -> Optional[str]:
+    result = subprocess.run(["git", *args], cwd=repo_path, capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def _git_ok(repo_path: str, *args: str) -> bool:
+    return subprocess.run(["git", *args], cwd=repo_path, capture_output=True).returncode == 0
@@ -1,58 +1,66 @@
 """
 Long-term memory backed by FAISS (via tools.rag_tool.RAGTool or direct usage).
 Provides add/search/save/load helper wrappers.
+
+The index and its texts are persisted with `RAGTool.save` and reloaded
+(memory-mapped) at startup, so existing memories are never re-encoded.
 """
 
 import os
 import json
 from typing import List, Tuple, Optional
+from tools.embedding_cache import EmbeddingCache
 from tools.rag_tool import RAGTool
 
 
 class LongTermMemory:
-    def __init__(self, persist_path: str = "memory_store"):
+    def __init__(self, persist_path: str = "memory_store", embedding_cache: Optional[EmbeddingCache] = None):
         os.makedirs(persist_path, exist_ok=True)
         self.persist_path = persist_path
-        self.rag = RAGTool()  # encapsulated sentence-transformers + faiss index
-        # a simple metadata list parallel to rag.text_store for persistence
+        self.rag = RAGTool(embedding_cache=embedding_cache)  # encapsulated sentence-transformers + faiss index
+        self._index_dir = os.path.join(self.persist_path, "long_term_index")
+        # legacy metadata list written by older versions (texts only, no vectors)
         self._meta_file = os.path.join(self.persist_path, "meta.json")
-        self._load_meta_if_exists()
+        self._load_if_exists()
 
-    def _load_meta_if_exists(self):
+    def _load_if_exists(self):
+        if self.rag.load(self._index_dir):
+            return
         if os.path.exists(self._meta_file):
             try:
                 with open(self._meta_file, "r", encoding="utf-8") as f:
                     meta = json.load(f)
-                    # If meta contains texts, re-add them to the RAG tool
-                    texts = [m.get("text") for m in meta if m.get("text")]
-                    if texts:
-                        self.rag.add_documents(texts)
+                # One-off migration: encode the legacy texts and persist the index
+                entries = [m for m in meta if m.get("text")]
+                if entries:
+                    self.rag.add_documents(
+                        [m["text"] for m in entries],
+                        metadatas=[m.get("metadata", {}) for m in entries],
+                    )
+                    self.save()
             except Exception:
                 pass
 
     def add(self, text: str, metadata: dict = None):
         """Add a document to long-term memory."""
         metadata = metadata or {}
-        self.rag.add_documents([text])
-        # persist minimal metadata
-        meta_entry = {"text": text, "metadata": metadata}
-        self._persist_meta_entry(meta_entry)
+        self.rag.add_documents([text], metadatas=[metadata])
+        self.save()
 
-    def _persist_meta_entry(self, entry: dict):
+    def save(self):
         try:
-            meta = []
-            if os.path.exists(self._meta_file):
-                with open(self._meta_file, "r", encoding="utf-8") as f:
-                    meta = json.load(f)
-            meta.append(entry)
-            with open(self._meta_file, "w", encoding="utf-8") as f:
-                json.dump(meta, f, ensure_ascii=False, indent=2)
+            self.rag.save(self._index_dir)
         except Exception:
             pass
 
-    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
-        """Return top-k similar documents (text, distance)."""
-        return self.rag.query(query, k=k)
+    def search(self, query: str, k: int = 5, mode: str = "hybrid") -> List[Tuple[str, float]]:
+        """Return the top-k documents as (text, score) pairs, best first.
+
+        With the default mode="hybrid" the score is a reciprocal rank fusion
+        score (higher is better); mode="vector" returns L2 distances (lower
+        is better), as in `RAGTool.query`.
+        """
+        return self.rag.query(query, k=k, mode=mode)
 
     def get_all_texts(self) -> List[str]:
         return self.rag.text_store
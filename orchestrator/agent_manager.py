@@ -7,7 +7,7 @@ This module wires agents together and exposes simple high-level APIs.
 """
 
 import asyncio
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Callable, Optional
 import time
 
@@ -21,21 +21,37 @@ class AgentManager:
         self.session_memory = session_memory
         self.max_workers = max_workers
         self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        # Let the Historian fan its map-reduce summaries out over the shared pool
+        if getattr(historian, "parallel_map", False) is None:
+            historian.parallel_map = self.run_parallel_on_commits
 
     # -----------------------------
     # Sequential flow
     # -----------------------------
-    def run_sequential(self) -> Dict[str, Any]:
+    def run_sequential(self, on_token: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
         """
         Run full sequential pipeline:
         1) Excavator.run() -> collect commits/files
         2) Historian.run(excavation_data) -> timeline summary
         3) Narrator.generate_report(...) -> final narrative
+
+        If `on_token` is given, LLM output is streamed to it as
+        on_token(stage, text) with stage "historian" or "narrative".
         """
         start = time.time()
         excavation_data = self.excavator.run()
-        hist_out = self.historian.run(excavation_data)
-        narrative = self.narrator.generate_report({**excavation_data, **hist_out})
+        if on_token is None:
+            hist_out = self.historian.run(excavation_data)
+            narrative = self.narrator.generate_report({**excavation_data, **hist_out})
+        else:
+            hist_out, timeline_tokens = self.historian.run_stream(excavation_data)
+            for token in timeline_tokens:
+                on_token("historian", token)
+            parts = []
+            for token in self.narrator.generate_report_stream({**excavation_data, **hist_out}):
+                parts.append(token)
+                on_token("narrative", token)
+            narrative = "".join(parts)
         end = time.time()
         return {
             "excavation": excavation_data,
@@ -51,16 +67,16 @@ class AgentManager:
         """
         Process commits in parallel using ThreadPoolExecutor.
         worker_fn(commit) is a synchronous function that returns a result.
+        Results are returned in the order of `commits`. The executor is
+        shared across calls, so it must not be shut down here.
         """
-        futures = []
+        futures = [self._executor.submit(worker_fn, c) for c in commits]
         results = []
-        with self._executor as ex:
-            futures = [ex.submit(worker_fn, c) for c in commits]
-            for future in as_completed(futures):
-                try:
-                    results.append(future.result())
-                except Exception as e:
-                    results.append({"error": str(e)})
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"error": str(e)})
         return results
 
     # -----------------------------
@@ -86,8 +102,8 @@ class AgentManager:
     # -----------------------------
     def historian_parallel_worker(self, commit_obj):
         """
-        Example worker that summarizes one commit using historian logic.
-        This expects historian.summarize_commit to exist; if not, adapt accordingly.
+        Worker that summarizes one commit using historian.summarize_commit,
+        falling back to the raw commit for historians without it.
         """
         try:
             # try to use historian.summarize_commit if implemented
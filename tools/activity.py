@@ -0,0 +1,284 @@
+"""
+Commit activity analytics, vectorised with NumPy.
+
+Commit timestamps are bucketed into calendar days, Monday-based weeks or
+months by integer arithmetic on datetime64 values. Every grouped series
+(per author, commit type or top-level directory) is a single
+`np.bincount` over a flattened (group, bin) index. On top of the series
+this module computes:
+
+- rolling means
+- bursts: bins well above their trailing baseline
+- lulls: stretches of near-silence
+- contributor curves: people joining, leaving and active per bin
+
+`activity_summary` reduces all of this to a small JSON-friendly dict for
+charts, and `describe_activity` turns that dict into a few prompt lines.
+Millions of commits take a fraction of a second.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tools.commit_classifier import TYPES
+from tools.commit_table import CommitTable
+
+FREQS = ("day", "week", "month")
+_DAY = 86400
+# Periods per week, used to report velocity as commits/week
+_WEEKS_PER_BIN = {"day": 1 / 7, "week": 1.0, "month": 30.44 / 7}
+
+
+class Binner(NamedTuple):
+    """Maps timestamps onto consecutive calendar bins shared by all series."""
+    freq: str
+    first: int    # key of bin 0 (days, weeks or months since the epoch)
+    n_bins: int
+
+    @classmethod
+    def for_timestamps(cls, timestamps: np.ndarray, freq: Optional[str] = None) -> "Binner":
+        freq = freq or choose_freq(timestamps)
+        if not len(timestamps):
+            return cls(freq, 0, 0)
+        keys = _keys(timestamps, freq)
+        return cls(freq, int(keys.min()), int(keys.max() - keys.min()) + 1)
+
+    def index(self, timestamps: np.ndarray) -> np.ndarray:
+        return np.clip(_keys(timestamps, self.freq) - self.first, 0, max(self.n_bins - 1, 0))
+
+    def labels(self) -> List[str]:
+        keys = np.arange(self.first, self.first + self.n_bins)
+        if self.freq == "month":
+            return [str(k) for k in keys.astype("datetime64[M]")]
+        days = keys * 7 - 3 if self.freq == "week" else keys
+        return [str(d) for d in days.astype("datetime64[D]")]
+
+
+def _keys(timestamps: np.ndarray, freq: str) -> np.ndarray:
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if freq == "month":
+        return timestamps.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+    days = timestamps // _DAY
+    if freq == "week":
+        return (days + 3) // 7  # 1970-01-01 was a Thursday; weeks start on Monday
+    return days
+
+
+def choose_freq(timestamps: np.ndarray) -> str:
+    """Months for multi-year histories, weeks for a few months, else days."""
+    if not len(timestamps):
+        return "week"
+    span_days = (int(np.max(timestamps)) - int(np.min(timestamps))) / _DAY
+    if span_days > 3 * 365:
+        return "month"
+    if span_days > 120:
+        return "week"
+    return "day"
+
+
+# -----------------------------
+# Series
+# -----------------------------
+def binned_counts(binner: Binner, timestamps: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    return np.bincount(binner.index(timestamps), weights=weights, minlength=binner.n_bins)
+
+
+def grouped_counts(binner: Binner, timestamps: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """(n_groups, n_bins) matrix of events per group and bin."""
+    flat = groups.astype(np.int64) * binner.n_bins + binner.index(timestamps)
+    return np.bincount(flat, minlength=n_groups * binner.n_bins).reshape(n_groups, binner.n_bins)
+
+
+def top_group_series(binner: Binner, timestamps: np.ndarray, groups: np.ndarray, names: Sequence[str],
+                     top: int = 5) -> Dict[str, np.ndarray]:
+    """Series for the `top` groups with most events, without a matrix over all groups."""
+    if not len(groups):
+        return {}
+    totals = np.bincount(groups, minlength=len(names))
+    chosen = np.argsort(-totals, kind="stable")[:top]
+    chosen = chosen[totals[chosen] > 0]
+    remap = np.full(len(names), -1, dtype=np.int64)
+    remap[chosen] = np.arange(len(chosen))
+    rows = remap[groups]
+    keep = rows >= 0
+    matrix = grouped_counts(binner, timestamps[keep], rows[keep], len(chosen))
+    return {names[g]: matrix[i] for i, g in enumerate(chosen)}
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over up to `window` bins (shorter at the start)."""
+    sums = np.cumsum(np.concatenate(([0.0], values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (sums[ends] - sums[starts]) / (ends - starts)
+
+
+def find_runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """Inclusive (start, end) index pairs of consecutive True values."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1).tolist(), (np.flatnonzero(edges == -1) - 1).tolist()))
+
+
+def detect_bursts(counts: np.ndarray, window: int = 8, factor: float = 2.0,
+                  min_count: int = 5) -> List[Tuple[int, int]]:
+    """Runs of bins with at least `factor` times the mean of the preceding `window` bins.
+
+    The first `window // 2` bins have too little history for a baseline
+    and are never reported.
+    """
+    if len(counts) < 2:
+        return []
+    baseline = np.empty(len(counts))
+    baseline[1:] = rolling_mean(counts, window)[:-1]
+    baseline[0] = counts.mean()
+    baseline = np.maximum(baseline, 1.0)
+    settled = np.arange(len(counts)) >= window // 2
+    return find_runs((counts >= factor * baseline) & (counts >= min_count) & settled)
+
+
+def detect_lulls(counts: np.ndarray, window: int = 4, factor: float = 0.25,
+                 min_length: int = 3) -> List[Tuple[int, int]]:
+    """Runs of at least `min_length` bins whose smoothed activity is under `factor` x the mean."""
+    if not len(counts):
+        return []
+    smoothed = rolling_mean(counts, window)
+    quiet = (smoothed < factor * counts.mean()) & (counts <= factor * counts.mean())
+    return [(s, e) for s, e in find_runs(quiet) if e - s + 1 >= min_length]
+
+
+def contributor_curves(binner: Binner, timestamps: np.ndarray, author_ids: np.ndarray, n_authors: int,
+                       grace: int = 3) -> Dict[str, np.ndarray]:
+    """Authors joining (first commit), leaving (last commit) and active per bin.
+
+    Authors whose last commit falls in the final `grace` bins are treated
+    as still active, not as having left.
+    """
+    bins = binner.index(timestamps)
+    first = np.full(n_authors, binner.n_bins, dtype=np.int64)
+    last = np.full(n_authors, -1, dtype=np.int64)
+    np.minimum.at(first, author_ids, bins)
+    np.maximum.at(last, author_ids, bins)
+    seen = last >= 0
+    first, last = first[seen], last[seen]
+
+    joined = np.bincount(first, minlength=binner.n_bins)
+    ended = np.bincount(last, minlength=binner.n_bins)
+    # Active in bin b: first <= b <= last
+    active = np.cumsum(joined) - (np.cumsum(ended) - ended)
+    left = ended.copy()
+    left[max(binner.n_bins - grace, 0):] = 0
+    return {"joined": joined, "left": left, "active": active}
+
+
+# -----------------------------
+# Summaries
+# -----------------------------
+def activity_summary(table: CommitTable, directories: Optional[Tuple[np.ndarray, np.ndarray, List[str]]] = None,
+                     freq: Optional[str] = None, top: int = 5, window: int = 4) -> Dict[str, Any]:
+    """Binned series and detected events for a commit table, as plain lists and dicts.
+
+    `directories` is the (timestamps, directory ids, names) triple from
+    `CommitCache.directory_activity`, for per-directory series.
+    """
+    timestamps = table.timestamps
+    binner = Binner.for_timestamps(timestamps, freq)
+    if not binner.n_bins:
+        return {}
+    labels = binner.labels()
+    counts = binned_counts(binner, timestamps)
+    types = table.type_codes()
+
+    def span(run: Tuple[int, int]) -> Dict[str, Any]:
+        start, end = run
+        return {"start": labels[start], "end": labels[end], "commits": int(counts[start:end + 1].sum())}
+
+    bursts = []
+    for run in detect_bursts(counts, window=2 * window):
+        event = span(run)
+        before = counts[max(run[0] - 2 * window, 0):run[0]]
+        event["baseline"] = round(float(before.mean()), 1) if len(before) else 0.0
+        bursts.append(event)
+
+    by_directory: Dict[str, np.ndarray] = {}
+    if directories is not None and len(directories[0]):
+        dir_timestamps, dir_ids, names = directories
+        by_directory = top_group_series(binner, dir_timestamps, dir_ids, names, top)
+
+    return {
+        "freq": binner.freq,
+        "periods": labels,
+        "commits": counts.tolist(),
+        "rolling_mean": np.round(rolling_mean(counts, window), 2).tolist(),
+        "lines_changed": binned_counts(binner, timestamps, table.added + table.deleted).astype(np.int64).tolist(),
+        "by_author": _lists(top_group_series(binner, timestamps, table.author_ids, table.authors, top)),
+        "by_type": _lists(top_group_series(binner, timestamps, types, TYPES, len(TYPES))),
+        "by_directory": _lists(by_directory),
+        "bursts": bursts,
+        "lulls": [span(run) for run in detect_lulls(counts, window=window)],
+        "contributors": _lists(contributor_curves(binner, timestamps, table.author_ids, len(table.authors))),
+        "velocity": _velocity(timestamps, counts, binner.freq),
+    }
+
+
+def _lists(series: Dict[str, np.ndarray]) -> Dict[str, List[int]]:
+    return {name: values.tolist() for name, values in series.items()}
+
+
+def _velocity(timestamps: np.ndarray, counts: np.ndarray, freq: str, days: int = 90) -> Dict[str, float]:
+    """Commits/week overall and over the last `days` days vs the `days` before."""
+    end = int(timestamps.max())
+    recent = int(np.count_nonzero(timestamps > end - days * _DAY))
+    previous = int(np.count_nonzero((timestamps > end - 2 * days * _DAY) & (timestamps <= end - days * _DAY)))
+    weeks = days / 7
+    velocity = {
+        "commits_per_week": round(counts.sum() / (len(counts) * _WEEKS_PER_BIN[freq]), 2),
+        "recent_commits_per_week": round(recent / weeks, 2),
+        "previous_commits_per_week": round(previous / weeks, 2),
+    }
+    if previous:
+        velocity["trend_pct"] = round(100.0 * (recent - previous) / previous, 1)
+    return velocity
+
+
+def describe_activity(summary: Dict[str, Any], max_events: int = 4) -> List[str]:
+    """Compact prompt lines for an `activity_summary`."""
+    if not summary:
+        return []
+    lines = []
+    v = summary["velocity"]
+    trend = f", {v['trend_pct']:+.0f}% vs the 90 days before" if "trend_pct" in v else ""
+    lines.append(f"Velocity: {v['commits_per_week']} commits/week overall; "
+                 f"{v['recent_commits_per_week']}/week in the last 90 days{trend}")
+
+    periods, commits = summary["periods"], summary["commits"]
+    busiest = int(np.argmax(commits))
+    lines.append(f"Activity per {summary['freq']}: peak {commits[busiest]} commits in {periods[busiest]}, "
+                 f"{sum(1 for c in commits if c == 0)} of {len(commits)} {summary['freq']}s without commits")
+    if summary["bursts"]:
+        bursts = sorted(summary["bursts"], key=lambda b: -b["commits"])[:max_events]
+        lines.append("Bursts: " + "; ".join(
+            f"{_period(b)} ({b['commits']} commits vs ~{b['baseline']} typical)" for b in bursts))
+    if summary["lulls"]:
+        lulls = sorted(summary["lulls"], key=lambda s: s["start"])[-max_events:]
+        lines.append("Lulls: " + "; ".join(f"{_period(s)} ({s['commits']} commits)" for s in lulls))
+
+    active = summary["contributors"]["active"]
+    joined = summary["contributors"]["joined"]
+    left = summary["contributors"]["left"]
+    peak = int(np.argmax(active))
+    lines.append(f"Contributors: peak {active[peak]} active in {periods[peak]}, {active[-1]} active in the latest "
+                 f"{summary['freq']}; {sum(joined)} joined and {sum(left)} stopped contributing over the history")
+
+    recent = slice(-max(len(periods) // 8, 1), None)
+    for key, title in (("by_type", "Recent commit mix"), ("by_directory", "Recent focus by directory")):
+        totals = {name: sum(values[recent]) for name, values in summary[key].items()}
+        totals = {name: n for name, n in sorted(totals.items(), key=lambda kv: -kv[1]) if n}
+        if totals:
+            lines.append(f"{title} (last {len(periods[recent])} {summary['freq']}s): "
+                         + ", ".join(f"{name} {n}" for name, n in totals.items()))
+    return lines
+
+
+def _period(event: Dict[str, Any]) -> str:
+    return event["start"] if event["start"] == event["end"] else f"{event['start']} to {event['end']}"
@@ -0,0 +1,177 @@
+"""
+Long-lived `git cat-file --batch` blob reader.
+
+Starting `git show` for every file-at-commit costs a process spawn per
+blob. `BlobReader` instead keeps a small pool of `git cat-file --batch`
+processes open per repository. Each request is an object name such as
+`<rev>:<path>` or a blob SHA, and the content comes back as raw bytes.
+
+`read_many` pipelines requests: it writes a window of request lines,
+then reads the same number of responses. A window is kept smaller than
+the pipe buffer, so the writer can never block while git waits on a full
+stdout. Large batches are split across the pool's processes, one thread
+each. Each process is used by one thread at a time, so a reader can be
+shared freely between threads.
+"""
+
+import atexit
+import os
+import queue
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Request bytes written before reading responses back; below the usual 64 KiB pipe buffer
+_WINDOW_BYTES = 32 * 1024
+# Below this many requests a batch is not split across processes
+_PARALLEL_MIN = 256
+
+
+class _CatFile:
+    """One `git cat-file --batch` process."""
+
+    def __init__(self, repo_path: str):
+        self.proc = subprocess.Popen(["git", "-C", repo_path, "cat-file", "--batch"],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def read_many(self, specs: Sequence[str]) -> List[Optional[Tuple[bytes, bytes]]]:
+        """(object type, content) per spec, None where the object is missing."""
+        requests = [_request(s) for s in specs]
+        results: List[Optional[Tuple[bytes, bytes]]] = []
+        start = 0
+        while start < len(requests):
+            end, size = start, 0
+            while end < len(requests) and (end == start or size + len(requests[end]) <= _WINDOW_BYTES):
+                size += len(requests[end])
+                end += 1
+            self.proc.stdin.write(b"".join(requests[start:end]))
+            self.proc.stdin.flush()
+            results.extend(self._read_response() for _ in range(end - start))
+            start = end
+        return results
+
+    def _read_response(self) -> Optional[Tuple[bytes, bytes]]:
+        header = self.proc.stdout.readline()
+        if not header:
+            raise BrokenPipeError("git cat-file exited")
+        if header.endswith((b" missing\n", b" ambiguous\n")):
+            return None
+        _, obj_type, size = header.rsplit(b" ", 2)
+        content = self.proc.stdout.read(int(size) + 1)  # content plus trailing newline
+        return obj_type, content[:-1]
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        self.proc.stdout.close()
+        self.proc.wait()
+
+
+def _request(spec: str) -> bytes:
+    # Newlines would split the request; ask for an object that cannot exist instead
+    return (spec if "\n" not in spec else "0" * 40).encode("utf-8", "surrogateescape") + b"\n"
+
+
+class BlobReader:
+    def __init__(self, repo_path: str, pool_size: int = 4):
+        self.repo_path = repo_path
+        self.pool_size = pool_size
+        self._idle: "queue.LifoQueue[_CatFile]" = queue.LifoQueue()
+        self._started = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    # -----------------------------
+    # Process pool
+    # -----------------------------
+    def _acquire(self) -> _CatFile:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BlobReader is closed")
+            if self._idle.empty() and self._started < self.pool_size:
+                self._started += 1
+                return _CatFile(self.repo_path)
+        return self._idle.get()
+
+    def _release(self, proc: Optional[_CatFile]):
+        if proc is not None:
+            self._idle.put(proc)
+            return
+        with self._lock:
+            self._started -= 1
+
+    def _run(self, specs: Sequence[str]) -> List[Optional[Tuple[bytes, bytes]]]:
+        """Read on one pooled process; a process that died is replaced once."""
+        for attempt in range(2):
+            proc = self._acquire()
+            try:
+                results = proc.read_many(specs)
+            except (BrokenPipeError, OSError, ValueError):
+                proc.close()
+                self._release(None)
+                if attempt:
+                    return [None] * len(specs)
+                continue
+            self._release(proc)
+            return results
+        return [None] * len(specs)
+
+    # -----------------------------
+    # Reading
+    # -----------------------------
+    def read_objects(self, specs: Sequence[str]) -> List[Optional[Tuple[bytes, bytes]]]:
+        """(object type, content) for each object name, split across the pool when large."""
+        specs = list(specs)
+        if len(specs) < _PARALLEL_MIN or self.pool_size == 1:
+            return self._run(specs)
+        size = -(-len(specs) // self.pool_size)
+        chunks = [specs[i:i + size] for i in range(0, len(specs), size)]
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            return [result for chunk in pool.map(self._run, chunks) for result in chunk]
+
+    def read_many(self, specs: Sequence[str]) -> List[Optional[bytes]]:
+        """Blob bytes for each spec (`<rev>:<path>` or a blob SHA); None if missing or not a blob."""
+        return [obj[1] if obj is not None and obj[0] == b"blob" else None for obj in self.read_objects(specs)]
+
+    def read(self, rev: str, path: str) -> Optional[bytes]:
+        return self.read_many([f"{rev}:{path}"])[0]
+
+    def read_at(self, rev: str, paths: Iterable[str]) -> Dict[str, bytes]:
+        """Contents of many paths at one revision; missing paths are left out."""
+        paths = list(paths)
+        return {p: data for p, data in zip(paths, self.read_many([f"{rev}:{p}" for p in paths])) if data is not None}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while not self._idle.empty():
+            self._idle.get().close()
+
+    def __enter__(self) -> "BlobReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_readers: Dict[str, BlobReader] = {}
+_readers_lock = threading.Lock()
+
+
+def get_blob_reader(repo_path: str) -> BlobReader:
+    """Process-wide reader per repository, closed at interpreter exit."""
+    key = os.path.realpath(repo_path)
+    with _readers_lock:
+        reader = _readers.get(key)
+        if reader is None:
+            reader = _readers[key] = BlobReader(key)
+        return reader
+
+
+@atexit.register
+def _close_readers():
+    for reader in list(_readers.values()):
+        reader.close()
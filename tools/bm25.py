@@ -0,0 +1,117 @@
+"""
+Inverted-index BM25 retriever with identifier-aware tokenisation.
+
+Identifiers are indexed both whole and split on snake_case and camelCase
+boundaries, so a query for `_identify_hotspots` matches that exact name
+strongly while "hotspots" still matches it partially. Results can be
+fused with vector search through reciprocal rank fusion.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_STATE_FILE = "bm25.json"
+
+
+def tokenize_code(text: str) -> List[str]:
+    """Lower-cased identifier tokens plus their snake/camel sub-words."""
+    tokens = []
+    for match in _IDENTIFIER.finditer(text):
+        word = match.group()
+        whole = word.strip("_").lower()
+        if not whole:
+            continue
+        tokens.append(whole)
+        parts = [p.lower() for piece in word.split("_") if piece for p in _CAMEL_PART.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> parallel arrays of document ids and term frequencies
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_lengths = array("i")
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, documents: Iterable[str]):
+        for text in documents:
+            doc_id = len(self.doc_lengths)
+            tokens = tokenize_code(text)
+            self.doc_lengths.append(len(tokens))
+            self.total_length += len(tokens)
+            for term, tf in Counter(tokens).items():
+                ids, tfs = self.postings.setdefault(term, (array("i"), array("i")))
+                ids.append(doc_id)
+                tfs.append(tf)
+
+    def search(self, query: str, k: int = 10,
+               allowed: Optional[Callable[[int], bool]] = None) -> List[Tuple[int, float]]:
+        """Return up to k (doc_id, score) pairs, best first."""
+        n = len(self.doc_lengths)
+        if n == 0:
+            return []
+        avg_length = self.total_length / n or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize_code(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            ids, tfs = posting
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            for doc_id, tf in zip(ids, tfs):
+                if allowed is not None and not allowed(doc_id):
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        state = {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_lengths": self.doc_lengths.tolist(),
+            "postings": {term: [ids.tolist(), tfs.tolist()] for term, (ids, tfs) in self.postings.items()},
+        }
+        with open(os.path.join(directory, _STATE_FILE), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        path = os.path.join(directory, _STATE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        index = cls(state.get("k1", 1.2), state.get("b", 0.75))
+        index.doc_lengths = array("i", state["doc_lengths"])
+        index.total_length = sum(index.doc_lengths)
+        index.postings = {term: (array("i", ids), array("i", tfs)) for term, (ids, tfs) in state["postings"].items()}
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse several ranked id lists; returns (id, fused score), best first."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
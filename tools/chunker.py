@@ -0,0 +1,264 @@
+"""
+Syntax-aware source chunking.
+
+Source files are split into top-level units (functions, classes and the
+statements between them) and those units are packed greedily into chunks
+of roughly `chunk_size` bytes. Python uses `ast` line spans; brace
+languages (JS/TS/Java/Go/C-like) use a scanner that skips strings and
+comments; anything else is split on blank lines. Every chunk records the
+1-based, inclusive line span it covers so answers can cite exact locations.
+"""
+
+import ast
+import os
+import re
+from itertools import accumulate
+from typing import List, NamedTuple, Optional
+
+PYTHON_EXTENSIONS = {".py", ".pyi"}
+BRACE_EXTENSIONS = {
+    ".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".java", ".go", ".rs",
+    ".c", ".h", ".cc", ".cpp", ".hpp", ".cs", ".kt", ".scala", ".swift", ".php",
+}
+
+# Structural tokens for brace languages; strings and comments are matched
+# (and therefore skipped) as whole tokens so their braces never count.
+_BRACE_TOKENS = re.compile(
+    r"//[^\n]*|/\*.*?\*/|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`|[{}\n;]",
+    re.S,
+)
+_BRACE_NAME = re.compile(
+    r"\b(class|interface|enum|struct|trait|impl|function|func|fn|def|type)\s+([A-Za-z_$][\w$]*)"
+    r"|\b([A-Za-z_$][\w$]*)\s*(?:=|:)\s*(?:async\s*)?(?:function\b|\([^)]*\)\s*=>)"
+    r"|\b([A-Za-z_$][\w$]*)\s*\([^;{]*\)\s*(?:throws\s+[\w.,\s]+)?\{"
+)
+_BLANK_RUN = re.compile(r"\n[ \t]*\n")
+_NESTED_DEF = re.compile(
+    r"[ \t]+(?:@|(?:async\s+)?def\s|class\s|function\s|(?:(?:public|private|protected|static|async)\s+)+[\w<>\[\]]+\s*\()"
+)
+
+
+class Block(NamedTuple):
+    """A top-level unit of a source file (1-based, inclusive lines)."""
+    name: Optional[str]
+    kind: str  # "function", "class" or "statement"
+    start_line: int
+    end_line: int
+
+
+class Chunk(NamedTuple):
+    text: str
+    start_line: int
+    end_line: int
+
+
+def language_family(filename: str) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in PYTHON_EXTENSIONS:
+        return "python"
+    if ext in BRACE_EXTENSIONS:
+        return "brace"
+    return "text"
+
+
+def top_level_blocks(content: str, filename: str) -> List[Block]:
+    """Return the top-level definition blocks of a source file."""
+    family = language_family(filename)
+    if family == "python":
+        blocks = _python_blocks(content)
+        if blocks is not None:
+            return blocks
+        return _indent_blocks(content)
+    if family == "brace":
+        return _brace_blocks(content)
+    return _paragraph_blocks(content)
+
+
+def chunk_source(content: str, filename: str, chunk_size: int = 1000) -> List[Chunk]:
+    """Split a file into chunks cut at top-level definition boundaries.
+
+    Units are packed with a running byte count, so the work is linear in
+    the size of the file. A single unit larger than `chunk_size` is split
+    on line boundaries.
+    """
+    lines = content.split("\n")
+    if not content.strip():
+        return []
+    # offsets[i] is the byte offset at which (1-based) line i+1 starts
+    offsets = [0, *accumulate(len(line) + 1 for line in lines)]
+
+    def span_size(start: int, end: int) -> int:
+        return offsets[end] - offsets[start - 1]
+
+    chunks: List[Chunk] = []
+
+    def emit(start: int, end: int):
+        body = "\n".join(lines[start - 1:end])
+        if body.strip():
+            chunks.append(Chunk(f"### {filename}:{start}-{end} ###\n{body}", start, end))
+
+    current_start, current_end = None, None
+    for start, end in _covering_spans(top_level_blocks(content, filename), len(lines)):
+        size = span_size(start, end)
+        if current_start is not None and span_size(current_start, current_end) + size > chunk_size:
+            emit(current_start, current_end)
+            current_start = None
+        if size > chunk_size:
+            for piece_start, piece_end in _split_lines(lines, offsets, start, end, chunk_size):
+                emit(piece_start, piece_end)
+            continue
+        if current_start is None:
+            current_start = start
+        current_end = end
+    if current_start is not None:
+        emit(current_start, current_end)
+    return chunks
+
+
+def _covering_spans(blocks: List[Block], line_count: int) -> List[tuple]:
+    """Turn blocks into contiguous spans covering every line.
+
+    Lines between blocks (comments, blank lines) are attached to the block
+    that follows them so leading comments stay with their definition.
+    """
+    spans = []
+    next_start = 1
+    for block in blocks:
+        if block.end_line < next_start:
+            continue
+        spans.append((next_start, max(block.end_line, next_start)))
+        next_start = block.end_line + 1
+    if next_start <= line_count:
+        spans.append((next_start, line_count))
+    return spans
+
+
+def _split_lines(lines: List[str], offsets: List[int], start: int, end: int, chunk_size: int):
+    """Split an oversized span, preferring to cut before nested definitions."""
+    piece_start = start
+    boundary = None  # last nested definition line seen in the current piece
+    for line in range(start, end + 1):
+        if line > piece_start and offsets[line] - offsets[piece_start - 1] > chunk_size:
+            cut = boundary if boundary and boundary > piece_start else line
+            yield piece_start, cut - 1
+            piece_start = cut
+            boundary = None
+        if line > piece_start and _NESTED_DEF.match(lines[line - 1]) and not lines[line - 2].lstrip().startswith("@"):
+            boundary = line
+    yield piece_start, end
+
+
+# -----------------------------
+# Python
+# -----------------------------
+def _python_blocks(content: str) -> Optional[List[Block]]:
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+
+    blocks = []
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        end = getattr(node, "end_lineno", None) or node.lineno
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            blocks.append(Block(node.name, "function", start, end))
+        elif isinstance(node, ast.ClassDef):
+            blocks.append(Block(node.name, "class", start, end))
+        else:
+            blocks.append(Block(None, "statement", start, end))
+    return blocks
+
+
+_PY_DEF = re.compile(r"(?:async\s+def|def|class)\s+([A-Za-z_]\w*)")
+
+
+def _indent_blocks(content: str) -> List[Block]:
+    """Fallback for Python that does not parse: cut at unindented defs."""
+    blocks = []
+    start, name, kind = 1, None, "statement"
+    in_decorators = False
+    for lineno, line in enumerate(content.split("\n"), start=1):
+        match = _PY_DEF.match(line)
+        is_decorator = line.startswith("@")
+        if (match or is_decorator) and not in_decorators and lineno > start:
+            blocks.append(Block(name, kind, start, lineno - 1))
+            start, name, kind = lineno, None, "statement"
+        if match:
+            name = match.group(1)
+            kind = "class" if line.startswith("class") else "function"
+        in_decorators = is_decorator
+    blocks.append(Block(name, kind, start, content.count("\n") + 1))
+    return blocks
+
+
+# -----------------------------
+# Brace languages
+# -----------------------------
+def _brace_blocks(content: str) -> List[Block]:
+    blocks = []
+    depth = 0
+    line = 1
+    block_start = None
+    header_start = header_end = 0
+    line_start = 0
+    for match in _BRACE_TOKENS.finditer(content):
+        token = match.group()
+        if token == "\n":
+            line += 1
+            line_start = match.end()
+            continue
+        if token[0] in "/\"'`":
+            newlines = token.count("\n")  # multi-line comments and template strings
+            if newlines:
+                line += newlines
+                line_start = match.start() + token.rfind("\n") + 1
+            continue
+        if block_start is None:
+            block_start, header_start = line, line_start
+            header_end = None
+        if token == "{":
+            if depth == 0 and header_end is None:
+                header_end = match.start()
+            depth += 1
+        elif token == "}":
+            depth = max(depth - 1, 0)
+            if depth == 0:
+                header = content[header_start:header_end if header_end is not None else match.start()]
+                blocks.append(_named_block(header, block_start, line))
+                block_start = None
+        elif token == ";" and depth == 0:
+            blocks.append(Block(None, "statement", block_start, line))
+            block_start = None
+    if block_start is not None:
+        blocks.append(Block(None, "statement", block_start, line))
+    return blocks
+
+
+def _named_block(header: str, start: int, end: int) -> Block:
+    match = _BRACE_NAME.search(header + "{")
+    if not match:
+        return Block(None, "statement", start, end)
+    if match.group(2):
+        keyword = match.group(1)
+        kind = "function" if keyword in ("function", "func", "fn", "def") else "class"
+        return Block(match.group(2), kind, start, end)
+    return Block(match.group(3) or match.group(4), "function", start, end)
+
+
+# -----------------------------
+# Plain text
+# -----------------------------
+def _paragraph_blocks(content: str) -> List[Block]:
+    blocks = []
+    start = 1
+    line = 1
+    position = 0
+    for match in _BLANK_RUN.finditer(content):
+        line += content.count("\n", position, match.start())
+        position = match.start()
+        if line >= start:
+            blocks.append(Block(None, "statement", start, line))
+        start = line + 1
+    blocks.append(Block(None, "statement", start, content.count("\n") + 1))
+    return blocks
@@ -0,0 +1,160 @@
+"""
+Streaming commit reader built on a single `git log --numstat` pass.
+
+Commits are yielded one at a time as compact `CommitRecord` tuples that
+carry per-file added/deleted line counts, so callers never hold the full
+history in memory and no diff is computed more than once.
+"""
+
+import subprocess
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+# Field/record separators used in the --format string; git never emits
+# these bytes inside author names or subjects.
+_RECORD_SEP = b"\x1e"
+_FIELD_SEP = b"\x1f"
+_LOG_FORMAT = "%x1e%H%x1f%P%x1f%an%x1f%ae%x1f%ct%x1f%s"
+_READ_SIZE = 1 << 16
+
+
+class FileChange(NamedTuple):
+    path: str
+    added: int
+    deleted: int
+    old_path: Optional[str] = None  # set when git detected a rename
+
+
+class CommitRecord(NamedTuple):
+    sha: str
+    parents: tuple
+    author: str
+    email: str
+    timestamp: int
+    message: str
+    files: tuple  # tuple of FileChange
+
+    @property
+    def short_sha(self) -> str:
+        return self.sha[:7]
+
+    @property
+    def added(self) -> int:
+        return sum(f.added for f in self.files)
+
+    @property
+    def deleted(self) -> int:
+        return sum(f.deleted for f in self.files)
+
+
+def iter_commit_records(
+    repo_path: str,
+    revisions: Sequence[str] = ("HEAD",),
+    max_count: Optional[int] = None,
+    paths: Optional[Sequence[str]] = None,
+    detect_renames: bool = True,
+    reverse: bool = False,
+) -> Iterator[CommitRecord]:
+    """Yield commits reachable from `revisions` with their numstat.
+
+    `revisions` is passed straight to `git log`, so exclusions such as
+    `["HEAD", "^<old-head>"]` restrict the walk to new commits only.
+    Binary files are reported with zero added/deleted lines.
+    """
+    cmd = ["git", "log", "-z", "--numstat", f"--format={_LOG_FORMAT}"]
+    cmd.append("-M" if detect_renames else "--no-renames")
+    if max_count is not None:
+        cmd.append(f"--max-count={max_count}")
+    if reverse:
+        cmd.append("--reverse")
+    cmd.extend(revisions)
+    cmd.append("--")
+    if paths:
+        cmd.extend(paths)
+
+    for raw in iter_log_records(repo_path, cmd):
+        yield _parse_record(raw)
+
+
+def iter_log_records(repo_path: str, cmd: Sequence[str]) -> Iterator[bytes]:
+    """Run a `git log` command whose format starts with %x1e and yield raw records.
+
+    Raises `subprocess.CalledProcessError` once the output ends if git exited
+    with an error, so a truncated walk is never mistaken for a complete one.
+    """
+    proc = subprocess.Popen(list(cmd), cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        # Pieces of the record being read; only new blocks are searched for
+        # separators, so a huge record (a vendoring patch) costs linear time
+        pending: List[bytes] = []
+        while True:
+            block = proc.stdout.read(_READ_SIZE)
+            if not block:
+                break
+            parts = block.split(_RECORD_SEP)
+            if len(parts) == 1:
+                pending.append(block)
+                continue
+            pending.append(parts[0])
+            raw = b"".join(pending)
+            if raw:
+                yield raw
+            for raw in parts[1:-1]:
+                if raw:
+                    yield raw
+            pending = [parts[-1]]  # last part may be incomplete
+        # The last record is only complete if git finished cleanly
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, list(cmd))
+        raw = b"".join(pending)
+        if raw:
+            yield raw
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+
+
+def _parse_record(raw: bytes) -> CommitRecord:
+    header, _, body = raw.partition(b"\0")
+    sha, parents, author, email, timestamp, message = (
+        field.decode("utf-8", errors="replace") for field in header.split(_FIELD_SEP, 5)
+    )
+    return CommitRecord(
+        sha=sha,
+        parents=tuple(parents.split()),
+        author=author,
+        email=email,
+        timestamp=int(timestamp or 0),
+        message=message,
+        files=tuple(_parse_numstat(body)),
+    )
+
+
+def _parse_numstat(body: bytes) -> List[FileChange]:
+    """Parse `-z` numstat entries.
+
+    Plain entries look like `added\\tdeleted\\tpath\\0`; renames leave the
+    path empty and follow it with `old\\0new\\0`.
+    """
+    tokens = body.lstrip(b"\n").split(b"\0")
+    changes = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i].lstrip(b"\n")
+        i += 1
+        if not token:
+            continue
+        fields = token.split(b"\t", 2)
+        if len(fields) != 3:
+            continue
+        added = int(fields[0]) if fields[0].isdigit() else 0
+        deleted = int(fields[1]) if fields[1].isdigit() else 0
+        if fields[2]:
+            changes.append(FileChange(fields[2].decode("utf-8", errors="replace"), added, deleted))
+        elif i + 1 < len(tokens):
+            old_path = tokens[i].decode("utf-8", errors="replace")
+            new_path = tokens[i + 1].decode("utf-8", errors="replace")
+            i += 2
+            changes.append(FileChange(new_path, added, deleted, old_path))
+    return changes
@@ -0,0 +1,227 @@
+"""
+Columnar in-memory commit table.
+
+Agents used to pass commits around as a list of dicts, one dict and a
+handful of string objects per commit. `CommitTable` keeps the same data
+as NumPy columns instead:
+
+- SHAs as fixed-width ASCII bytes, timestamps and line counts as ints
+- authors dictionary-encoded: an int32 id per commit plus one list of names
+- messages in one UTF-8 buffer with an offset per commit
+- the commit type as an int8 index into `TYPES` (-1 until classified)
+
+Aggregations (commits per author, per time bucket, per commit type) run
+vectorised over the columns. Indexing a row returns the same dict the
+old lists held (`hash`, `sha`, `author`, `date`, `message`,
+`files_changed`), built lazily, so code that iterates commits as dicts
+keeps working.
+"""
+
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from tools.commit_classifier import TYPES, ClassifiedBatch, CommitClassifier, get_classifier
+from tools.commit_stream import CommitRecord
+
+# numpy datetime64 units for bucket_counts
+_BUCKET_UNITS = {"day": "D", "week": "W", "month": "M", "year": "Y"}
+
+
+class CommitTable(Sequence):
+    def __init__(self, shas: np.ndarray, timestamps: np.ndarray, author_ids: np.ndarray, authors: List[str],
+                 files_changed: np.ndarray, added: np.ndarray, deleted: np.ndarray,
+                 message_buffer: bytes, message_offsets: np.ndarray, types: Optional[np.ndarray] = None):
+        self.shas = shas                        # S40 ASCII hex
+        self.timestamps = timestamps            # int64 unix seconds
+        self.author_ids = author_ids            # int32 index into authors
+        self.authors = authors
+        self.files_changed = files_changed      # int32
+        self.added = added                      # int32
+        self.deleted = deleted                  # int32
+        self.message_buffer = message_buffer    # UTF-8, messages back to back
+        self.message_offsets = message_offsets  # int64, len(table) + 1
+        self.types = types if types is not None else np.full(len(timestamps), -1, dtype=np.int8)
+        self._batch: Optional[ClassifiedBatch] = None
+
+    # -----------------------------
+    # Construction
+    # -----------------------------
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple]) -> "CommitTable":
+        """Build from (sha, author, timestamp, message, files_changed, added, deleted[, type]) rows."""
+        shas, timestamps, author_ids, files_changed, added, deleted, types = [], [], [], [], [], [], []
+        author_index: Dict[str, int] = {}
+        messages = []
+        for row in rows:
+            sha, author, timestamp, message, n_files, n_added, n_deleted = row[:7]
+            commit_type = row[7] if len(row) > 7 else None
+            types.append(-1 if commit_type is None else commit_type)
+            shas.append(sha or "")
+            timestamps.append(timestamp or 0)
+            author_ids.append(author_index.setdefault(author or "unknown", len(author_index)))
+            messages.append((message or "").encode("utf-8"))
+            files_changed.append(n_files or 0)
+            added.append(n_added or 0)
+            deleted.append(n_deleted or 0)
+
+        lengths = np.fromiter((len(m) for m in messages), dtype=np.int64, count=len(messages))
+        return cls(
+            shas=np.array(shas, dtype="S40"),
+            timestamps=np.array(timestamps, dtype=np.int64),
+            author_ids=np.array(author_ids, dtype=np.int32),
+            authors=list(author_index),
+            files_changed=np.array(files_changed, dtype=np.int32),
+            added=np.array(added, dtype=np.int32),
+            deleted=np.array(deleted, dtype=np.int32),
+            message_buffer=b"".join(messages),
+            message_offsets=np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+            types=np.array(types, dtype=np.int8),
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[CommitRecord]) -> "CommitTable":
+        return cls.from_rows(
+            (r.sha, r.author, r.timestamp, r.message, len(r.files), r.added, r.deleted) for r in records
+        )
+
+    @classmethod
+    def from_dicts(cls, commits: Iterable[Dict[str, Any]]) -> "CommitTable":
+        """Build from the legacy commit dicts (as returned by the git tools)."""
+        return cls.from_rows(
+            (c.get("sha") or c.get("hash", ""), c.get("author", "unknown"), _parse_date(c.get("date")),
+             c.get("message", ""), c.get("files_changed", 0), c.get("added", 0), c.get("deleted", 0))
+            for c in commits
+        )
+
+    @classmethod
+    def empty(cls) -> "CommitTable":
+        return cls.from_rows(())
+
+    # -----------------------------
+    # Row access (lazy dict view)
+    # -----------------------------
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, index: Union[int, slice, np.ndarray]):
+        if isinstance(index, (slice, np.ndarray, list)):
+            return self.take(np.arange(len(self))[index])
+        i = int(index)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("commit index out of range")
+        sha = self.shas[i].decode("ascii")
+        return {
+            "hash": sha[:7],
+            "sha": sha,
+            "author": self.authors[self.author_ids[i]],
+            "date": datetime.fromtimestamp(int(self.timestamps[i]), timezone.utc).isoformat(),
+            "message": self.message(i),
+            "files_changed": int(self.files_changed[i]),
+        }
+
+    def __repr__(self) -> str:
+        if not len(self):
+            return "CommitTable(0 commits)"
+        first, last = (datetime.fromtimestamp(int(t), timezone.utc).date()
+                       for t in (self.timestamps.min(), self.timestamps.max()))
+        return f"CommitTable({len(self)} commits, {len(self.authors)} authors, {first} to {last})"
+
+    def message(self, i: int) -> str:
+        return self.message_buffer[self.message_offsets[i]:self.message_offsets[i + 1]].decode("utf-8", "replace")
+
+    def messages(self) -> List[str]:
+        return [self.message(i) for i in range(len(self))]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [self[i] for i in range(len(self))]
+
+    def take(self, indices: Iterable[int]) -> "CommitTable":
+        """Sub-table of the given rows, in the given order."""
+        indices = np.asarray(indices, dtype=np.int64)
+        starts, ends = self.message_offsets[indices], self.message_offsets[indices + 1]
+        buffer = b"".join(self.message_buffer[s:e] for s, e in zip(starts, ends))
+        return CommitTable(
+            shas=self.shas[indices],
+            timestamps=self.timestamps[indices],
+            author_ids=self.author_ids[indices],
+            authors=self.authors,
+            files_changed=self.files_changed[indices],
+            added=self.added[indices],
+            deleted=self.deleted[indices],
+            message_buffer=buffer,
+            message_offsets=np.concatenate(([0], np.cumsum(ends - starts))).astype(np.int64),
+            types=self.types[indices],
+        )
+
+    @property
+    def nbytes(self) -> int:
+        columns = (self.shas, self.timestamps, self.author_ids, self.files_changed, self.added, self.deleted,
+                   self.message_offsets, self.types)
+        return sum(c.nbytes for c in columns) + len(self.message_buffer) + sum(len(a) for a in self.authors)
+
+    # -----------------------------
+    # Vectorised aggregations
+    # -----------------------------
+    def classify(self, classifier: Optional[CommitClassifier] = None) -> ClassifiedBatch:
+        """Type and label bitmasks for every row (cached for the default classifier)."""
+        if classifier is not None:
+            return classifier.classify_batch(self.messages())
+        if self._batch is None:
+            self._batch = get_classifier().classify_batch(self.messages())
+        return self._batch
+
+    def type_codes(self) -> np.ndarray:
+        """Commit type index per row; classifies only if some rows have none yet."""
+        if (self.types < 0).any():
+            self.types = self.classify().types
+        return self.types
+
+    def type_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.type_codes(), minlength=len(TYPES))
+        return {TYPES[i]: int(c) for i, c in enumerate(counts) if c}
+
+    def author_counts(self, top: Optional[int] = None) -> Dict[str, int]:
+        """Commits per author, most active first."""
+        return self._top(np.bincount(self.author_ids, minlength=len(self.authors)), self.authors, top)
+
+    def author_sums(self, column: str, top: Optional[int] = None) -> Dict[str, int]:
+        """Sum of a numeric column ("added", "deleted", "files_changed") per author."""
+        sums = np.bincount(self.author_ids, weights=getattr(self, column), minlength=len(self.authors))
+        return self._top(sums.astype(np.int64), self.authors, top)
+
+    def bucket_counts(self, freq: str = "month", column: Optional[str] = None) -> Dict[str, int]:
+        """Commits (or the sum of `column`) per UTC day/week/month/year, oldest first."""
+        if not len(self):
+            return {}
+        buckets = self.timestamps.astype("datetime64[s]").astype(f"datetime64[{_BUCKET_UNITS[freq]}]")
+        labels, inverse = np.unique(buckets, return_inverse=True)
+        weights = getattr(self, column) if column else None
+        totals = np.bincount(inverse, weights=weights, minlength=len(labels)).astype(np.int64)
+        return {str(label): int(total) for label, total in zip(labels, totals)}
+
+    @staticmethod
+    def _top(values: np.ndarray, names: List[str], top: Optional[int]) -> Dict[str, int]:
+        order = np.argsort(-values, kind="stable")
+        order = order[values[order] > 0][:top]
+        return {names[i]: int(values[i]) for i in order}
+
+
+def as_table(commits: Union[CommitTable, Iterable[Dict[str, Any]], None]) -> CommitTable:
+    """Accept either a CommitTable or a legacy list of commit dicts."""
+    if isinstance(commits, CommitTable):
+        return commits
+    return CommitTable.from_dicts(commits or ())
+
+
+def _parse_date(date: Optional[str]) -> int:
+    if not date:
+        return 0
+    try:
+        return int(datetime.fromisoformat(str(date).replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return 0
@@ -0,0 +1,133 @@
+"""
+Token-budgeted time windows over commit history for map-reduce summaries.
+
+Each commit is rendered as one compact digest line. Lines are packed,
+oldest first, into windows made of whole calendar months for as long as
+they fit the token budget; a month that is too large on its own is split
+into consecutive parts. Packing is greedy from the start of history, so
+appending new commits only changes the last window and every earlier
+window keeps its content-derived key, which is what makes per-window
+summaries cacheable across runs.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Iterable, List, NamedTuple, Sequence
+
+from tools.commit_stream import CommitRecord
+
+SUMMARY_VERSION = "1"  # bump to invalidate cached window summaries
+_MAX_SUBJECT = 120
+
+
+class CommitWindow(NamedTuple):
+    key: str
+    start_ts: int
+    end_ts: int
+    lines: tuple  # one digest line per commit, oldest first
+
+    @property
+    def label(self) -> str:
+        return period_label(self.start_ts, self.end_ts)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def period_label(start_ts: int, end_ts: int) -> str:
+    """Month range covered by a window, e.g. "2021-03 to 2021-05"."""
+    start, end = _month(start_ts), _month(end_ts)
+    return start if start == end else f"{start} to {end}"
+
+
+def commit_line(record: CommitRecord) -> str:
+    """One-line digest of a commit: date, sha, author, subject and churn."""
+    subject = record.message.strip().splitlines()[0] if record.message.strip() else ""
+    if len(subject) > _MAX_SUBJECT:
+        subject = subject[:_MAX_SUBJECT - 3] + "..."
+    date = datetime.fromtimestamp(record.timestamp, timezone.utc).strftime("%Y-%m-%d")
+    line = f"- {date} {record.short_sha} {record.author}: {subject}"
+    if record.files:
+        line += f" (+{record.added}/-{record.deleted}, {len(record.files)} files)"
+    return line
+
+
+def content_key(*parts: str) -> str:
+    digest = hashlib.sha256(SUMMARY_VERSION.encode("utf-8"))
+    for part in parts:
+        digest.update(b"\0")
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def pack_windows(records: Iterable[CommitRecord], token_budget: int = 3000) -> List[CommitWindow]:
+    """Group commits (oldest first) into month-aligned windows within the budget."""
+    windows: List[CommitWindow] = []
+    current: List[tuple] = []  # (timestamp, line) of the open window
+    current_tokens = 0
+
+    def close():
+        nonlocal current, current_tokens
+        if current:
+            lines = tuple(line for _, line in current)
+            windows.append(CommitWindow(content_key(*lines), current[0][0], current[-1][0], lines))
+        current, current_tokens = [], 0
+
+    for month in _by_month(records):
+        month_tokens = sum(tokens for _, _, tokens in month)
+        if current and current_tokens + month_tokens > token_budget:
+            close()
+        for timestamp, line, tokens in month:
+            # Only months larger than the whole budget are split mid-month
+            if current and current_tokens + tokens > token_budget:
+                close()
+            current.append((timestamp, line))
+            current_tokens += tokens
+    close()
+    return windows
+
+
+def pack_texts(texts: Sequence[str], token_budget: int) -> List[List[int]]:
+    """Greedily group consecutive texts into index groups within the budget.
+
+    Every group holds at least two texts (when available) so repeated
+    packing always shrinks the list.
+    """
+    groups: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if len(current) >= 2 and current_tokens + tokens > token_budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _by_month(records: Iterable[CommitRecord]) -> Iterable[List[tuple]]:
+    month_key = None
+    month: List[tuple] = []
+    for record in records:
+        key = _month(record.timestamp)
+        if month and key != month_key:
+            yield month
+            month = []
+        month_key = key
+        line = commit_line(record)
+        month.append((record.timestamp, line, estimate_tokens(line)))
+    if month:
+        yield month
+
+
+def _month(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m")
@@ -0,0 +1,518 @@
+"""
+Dependency change history reconstructed from manifest file diffs.
+
+Only commits that touch a manifest are visited: a path-limited
+`git log --raw` lists them with the old and new blob ids of each
+manifest, the blobs are fetched in batches through the shared
+`git cat-file --batch` pool (tools.blob_reader), and every version is parsed
+into a {package: version spec} map. Diffing consecutive versions yields a
+chronological stream of added/removed/upgraded/downgraded events. A
+version that does not parse (merge conflict markers, a trailing comma)
+or is oversized is skipped over: the last parsed state carries forward,
+so it produces no events. The cost depends on the number of manifest
+changes, not on the size of the history. `DependencyHistory` persists the
+events together with the HEAD they cover and the last parsed state of
+each manifest, so a later run only walks the commits since then.
+
+Supported manifests: requirements*.txt (and requirements/*.txt),
+pyproject.toml, setup.py, package.json, pom.xml, Cargo.toml and go.mod.
+"""
+
+import ast
+import codecs
+import fnmatch
+import json
+import os
+import posixpath
+import re
+import subprocess
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from tools.blob_reader import get_blob_reader
+from tools.commit_stream import iter_log_records
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+MANIFEST_PATHSPECS = (
+    ":(glob)**/requirements*.txt",
+    ":(glob)**/requirements/*.txt",
+    ":(glob)**/pyproject.toml",
+    ":(glob)**/setup.py",
+    ":(glob)**/package.json",
+    ":(glob)**/pom.xml",
+    ":(glob)**/Cargo.toml",
+    ":(glob)**/go.mod",
+)
+
+_NULL_SHA = "0" * 40
+_LOG_FORMAT = "%x1e%H%x1f%an%x1f%ct"
+_MAX_MANIFEST_BYTES = 2 * 1024 * 1024
+# Bumped when parsing changes, so saved histories are rebuilt
+_STATE_VERSION = 2
+# UTF-32 marks first: the UTF-32 LE mark starts with the UTF-16 LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"), (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+Dependencies = Dict[str, str]  # package -> version spec ("" when unpinned)
+
+
+class DependencyEvent(NamedTuple):
+    sha: str
+    author: str
+    timestamp: int
+    manifest: str
+    ecosystem: str
+    package: str
+    change: str  # added | removed | upgraded | downgraded | changed
+    old_version: Optional[str]
+    new_version: Optional[str]
+
+    def describe(self) -> str:
+        date = datetime.fromtimestamp(self.timestamp, timezone.utc).strftime("%Y-%m-%d")
+        if self.change == "added":
+            what = f"added {self.package} {self.new_version or ''}".rstrip()
+        elif self.change == "removed":
+            what = f"removed {self.package}"
+        else:
+            what = f"{self.change} {self.package} {self.old_version or '*'} -> {self.new_version or '*'}"
+        return f"[{self.sha[:7]}] {date} {self.author}: {what} ({self.manifest})"
+
+
+# -----------------------------
+# Manifest parsers
+# -----------------------------
+_REQUIREMENT = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*(.*)$")
+
+
+def _pypi_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _parse_requirement(line: str) -> Optional[Tuple[str, str]]:
+    line = line.split(" #", 1)[0].strip()
+    if not line or line.startswith(("#", "-", "git+", "http:", "https:", "file:", ".")):
+        return None
+    match = _REQUIREMENT.match(line)
+    if not match:
+        return None
+    spec = match.group(2).split(";", 1)[0].strip()
+    return _pypi_name(match.group(1)), spec
+
+
+def parse_requirements(text: str) -> Dependencies:
+    deps = {}
+    for line in text.replace("\\\n", " ").splitlines():
+        parsed = _parse_requirement(line)
+        if parsed:
+            deps[parsed[0]] = parsed[1]
+    return deps
+
+
+def _requirement_list(items: Iterable) -> Dependencies:
+    deps = {}
+    for item in items:
+        parsed = _parse_requirement(item) if isinstance(item, str) else None
+        if parsed:
+            deps[parsed[0]] = parsed[1]
+    return deps
+
+
+def _toml_spec(value) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        if "version" in value:
+            return str(value["version"])
+        for source in ("git", "path", "url"):
+            if source in value:
+                return source
+    return ""
+
+
+def parse_pyproject(text: str) -> Dependencies:
+    if tomllib is None:
+        return {}
+    data = tomllib.loads(text)
+    project = data.get("project", {})
+    deps = _requirement_list(project.get("dependencies", []))
+    for extra in project.get("optional-dependencies", {}).values():
+        deps.update(_requirement_list(extra))
+    for group in data.get("dependency-groups", {}).values():
+        deps.update(_requirement_list(group))
+
+    poetry = data.get("tool", {}).get("poetry", {})
+    tables = [poetry.get("dependencies", {}), poetry.get("dev-dependencies", {})]
+    tables.extend(group.get("dependencies", {}) for group in poetry.get("group", {}).values())
+    for table in tables:
+        for name, value in table.items():
+            if name.lower() != "python":
+                deps[_pypi_name(name)] = _toml_spec(value)
+    return deps
+
+
+def parse_setup_py(text: str) -> Dependencies:
+    """Literal install/test/extras requirements from setup() calls."""
+    tree = ast.parse(text)
+    # Module-level `NAME = [...]` assignments, for install_requires=NAME
+    assigned = {
+        target.id: node.value
+        for node in tree.body if isinstance(node, ast.Assign)
+        for target in node.targets if isinstance(target, ast.Name)
+    }
+
+    def literal(node):
+        if isinstance(node, ast.Name) and node.id in assigned:
+            node = assigned[node.id]
+        try:
+            return ast.literal_eval(node)
+        except (ValueError, SyntaxError):
+            return None
+
+    deps = {}
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        for keyword in node.keywords:
+            if keyword.arg in ("install_requires", "tests_require", "setup_requires"):
+                value = literal(keyword.value)
+                if isinstance(value, (list, tuple)):
+                    deps.update(_requirement_list(value))
+            elif keyword.arg == "extras_require":
+                value = literal(keyword.value)
+                if isinstance(value, dict):
+                    for extra in value.values():
+                        deps.update(_requirement_list([extra] if isinstance(extra, str) else extra))
+    return deps
+
+
+def parse_package_json(text: str) -> Dependencies:
+    data = json.loads(text)
+    deps = {}
+    for section in ("dependencies", "devDependencies", "peerDependencies", "optionalDependencies"):
+        table = data.get(section)
+        if isinstance(table, dict):
+            deps.update({name: str(spec) for name, spec in table.items()})
+    return deps
+
+
+def parse_pom(text: str) -> Dependencies:
+    root = ET.fromstring(text)
+
+    def local(tag: str) -> str:
+        return tag.rsplit("}", 1)[-1]
+
+    def child_text(element, name: str) -> str:
+        for child in element:
+            if local(child.tag) == name:
+                return (child.text or "").strip()
+        return ""
+
+    properties = {}
+    for element in root:
+        if local(element.tag) == "properties":
+            properties = {local(p.tag): (p.text or "").strip() for p in element}
+    properties.setdefault("project.version", child_text(root, "version"))
+
+    deps = {}
+    for element in root.iter():
+        if local(element.tag) != "dependency":
+            continue
+        name = f"{child_text(element, 'groupId')}:{child_text(element, 'artifactId')}"
+        version = re.sub(r"\$\{([^}]+)\}", lambda m: properties.get(m.group(1), m.group(0)),
+                         child_text(element, "version"))
+        deps[name] = version
+    return deps
+
+
+def parse_cargo_toml(text: str) -> Dependencies:
+    if tomllib is None:
+        return {}
+    data = tomllib.loads(text)
+    tables = [data.get(section, {}) for section in ("dependencies", "dev-dependencies", "build-dependencies")]
+    for target in data.get("target", {}).values():
+        tables.extend(target.get(section, {}) for section in ("dependencies", "dev-dependencies"))
+    deps = {}
+    for table in tables:
+        for name, value in table.items():
+            deps[name] = _toml_spec(value)
+    return deps
+
+
+def parse_go_mod(text: str) -> Dependencies:
+    deps = {}
+    in_block = False
+    for line in text.splitlines():
+        line = line.split("//", 1)[0].strip()
+        if in_block:
+            if line.startswith(")"):
+                in_block = False
+                continue
+            fields = line.split()
+        elif line.startswith("require"):
+            rest = line[len("require"):].strip()
+            if rest.startswith("("):
+                in_block = True
+                continue
+            fields = rest.split()
+        else:
+            continue
+        if len(fields) >= 2:
+            deps[fields[0]] = fields[1]
+    return deps
+
+
+# kind -> (ecosystem, parser)
+PARSERS: Dict[str, Tuple[str, Callable[[str], Dependencies]]] = {
+    "requirements": ("pypi", parse_requirements),
+    "pyproject": ("pypi", parse_pyproject),
+    "setup.py": ("pypi", parse_setup_py),
+    "package.json": ("npm", parse_package_json),
+    "pom.xml": ("maven", parse_pom),
+    "cargo": ("cargo", parse_cargo_toml),
+    "go.mod": ("go", parse_go_mod),
+}
+
+_EXACT_NAMES = {
+    "pyproject.toml": "pyproject",
+    "setup.py": "setup.py",
+    "package.json": "package.json",
+    "pom.xml": "pom.xml",
+    "Cargo.toml": "cargo",
+    "go.mod": "go.mod",
+}
+
+
+def manifest_kind(path: str) -> Optional[str]:
+    name = posixpath.basename(path)
+    if name in _EXACT_NAMES:
+        return _EXACT_NAMES[name]
+    if fnmatch.fnmatch(name, "requirements*.txt"):
+        return "requirements"
+    if name.endswith(".txt") and posixpath.basename(posixpath.dirname(path)) == "requirements":
+        return "requirements"
+    return None
+
+
+def decode_manifest(data: bytes) -> str:
+    """Manifest text, honouring a byte order mark (`pip freeze >` on Windows writes UTF-16)."""
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return data[len(bom):].decode(encoding, errors="replace")
+    return data.decode("utf-8", errors="replace")
+
+
+def parse_manifest(path: str, text: str) -> Optional[Dependencies]:
+    """Parse one manifest version; None if the content does not parse."""
+    kind = manifest_kind(path)
+    if kind is None:
+        return {}
+    try:
+        return PARSERS[kind][1](text)
+    except Exception:
+        # Broken intermediate versions (merge conflicts, syntax errors) happen
+        return None
+
+
+# -----------------------------
+# Diffing
+# -----------------------------
+_VERSION_NUMBER = re.compile(r"\d+(?:\.\d+)*")
+
+
+def _version_key(spec: str) -> Optional[Tuple[int, ...]]:
+    match = _VERSION_NUMBER.search(spec or "")
+    return tuple(int(part) for part in match.group().split(".")) if match else None
+
+
+def diff_dependencies(old: Dependencies, new: Dependencies) -> List[Tuple[str, str, Optional[str], Optional[str]]]:
+    """(package, change, old spec, new spec) for every difference, sorted by package."""
+    changes = []
+    for name in sorted(old.keys() | new.keys()):
+        before, after = old.get(name), new.get(name)
+        if before == after:
+            continue
+        if before is None:
+            changes.append((name, "added", None, after))
+        elif after is None:
+            changes.append((name, "removed", before, None))
+        else:
+            old_key, new_key = _version_key(before), _version_key(after)
+            if old_key is None or new_key is None or old_key == new_key:
+                change = "changed"
+            else:
+                change = "upgraded" if new_key > old_key else "downgraded"
+            changes.append((name, change, before, after))
+    return changes
+
+
+# -----------------------------
+# History walk
+# -----------------------------
+def iter_dependency_events(repo_path: str, revisions: Sequence[str] = ("HEAD",), batch_size: int = 256,
+                           latest: Optional[Dict[str, Tuple[str, Dependencies]]] = None) -> Iterator[DependencyEvent]:
+    """Yield dependency events in chronological order.
+
+    `latest` maps each manifest path to its last (blob, parsed dependencies)
+    and is updated in place; passing the state of an earlier walk together
+    with `revisions=[head, "^<old head>"]` extends that walk.
+    """
+    cmd = ["git", "log", "-z", "--raw", "--no-abbrev", "--no-renames", "--reverse",
+           f"--format={_LOG_FORMAT}", *revisions, "--", *MANIFEST_PATHSPECS]
+    # Last parsed version per manifest path; the old blob of a change is
+    # almost always the new blob of the previous one
+    latest = latest if latest is not None else {}
+    pending: List[Tuple[str, str, int, List[Tuple[str, str, str]]]] = []
+
+    for raw in iter_log_records(repo_path, cmd):
+        commit = _parse_raw_record(raw)
+        if commit[3]:
+            pending.append(commit)
+        if len(pending) >= batch_size:
+            yield from _diff_batch(repo_path, pending, latest)
+            pending = []
+    if pending:
+        yield from _diff_batch(repo_path, pending, latest)
+
+
+def _parse_raw_record(raw: bytes) -> Tuple[str, str, int, List[Tuple[str, str, str]]]:
+    """(sha, author, timestamp, [(path, old blob, new blob)]) for manifest files."""
+    tokens = raw.split(b"\0")
+    sha, author, timestamp = tokens[0].decode("utf-8", errors="replace").split("\x1f")
+    changes = []
+    i = 1
+    while i + 1 < len(tokens):
+        meta = tokens[i].strip()
+        if not meta.startswith(b":"):
+            i += 1
+            continue
+        path = tokens[i + 1].decode("utf-8", errors="replace")
+        fields = meta.split()
+        i += 2
+        if len(fields) >= 4 and manifest_kind(path):
+            changes.append((path, fields[2].decode(), fields[3].decode()))
+    return sha, author, int(timestamp or 0), changes
+
+
+def _diff_batch(repo_path: str, commits, latest: Dict[str, Tuple[str, Dependencies]]) -> Iterator[DependencyEvent]:
+    needed = set()
+    for _, _, _, changes in commits:
+        for path, old_blob, new_blob in changes:
+            needed.add(new_blob)
+            if latest.get(path, ("",))[0] != old_blob:
+                needed.add(old_blob)
+    needed.discard(_NULL_SHA)
+    blobs = read_blobs(repo_path, sorted(needed))
+
+    parsed: Dict[Tuple[str, str], Optional[Dependencies]] = {}
+
+    def dependencies(path: str, blob: str) -> Optional[Dependencies]:
+        """Parsed version of one blob; None if it is unreadable, oversized or does not parse."""
+        if blob == _NULL_SHA:
+            return {}
+        known = latest.get(path)
+        if known and known[0] == blob:
+            return known[1]
+        key = (path, blob)
+        if key not in parsed:
+            data = blobs.get(blob)
+            parsed[key] = None if data is None else parse_manifest(path, decode_manifest(data))
+        return parsed[key]
+
+    for sha, author, timestamp, changes in commits:
+        for path, old_blob, new_blob in changes:
+            # A version that does not parse says nothing about the dependencies:
+            # carry the last parsed state across it instead of diffing against {}
+            old = dependencies(path, old_blob)
+            if old is None:
+                old = latest.get(path, ("", {}))[1]
+            new = dependencies(path, new_blob)
+            if new is None:
+                new = old
+            latest[path] = (new_blob, new)
+            ecosystem = PARSERS[manifest_kind(path)][0]
+            for package, change, before, after in diff_dependencies(old, new):
+                yield DependencyEvent(sha, author, timestamp, path, ecosystem, package, change, before, after)
+
+
+def read_blobs(repo_path: str, shas: Sequence[str]) -> Dict[str, bytes]:
+    """Read many manifest blobs through the shared `git cat-file --batch` pool; oversized blobs are left out."""
+    if not shas:
+        return {}
+    contents = get_blob_reader(repo_path).read_many(shas)
+    return {sha: data for sha, data in zip(shas, contents) if data is not None and len(data) <= _MAX_MANIFEST_BYTES}
+
+
+# -----------------------------
+# Persistent history
+# -----------------------------
+class DependencyHistory:
+    """All dependency events up to `head`, with the manifest state needed to extend them."""
+
+    def __init__(self):
+        self.head: Optional[str] = None
+        self.events: List[DependencyEvent] = []
+        self.latest: Dict[str, Tuple[str, Dependencies]] = {}
+
+    def update(self, repo_path: str) -> int:
+        """Walk only the commits since `head`; returns the number of new events.
+
+        If the stored head is no longer an ancestor of HEAD (history was
+        rewritten), the history is rebuilt from scratch.
+        """
+        head = _git(repo_path, "rev-parse", "HEAD")
+        if not head or head == self.head:
+            return 0
+        if self.head and not _git_ok(repo_path, "merge-base", "--is-ancestor", self.head, head):
+            print("[DependencyHistory] History was rewritten; rebuilding")
+            self.head, self.events, self.latest = None, [], {}
+        revisions = [head] + ([f"^{self.head}"] if self.head else [])
+        # Extend copies, so a failed walk leaves the stored state untouched
+        latest = dict(self.latest)
+        new_events = list(iter_dependency_events(repo_path, revisions, latest=latest))
+        self.head, self.events, self.latest = head, self.events + new_events, latest
+        return len(new_events)
+
+    def save(self, path: str):
+        state = {
+            "version": _STATE_VERSION,
+            "head": self.head,
+            "events": [list(e) for e in self.events],
+            "latest": {p: [blob, deps] for p, (blob, deps) in self.latest.items()},
+        }
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "DependencyHistory":
+        """The history saved at `path`, or an empty one if there is none."""
+        history = cls()
+        if not os.path.exists(path):
+            return history
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") != _STATE_VERSION:
+            return history  # written by an older parser; rebuilt on the next update
+        history.head = state["head"]
+        history.events = [DependencyEvent(*e) for e in state["events"]]
+        history.latest = {p: (blob, deps) for p, (blob, deps) in state["latest"].items()}
+        return history
+
+
+def _git(repo_path: str, *args: str) -> Optional[str]:
+    result = subprocess.run(["git", "-C", repo_path, *args], capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def _git_ok(repo_path: str, *args: str) -> bool:
+    return subprocess.run(["git", "-C", repo_path, *args], capture_output=True).returncode == 0
@@ -0,0 +1,142 @@
+"""
+Batched producer/consumer embedding pipeline for RAGTool.
+
+A reader thread loads and chunks files and feeds documents into a bounded
+queue; the calling thread drains the queue in batches, encodes each batch
+with a single model call and appends the vectors to the index in bulk.
+Reading and chunking therefore overlap with encoding, and the model never
+sees a batch of one.
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from tools.chunker import chunk_source
+from tools.file_tool import read_file_safe
+
+Document = Tuple[str, Dict[str, Any]]
+
+_DONE = object()
+
+
+class EmbeddingPipeline:
+    def __init__(self, store, batch_size: int = 128, queue_size: int = 2048, max_file_chars: int = 100000):
+        self.store = store
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_file_chars = max_file_chars
+
+    # -----------------------------
+    # Producer: read + chunk files
+    # -----------------------------
+    def iter_file_documents(self, repo_path: str, files: Iterable[str],
+                            file_metadata: Optional[Dict[str, Dict[str, Any]]] = None,
+                            read_file: Optional[Callable[[str], Optional[str]]] = None) -> Iterable[Document]:
+        """Yield the whole-file document and its chunks for every file.
+
+        `file_metadata` maps a path to extra metadata (e.g. last-modified
+        commit and timestamp) attached to the file and all of its chunks.
+        `read_file` loads a relative path's text (e.g. from the git object
+        store); by default files are read from the work tree.
+        """
+        file_metadata = file_metadata or {}
+        read_file = read_file or (lambda f: read_file_safe(os.path.join(repo_path, f)))
+        for f in files:
+            content = read_file(f)
+            if not content:
+                continue
+            # Skip the tail of massive files
+            content = content[:self.max_file_chars]
+            extra = file_metadata.get(f, {})
+            yield f"# File: {f}\n\n{content}", {**extra, "filename": f, "type": "file"}
+            for chunk in chunk_source(content, f):
+                yield chunk.text, {
+                    **extra,
+                    "filename": f,
+                    "type": "chunk",
+                    "start_line": chunk.start_line,
+                    "end_line": chunk.end_line,
+                }
+
+    # -----------------------------
+    # Consumer: batch encode + bulk add
+    # -----------------------------
+    def run(self, documents: Iterable[Document]) -> Dict[str, Any]:
+        """Embed every document and return throughput statistics."""
+        docs_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        errors: List[BaseException] = []
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for doc in documents:
+                    if stop.is_set():
+                        break
+                    docs_queue.put(doc)
+            except BaseException as e:  # surfaced to the caller below
+                errors.append(e)
+            finally:
+                # Release the reader (files, blob reader) even when stopped early
+                close = getattr(documents, "close", None)
+                if close is not None:
+                    close()
+                docs_queue.put(_DONE)
+
+        producer = threading.Thread(target=produce, name="embedding-producer", daemon=True)
+        start = time.perf_counter()
+        producer.start()
+
+        embedded = 0
+        batches = 0
+        batch: List[Document] = []
+        item = None
+        try:
+            while True:
+                item = docs_queue.get()
+                if item is not _DONE:
+                    batch.append(item)
+                if batch and (item is _DONE or len(batch) >= self.batch_size):
+                    self._flush(batch)
+                    embedded += len(batch)
+                    batches += 1
+                    batch = []
+                if item is _DONE:
+                    break
+        finally:
+            # If encoding failed, unblock the producer: it stops at its next
+            # document, and draining frees any put() it is waiting in
+            stop.set()
+            while item is not _DONE:
+                item = docs_queue.get()
+            producer.join()
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - start
+        return {
+            "documents": embedded,
+            "batches": batches,
+            "seconds": round(elapsed, 3),
+            "docs_per_sec": round(embedded / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    def embed_files(self, repo_path: str, files: Iterable[str],
+                    file_metadata: Optional[Dict[str, Dict[str, Any]]] = None,
+                    read_file: Optional[Callable[[str], Optional[str]]] = None) -> Dict[str, Any]:
+        return self.run(self.iter_file_documents(repo_path, files, file_metadata, read_file))
+
+    def _flush(self, batch: List[Document]):
+        texts = [text for text, _ in batch]
+        metadatas = [meta for _, meta in batch]
+        self.store.add_documents(texts, metadatas=metadatas, batch_size=self.batch_size)
+
+
+def prioritize_files(code_files: List[str], max_files: Optional[int] = None) -> List[str]:
+    """Order files so READMEs, entry points and config come first."""
+    key_patterns = ('readme', 'setup.py', 'main.py', 'index.', 'app.', 'package.json', 'requirements', 'config')
+    key_files = [f for f in code_files if any(pattern in f.lower() for pattern in key_patterns)]
+    ordered = list(dict.fromkeys(key_files + code_files))
+    return ordered[:max_files] if max_files is not None else ordered
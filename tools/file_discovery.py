@@ -0,0 +1,295 @@
+"""
+File discovery shared by the Excavator, FileTool and GitTool.
+
+Inside a git work tree the file list comes from git
+(`git ls-files -z --cached --others --exclude-standard`): tracked files
+plus untracked ones that are not ignored, so nothing is walked at all. Elsewhere a parallel `os.scandir` walker runs one task
+per directory on a thread pool. It prunes `.gitignore`d paths and
+well-known dependency/build directories (node_modules, virtualenvs,
+build output) before descending into them.
+
+Candidates are filtered by extension first. Then, on the same thread
+pool, each candidate is stat'ed for the size limit and its first bytes
+are sniffed for NUL bytes to skip binaries. Results are yielded as they
+are found instead of being collected into lists.
+"""
+
+import os
+import re
+import stat
+import subprocess
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# Source and documentation files the agents analyse
+CODE_EXTENSIONS = (
+    ".py", ".pyi", ".js", ".jsx", ".mjs", ".ts", ".tsx", ".java", ".kt", ".scala", ".go", ".rs", ".rb", ".php",
+    ".c", ".h", ".cc", ".cpp", ".hpp", ".cs", ".swift", ".m", ".sh", ".sql", ".md", ".rst",
+)
+# Never descended into by the walker, whatever .gitignore says
+DEFAULT_PRUNE_DIRS = frozenset({
+    ".git", ".hg", ".svn", "node_modules", "bower_components", "__pycache__", ".venv", "venv", ".tox", ".nox",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".gradle", ".idea", "build", "dist", "target", ".next",
+    ".eggs", "site-packages",
+})
+DEFAULT_MAX_FILE_SIZE = 2 * 1024 * 1024
+_SNIFF_BYTES = 8192
+_CHUNK = 256
+_READ_SIZE = 1 << 16
+
+
+class DiscoveredFile(NamedTuple):
+    path: str   # relative to the discovery root, "/"-separated
+    size: int
+
+
+class FileDiscovery:
+    def __init__(self, root: str, extensions: Optional[Sequence[str]] = CODE_EXTENSIONS,
+                 max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE, skip_binary: bool = True,
+                 use_git: bool = True, prune_dirs: Iterable[str] = DEFAULT_PRUNE_DIRS, workers: int = 8):
+        self.root = os.path.abspath(root)
+        self.extensions = tuple(e.lower() for e in extensions) if extensions else None
+        self.max_file_size = max_file_size
+        self.skip_binary = skip_binary
+        self.use_git = use_git
+        self.prune_dirs = frozenset(prune_dirs)
+        self.workers = workers
+
+    def __iter__(self) -> Iterator[DiscoveredFile]:
+        return self.iter_files()
+
+    def iter_paths(self) -> Iterator[str]:
+        for f in self.iter_files():
+            yield f.path
+
+    def iter_files(self) -> Iterator[DiscoveredFile]:
+        """Yield every file that passes the extension, size and binary filters."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            if self.use_git and is_git_worktree(self.root):
+                yield from self._check_all(pool, (p for p in iter_git_paths(self.root) if self._wanted(p)))
+            else:
+                yield from self._walk(pool)
+
+    # -----------------------------
+    # Filters
+    # -----------------------------
+    def _wanted(self, path: str) -> bool:
+        return self.extensions is None or path.lower().endswith(self.extensions)
+
+    def _check(self, path: str) -> Optional[DiscoveredFile]:
+        """Stat and sniff one candidate; None if it is missing, too large or binary."""
+        full = os.path.join(self.root, path)
+        try:
+            st = os.stat(full)
+        except OSError:
+            return None  # deleted in the work tree, broken symlink, ...
+        if not stat.S_ISREG(st.st_mode) or (self.max_file_size is not None and st.st_size > self.max_file_size):
+            return None
+        if self.skip_binary and is_binary(full):
+            return None
+        return DiscoveredFile(path, st.st_size)
+
+    def _check_chunk(self, paths: List[str]) -> List[DiscoveredFile]:
+        return [f for f in map(self._check, paths) if f]
+
+    def _check_all(self, pool: ThreadPoolExecutor, paths: Iterable[str]) -> Iterator[DiscoveredFile]:
+        """Check paths on the pool, one task per chunk, keeping their order."""
+        paths = iter(paths)
+        chunks = iter(lambda: list(islice(paths, _CHUNK)), [])
+        # Keep a bounded number of chunks in flight so results stream
+        pending = deque(pool.submit(self._check_chunk, c) for c in islice(chunks, 2 * self.workers))
+        while pending:
+            yield from pending.popleft().result()
+            for chunk in islice(chunks, 1):
+                pending.append(pool.submit(self._check_chunk, chunk))
+
+    # -----------------------------
+    # Parallel scandir walk
+    # -----------------------------
+    def _walk(self, pool: ThreadPoolExecutor) -> Iterator[DiscoveredFile]:
+        root_rules = _read_ignore_file(os.path.join(self.root, ".git", "info", "exclude"), "")
+        pending = {pool.submit(self._scan_dir, "", root_rules)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                yield from files
+                pending.update(pool.submit(self._scan_dir, rel, rules) for rel, rules in subdirs)
+
+    def _scan_dir(self, rel_dir: str,
+                  rules: "IgnoreRules") -> Tuple[List[DiscoveredFile], List[Tuple[str, "IgnoreRules"]]]:
+        """List one directory: checked files plus the subdirectories to descend into."""
+        directory = os.path.join(self.root, rel_dir)
+        rules = rules + _read_ignore_file(os.path.join(directory, ".gitignore"), rel_dir)
+        files, subdirs = [], []
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return files, subdirs
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if entry.name not in self.prune_dirs and not rules.ignored(rel, True):
+                    subdirs.append((rel, rules))
+            elif self._wanted(entry.name) and not rules.ignored(rel, False):
+                checked = self._check(rel)
+                if checked:
+                    files.append(checked)
+        return files, subdirs
+
+
+# -----------------------------
+# .gitignore matching
+# -----------------------------
+class IgnoreRules(NamedTuple):
+    """Compiled ignore patterns; later rules override earlier ones, as in git."""
+    rules: Tuple[Tuple["re.Pattern", bool, bool], ...] = ()  # (regex, negated, directories only)
+
+    def __add__(self, other: "IgnoreRules") -> "IgnoreRules":
+        return IgnoreRules(self.rules + other.rules) if other.rules else self
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        result = False
+        for regex, negated, dir_only in self.rules:
+            if (is_dir or not dir_only) and regex.match(path):
+                result = not negated
+        return result
+
+
+def parse_ignore_patterns(lines: Iterable[str], base: str = "") -> IgnoreRules:
+    """Compile .gitignore lines found in directory `base` (relative to the root)."""
+    rules = []
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip() or line.startswith("#"):
+            continue
+        line = line.rstrip(" ")
+        negated = line.startswith("!")
+        if negated or line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # A slash anywhere but the end anchors the pattern to `base`
+        anchored = "/" in line
+        body = _glob_to_regex(line.lstrip("/"))
+        prefix = re.escape(base + "/") if base else ""
+        regex = prefix + body if anchored else prefix + "(?:.*/)?" + body
+        rules.append((re.compile(regex + "$"), negated, dir_only))
+    return IgnoreRules(tuple(rules))
+
+
+def _glob_to_regex(pattern: str) -> str:
+    out, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            out.append("[" + pattern[i + 1:end].replace("!", "^", 1) + "]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+def _read_ignore_file(path: str, base: str) -> IgnoreRules:
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return parse_ignore_patterns(f, base)
+    except OSError:
+        return IgnoreRules()
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def is_git_worktree(path: str) -> bool:
+    try:
+        result = subprocess.run(["git", "-C", path, "rev-parse", "--is-inside-work-tree"],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return result.returncode == 0 and result.stdout.strip() == "true"
+
+
+def iter_git_paths(repo_path: str, untracked: bool = True) -> Iterator[str]:
+    """Stream the paths in the git index, relative to `repo_path`.
+
+    With `untracked`, files not added yet are included too, unless git
+    ignores them, so the work tree is reported as it is.
+    """
+    cmd = ["git", "-C", repo_path, "ls-files", "-z", "--cached"]
+    if untracked:
+        cmd.extend(["--others", "--exclude-standard"])
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        remainder = b""
+        while True:
+            chunk = proc.stdout.read(_READ_SIZE)
+            if not chunk:
+                break
+            *paths, remainder = (remainder + chunk).split(b"\0")
+            for path in paths:
+                yield os.fsdecode(path)
+        if remainder:
+            yield os.fsdecode(remainder)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+
+def tree_blobs(repo_path: str, rev: str = "HEAD", extensions: Optional[Sequence[str]] = CODE_EXTENSIONS,
+               max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE) -> Dict[str, str]:
+    """Blob SHA of every file at `rev` that passes the extension and size filters."""
+    try:
+        result = subprocess.run(["git", "-C", repo_path, "ls-tree", "-r", "-l", "-z", rev], capture_output=True)
+    except OSError:
+        return {}
+    if result.returncode != 0:
+        return {}
+    extensions = tuple(e.lower() for e in extensions) if extensions else None
+    blobs = {}
+    for entry in result.stdout.split(b"\0"):
+        info, _, path = entry.partition(b"\t")
+        fields = info.split()  # mode, type, object, size
+        if len(fields) != 4 or fields[1] != b"blob" or not fields[3].isdigit():
+            continue
+        if max_file_size is not None and int(fields[3]) > max_file_size:
+            continue
+        path = os.fsdecode(path)
+        if extensions is None or path.lower().endswith(extensions):
+            blobs[path] = fields[2].decode("ascii")
+    return blobs
+
+
+def is_binary(path: str, sniff_bytes: int = _SNIFF_BYTES) -> bool:
+    """Git's heuristic: a NUL byte in the first few KB means binary."""
+    try:
+        with open(path, "rb") as f:
+            return b"\0" in f.read(sniff_bytes)
+    except OSError:
+        return True
+
+
+def discover_files(root: str, **kwargs) -> Iterator[str]:
+    """Relative paths of the code files under `root` (see FileDiscovery)."""
+    return FileDiscovery(root, **kwargs).iter_paths()
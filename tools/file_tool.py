@@ -1,6 +1,7 @@
-import os
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional, Sequence
+
+from tools.file_discovery import FileDiscovery
 
 
 class FileTool:
@@ -24,11 +25,15 @@ class FileTool:
     # List all project files
     # -----------------------------
     def list_all_files(self) -> List[str]:
-        file_paths = []
-        for root, dirs, files in os.walk(self.base_path):
-            for f in files:
-                file_paths.append(str(Path(root) / f))
-        return file_paths
+        return list(self.iter_files())
+
+    def iter_files(self, extensions: Optional[Sequence[str]] = None, max_file_size: Optional[int] = None,
+                   skip_binary: bool = False) -> Iterator[str]:
+        """Stream project file paths, skipping ignored and dependency/build directories."""
+        discovery = FileDiscovery(str(self.base_path), extensions=extensions, max_file_size=max_file_size,
+                                  skip_binary=skip_binary)
+        for path in discovery.iter_paths():
+            yield str(self.base_path / path)
 
 
 # Module-level convenience function
@@ -1,6 +1,10 @@
 import subprocess
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
+
+from memory.commit_cache import CommitCache
+from tools.blob_reader import get_blob_reader
+from tools.file_discovery import iter_git_paths
 
 try:
     from git import Repo
@@ -23,17 +27,8 @@ class GitTool:
     # Get list of files tracked
     # -----------------------------
     def list_files(self) -> List[str]:
-        if self.repo:
-            return [str(f) for f in self.repo.git.ls_files().split("\n")]
-
-        # CLI fallback
-        result = subprocess.run(
-            ["git", "ls-files"],
-            cwd=self.repo_path,
-            capture_output=True,
-            text=True
-        )
-        return result.stdout.splitlines()
+        # Streamed from `git ls-files -z`, so unusual file names come through unquoted
+        return list(iter_git_paths(str(self.repo_path), untracked=False))
 
     # -----------------------------
     # Read commit history
@@ -60,20 +55,14 @@ class GitTool:
     # Read a file at a specific commit
     # -----------------------------
     def get_file_at_commit(self, filepath: str, commit_hash: str) -> Optional[str]:
-        try:
-            if self.repo:
-                return self.repo.git.show(f"{commit_hash}:{filepath}")
+        # Served by a long-lived `git cat-file --batch` process instead of one `git show` per blob
+        data = get_blob_reader(str(self.repo_path)).read(commit_hash, filepath)
+        return data.decode("utf-8", errors="replace") if data is not None else None
 
-            # CLI fallback
-            result = subprocess.run(
-                ["git", "show", f"{commit_hash}:{filepath}"],
-                cwd=self.repo_path,
-                capture_output=True,
-                text=True
-            )
-            return result.stdout if result.returncode == 0 else None
-        except Exception:
-            return None
+    def get_files_at_commit(self, filepaths: List[str], commit_hash: str) -> Dict[str, str]:
+        """Contents of many files at one commit, read in a single pipelined batch."""
+        blobs = get_blob_reader(str(self.repo_path)).read_at(commit_hash, filepaths)
+        return {path: data.decode("utf-8", errors="replace") for path, data in blobs.items()}
 
 
 # Module-level convenience functions
@@ -85,22 +74,29 @@ def get_commits(repo):
         return []
 
 
-def get_file_changes(repo, filepath: str):
-    """Get file change history (simplified)."""
+def get_file_changes(repo, filepath: str, limit: Optional[int] = None):
+    """Get the change history of one file, following renames.
+
+    Served from the commit cache's per-path index, which is brought up to
+    date with HEAD first, instead of diffing every commit in the history.
+    """
     try:
-        commits = get_commits(repo)
-        changes = []
-        for commit in commits:
-            try:
-                if filepath in commit.stats.files:
-                    changes.append({
-                        "commit": commit.hexsha[:7],
-                        "author": commit.author.name,
-                        "message": commit.message.strip().split('\n')[0],
-                        "stats": commit.stats.files[filepath]
-                    })
-            except Exception:
-                pass
-        return changes
+        repo_path = repo.working_tree_dir
+        history = CommitCache(repo_path)
+        try:
+            history.update_from_git(repo_path)
+            entries = history.file_history(filepath, limit)
+        finally:
+            history.close()
+        return [
+            {
+                "commit": e["hash"],
+                "author": e["author"],
+                "message": e["message"],
+                "path": e["path"],
+                "stats": {"insertions": e["added"], "deletions": e["deleted"], "lines": e["added"] + e["deleted"]},
+            }
+            for e in entries
+        ]
     except Exception:
         return []
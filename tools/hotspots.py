@@ -0,0 +1,275 @@
+"""
+Hotspot engine: time-decayed churn, author entropy and change coupling.
+
+Built in one streaming pass over `CommitRecord`s (oldest first), using
+the line-level added/deleted counts from numstat:
+
+- churn: lines added + deleted, each commit weighted by
+  exp(-ln2 * age / half_life), so recent activity dominates
+- author entropy: Shannon entropy (bits) of each file's commit authors;
+  high values mean many people touch the file with no clear owner
+- co-change: a sparse, symmetric file x file matrix in CSR form counting
+  how often two files change in the same commit
+
+Pair counts are buffered as packed int64 keys and periodically compacted
+with numpy, so memory stays proportional to the number of distinct pairs
+and no dense file x file matrix is ever built. Renames reported by git
+carry a file's history over to its new path.
+"""
+
+import json
+import math
+import os
+from array import array
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from tools.commit_stream import CommitRecord
+
+_ARRAYS_FILE = "hotspots.npz"
+_STATE_FILE = "hotspots.json"
+_LOW_BITS = (1 << 32) - 1
+
+
+class _PairCounter:
+    """Counts of (row, col) pairs, kept as sorted unique packed int64 keys."""
+
+    def __init__(self, compact_every: int = 1 << 22):
+        self.compact_every = compact_every
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self._pending = array("q")
+
+    def add(self, row: int, col: int):
+        self._pending.append((row << 32) | col)
+        if len(self._pending) >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        if not self._pending:
+            return
+        new_keys = np.frombuffer(self._pending, dtype=np.int64)
+        keys = np.concatenate([self.keys, new_keys])
+        weights = np.concatenate([self.counts, np.ones(len(new_keys), dtype=np.int64)])
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=weights).astype(np.int64)
+        self._pending = array("q")
+
+    def pairs(self):
+        self.compact()
+        return (self.keys >> 32).astype(np.int64), (self.keys & _LOW_BITS).astype(np.int64), self.counts
+
+
+class HotspotEngine:
+    def __init__(self, half_life_days: float = 180.0, max_files_per_commit: int = 50):
+        self.half_life_days = half_life_days
+        # Huge commits (mass reformatting, vendoring) say nothing about coupling
+        self.max_files_per_commit = max_files_per_commit
+        self.head: Optional[str] = None
+        self.paths: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._decay = math.log(2) / (half_life_days * 86400)
+        self._origin_ts: Optional[int] = None
+        self.reference_ts = 0
+        # Streaming accumulators
+        self._touches = array("q")
+        self._added = array("q")
+        self._deleted = array("q")
+        self._last_ts = array("q")
+        self._churn = array("d")  # scaled by exp(decay * (t - origin))
+        self._authors: Dict[str, int] = {}
+        self._file_authors = _PairCounter()
+        self._cochange = _PairCounter()
+        # Finalized columns
+        self.touches = self.added = self.deleted = self.last_ts = np.empty(0, dtype=np.int64)
+        self.churn = self.author_count = self.author_entropy = np.empty(0)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int64)
+        self.data = np.empty(0, dtype=np.int64)
+
+    # -----------------------------
+    # Building
+    # -----------------------------
+    @classmethod
+    def build(cls, records: Iterable[CommitRecord], **kwargs) -> "HotspotEngine":
+        engine = cls(**kwargs)
+        for record in records:
+            engine.add(record)
+        return engine.finalize()
+
+    def add(self, record: CommitRecord):
+        """Fold in one commit; records must arrive oldest first."""
+        if not record.files:
+            return
+        if self._origin_ts is None:
+            self._origin_ts = record.timestamp
+        weight = math.exp(self._decay * (record.timestamp - self._origin_ts))
+        self.reference_ts = max(self.reference_ts, record.timestamp)
+        author = self._authors.setdefault(record.author, len(self._authors))
+
+        ids = []
+        for change in record.files:
+            file_id = self._file_id(change.path, change.old_path)
+            ids.append(file_id)
+            self._touches[file_id] += 1
+            self._added[file_id] += change.added
+            self._deleted[file_id] += change.deleted
+            self._churn[file_id] += (change.added + change.deleted) * weight
+            self._last_ts[file_id] = max(self._last_ts[file_id], record.timestamp)
+            self._file_authors.add(file_id, author)
+
+        if len(ids) <= self.max_files_per_commit:
+            for a, b in combinations(sorted(set(ids)), 2):
+                self._cochange.add(a, b)
+
+    def _file_id(self, path: str, old_path: Optional[str]) -> int:
+        file_id = self.index.get(path)
+        if file_id is not None:
+            return file_id
+        if old_path is not None and old_path in self.index:
+            # Rename: the file keeps its history under the new path
+            file_id = self.index.pop(old_path)
+            self.paths[file_id] = path
+        else:
+            file_id = len(self.paths)
+            self.paths.append(path)
+            for column in (self._touches, self._added, self._deleted, self._last_ts):
+                column.append(0)
+            self._churn.append(0.0)
+        self.index[path] = file_id
+        return file_id
+
+    def finalize(self) -> "HotspotEngine":
+        n = len(self.paths)
+        self.touches = np.frombuffer(self._touches, dtype=np.int64).copy()
+        self.added = np.frombuffer(self._added, dtype=np.int64).copy()
+        self.deleted = np.frombuffer(self._deleted, dtype=np.int64).copy()
+        self.last_ts = np.frombuffer(self._last_ts, dtype=np.int64).copy()
+        scale = math.exp(-self._decay * (self.reference_ts - (self._origin_ts or 0))) if n else 1.0
+        self.churn = np.frombuffer(self._churn, dtype=np.float64) * scale
+
+        # Author entropy from sorted (file, author) counts, grouped per file
+        files, _, counts = self._file_authors.pairs()
+        self.author_count = np.bincount(files, minlength=n).astype(np.int64)
+        self.author_entropy = np.zeros(n)
+        if len(files):
+            totals = np.bincount(files, weights=counts, minlength=n)
+            p = counts / totals[files]
+            np.add.at(self.author_entropy, files, -p * np.log2(p))
+            self.author_entropy = np.maximum(self.author_entropy, 0.0)  # clear -0.0
+
+        # Symmetric CSR co-change matrix from the upper-triangle pair counts
+        rows, cols, counts = self._cochange.pairs()
+        all_rows = np.concatenate([rows, cols])
+        all_cols = np.concatenate([cols, rows])
+        all_data = np.concatenate([counts, counts])
+        order = np.lexsort((all_cols, all_rows))
+        self.indices = all_cols[order]
+        self.data = all_data[order]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(all_rows, minlength=n))]).astype(np.int64)
+
+        self._release_buffers()
+        return self
+
+    def _release_buffers(self):
+        self._touches, self._added, self._deleted, self._last_ts = array("q"), array("q"), array("q"), array("q")
+        self._churn = array("d")
+        self._file_authors = _PairCounter()
+        self._cochange = _PairCounter()
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def file_stats(self, i: int) -> Dict[str, Any]:
+        return {
+            "path": self.paths[i],
+            "churn": round(float(self.churn[i]), 1),
+            "touches": int(self.touches[i]),
+            "added": int(self.added[i]),
+            "deleted": int(self.deleted[i]),
+            "authors": int(self.author_count[i]),
+            "author_entropy": round(float(self.author_entropy[i]), 2),
+            "last_ts": int(self.last_ts[i]),
+        }
+
+    def top_hotspots(self, n: int = 15, by: str = "churn") -> List[Dict[str, Any]]:
+        """Top files by decayed churn (or "touches", "author_entropy")."""
+        values = {"churn": self.churn, "touches": self.touches, "author_entropy": self.author_entropy}[by]
+        return [self.file_stats(i) for i in _top_indices(values, n)]
+
+    def coupled_files(self, path: str, n: int = 10) -> List[Dict[str, Any]]:
+        """Files most often changed together with `path`.
+
+        `confidence` is the share of `path`'s commits that also touched the
+        other file.
+        """
+        i = self.index.get(path)
+        if i is None:
+            return []
+        start, end = self.indptr[i], self.indptr[i + 1]
+        partners, counts = self.indices[start:end], self.data[start:end]
+        touches = max(int(self.touches[i]), 1)
+        return [
+            {
+                "path": self.paths[partners[j]],
+                "co_changes": int(counts[j]),
+                "confidence": round(int(counts[j]) / touches, 3),
+            }
+            for j in _top_indices(counts, n)
+        ]
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.savez(
+            os.path.join(directory, _ARRAYS_FILE),
+            touches=self.touches, added=self.added, deleted=self.deleted, last_ts=self.last_ts,
+            churn=self.churn, author_count=self.author_count, author_entropy=self.author_entropy,
+            indptr=self.indptr, indices=self.indices, data=self.data,
+        )
+        state = {
+            "head": self.head,
+            "half_life_days": self.half_life_days,
+            "max_files_per_commit": self.max_files_per_commit,
+            "reference_ts": self.reference_ts,
+            "paths": self.paths,
+        }
+        with open(os.path.join(directory, _STATE_FILE), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["HotspotEngine"]:
+        arrays_path = os.path.join(directory, _ARRAYS_FILE)
+        state_path = os.path.join(directory, _STATE_FILE)
+        if not (os.path.exists(arrays_path) and os.path.exists(state_path)):
+            return None
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        engine = cls(state["half_life_days"], state["max_files_per_commit"])
+        engine.head = state["head"]
+        engine.reference_ts = state["reference_ts"]
+        engine.paths = state["paths"]
+        engine.index = {path: i for i, path in enumerate(engine.paths)}
+        with np.load(arrays_path) as arrays:
+            for name in ("touches", "added", "deleted", "last_ts", "churn", "author_count", "author_entropy",
+                         "indptr", "indices", "data"):
+                setattr(engine, name, arrays[name])
+        return engine
+
+
+def _top_indices(values: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n largest values, largest first, without a full sort."""
+    if n <= 0 or len(values) == 0:
+        return np.empty(0, dtype=np.int64)
+    if n < len(values):
+        candidates = np.argpartition(-values, n - 1)[:n]
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.argsort(-values[candidates], kind="stable")]
@@ -0,0 +1,181 @@
+"""
+Columnar metadata store kept parallel to the RAG vectors.
+
+Each document row holds filename, type, language, line span,
+last-modified commit and timestamp. String columns are dictionary-encoded,
+so a filter such as `{"type": "chunk", "path_prefix": "agents/"}` is
+evaluated once per distinct value and then as a vectorised comparison over
+integer codes, yielding a boolean mask used to pre-filter search.
+"""
+
+import json
+import os
+from array import array
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+_COLUMNS_FILE = "metadata.npz"
+_DICTS_FILE = "metadata.json"
+
+EXTENSION_LANGUAGES = {
+    '.py': 'Python',
+    '.js': 'JavaScript',
+    '.jsx': 'JavaScript',
+    '.ts': 'TypeScript',
+    '.tsx': 'TypeScript',
+    '.java': 'Java',
+    '.md': 'Markdown',
+    '.json': 'JSON',
+    '.yaml': 'YAML',
+    '.yml': 'YAML',
+    '.xml': 'XML',
+    '.go': 'Go',
+    '.rs': 'Rust',
+    '.c': 'C',
+    '.h': 'C',
+    '.cpp': 'C++',
+    '.cs': 'C#',
+    '.rb': 'Ruby',
+    '.php': 'PHP',
+    '.kt': 'Kotlin',
+    '.swift': 'Swift',
+    '.toml': 'TOML',
+}
+
+
+def language_for_path(path: str) -> str:
+    return EXTENSION_LANGUAGES.get(os.path.splitext(path)[1].lower(), 'Other')
+
+
+class _DictColumn:
+    """Dictionary-encoded string column (code -1 means missing)."""
+
+    def __init__(self, values: Optional[List[str]] = None, codes: Optional[array] = None):
+        self.values: List[str] = values or []
+        self.lookup: Dict[str, int] = {v: i for i, v in enumerate(self.values)}
+        self.codes = codes if codes is not None else array("i")
+
+    def append(self, value: Optional[str]):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def get(self, row: int) -> Optional[str]:
+        code = self.codes[row]
+        return self.values[code] if code >= 0 else None
+
+    def array(self) -> np.ndarray:
+        return np.frombuffer(self.codes, dtype=np.int32) if len(self.codes) else np.empty(0, dtype=np.int32)
+
+    def mask_for(self, predicate) -> np.ndarray:
+        matching = [code for code, value in enumerate(self.values) if predicate(value)]
+        return np.isin(self.array(), np.asarray(matching, dtype=np.int32))
+
+
+class MetadataStore:
+    STRING_COLUMNS = ("filename", "type", "language", "commit")
+    INT_COLUMNS = ("start_line", "end_line", "timestamp")
+
+    def __init__(self):
+        self.strings = {name: _DictColumn() for name in self.STRING_COLUMNS}
+        self.ints = {name: array("q") for name in self.INT_COLUMNS}
+        self.extra: Dict[int, Dict[str, Any]] = {}  # rare keys outside the fixed columns
+
+    def __len__(self) -> int:
+        return len(self.ints["start_line"])
+
+    def append(self, metadatas: List[Dict[str, Any]]):
+        for metadata in metadatas:
+            row = len(self)
+            metadata = dict(metadata or {})
+            filename = metadata.get("filename")
+            if filename and "language" not in metadata:
+                metadata["language"] = language_for_path(filename)
+            for name, column in self.strings.items():
+                value = metadata.pop(name, None)
+                column.append(str(value) if value is not None else None)
+            for name, column in self.ints.items():
+                value = metadata.pop(name, None)
+                column.append(int(value) if value is not None else -1)
+            if metadata:
+                self.extra[row] = metadata
+
+    def row(self, i: int) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        for name, column in self.strings.items():
+            value = column.get(i)
+            if value is not None:
+                result[name] = value
+        for name, column in self.ints.items():
+            if column[i] >= 0:
+                result[name] = column[i]
+        result.update(self.extra.get(i, {}))
+        return result
+
+    # -----------------------------
+    # Filtering
+    # -----------------------------
+    def mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Boolean row mask for a filter.
+
+        Keys are column names matched by equality (or membership when the
+        value is a list/tuple/set), plus `path_prefix` (filename prefix),
+        `since` and `until` (timestamp bounds, inclusive).
+        """
+        result = np.ones(len(self), dtype=bool)
+        for key, value in where.items():
+            if key == "path_prefix":
+                result &= self.strings["filename"].mask_for(lambda v: v.startswith(value))
+            elif key in ("since", "until"):
+                timestamps = np.frombuffer(self.ints["timestamp"], dtype=np.int64) if len(self) else np.empty(0, np.int64)
+                result &= (timestamps >= value) if key == "since" else (timestamps >= 0) & (timestamps <= value)
+            elif key in self.strings:
+                allowed = {str(v) for v in value} if isinstance(value, (list, tuple, set)) else {str(value)}
+                result &= self.strings[key].mask_for(lambda v: v in allowed)
+            elif key in self.ints:
+                allowed = list(value) if isinstance(value, (list, tuple, set)) else [value]
+                result &= np.isin(np.frombuffer(self.ints[key], dtype=np.int64), allowed)
+            else:
+                raise ValueError(f"Unknown metadata filter {key!r}")
+        return result
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        arrays = {f"s_{name}": column.array() for name, column in self.strings.items()}
+        arrays.update({f"i_{name}": np.frombuffer(column, dtype=np.int64) if len(column) else np.empty(0, np.int64)
+                       for name, column in self.ints.items()})
+        np.savez(os.path.join(directory, _COLUMNS_FILE), **arrays)
+        dictionaries = {
+            "values": {name: column.values for name, column in self.strings.items()},
+            "extra": {str(row): meta for row, meta in self.extra.items()},
+        }
+        with open(os.path.join(directory, _DICTS_FILE), "w", encoding="utf-8") as f:
+            json.dump(dictionaries, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["MetadataStore"]:
+        columns_path = os.path.join(directory, _COLUMNS_FILE)
+        dicts_path = os.path.join(directory, _DICTS_FILE)
+        if not (os.path.exists(columns_path) and os.path.exists(dicts_path)):
+            return None
+        with open(dicts_path, "r", encoding="utf-8") as f:
+            dictionaries = json.load(f)
+        store = cls()
+        with np.load(columns_path) as arrays:
+            for name in cls.STRING_COLUMNS:
+                store.strings[name] = _DictColumn(
+                    dictionaries["values"].get(name, []), array("i", arrays[f"s_{name}"].astype(np.int32).tobytes())
+                )
+            for name in cls.INT_COLUMNS:
+                store.ints[name] = array("q", arrays[f"i_{name}"].astype(np.int64).tobytes())
+        store.extra = {int(row): meta for row, meta in dictionaries.get("extra", {}).items()}
+        return store
@@ -0,0 +1,68 @@
+"""
+Process-wide registry of SentenceTransformer models.
+
+Each model is loaded once per process, on first use rather than when a
+RAGTool is constructed, and shared by every RAGTool, LongTermMemory and
+agent. Streamlit reruns reuse the already imported module, so the model
+also survives reruns. Load-time metrics are kept for diagnostics.
+"""
+
+import threading
+import time
+from typing import Any, Dict
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+_models: Dict[str, Any] = {}
+_metrics: Dict[str, Dict[str, Any]] = {}
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def get_model(name: str):
+    """Return the shared model for `name`, loading it on first call."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    with lock:
+        model = _models.get(name)
+        if model is not None:
+            return model
+
+        # Imported lazily: pulling in torch is itself a multi-second cost
+        from sentence_transformers import SentenceTransformer
+
+        rss_before = _max_rss_mb()
+        start = time.perf_counter()
+        model = SentenceTransformer(name)
+        elapsed = time.perf_counter() - start
+        _metrics[name] = {
+            "load_seconds": round(elapsed, 3),
+            "loaded_at": time.time(),
+            "max_rss_delta_mb": round(_max_rss_mb() - rss_before, 1),
+        }
+        _models[name] = model
+        print(f"[ModelRegistry] Loaded {name} in {elapsed:.2f}s")
+        return model
+
+
+def is_loaded(name: str) -> bool:
+    return name in _models
+
+
+def model_metrics() -> Dict[str, Dict[str, Any]]:
+    """Load-time metrics for every model loaded in this process."""
+    return {name: dict(m) for name, m in _metrics.items()}
+
+
+def _max_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
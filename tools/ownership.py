@@ -0,0 +1,208 @@
+"""
+Code ownership from `git blame`: who wrote the lines that exist today.
+
+Every code file at HEAD is blamed with `git blame --incremental`, which
+reports line ranges per commit without echoing file contents. Files are
+blamed in chunks on a process pool, so throughput scales with the number
+of cores.
+
+Results are cached in SQLite per (path, blob SHA) as surviving lines per
+author. A re-run lists the tree (`git ls-tree`), reuses every file whose
+blob is unchanged and only blames the rest, so a refresh with nothing
+changed costs a tree listing and a table scan.
+
+The per-file counts are folded into a compact (directory x author)
+matrix of surviving lines. `summarize_ownership` turns it into the
+top owners, per-directory owners and bus factors that the Historian
+and the UI report.
+"""
+
+import os
+import re
+import sqlite3
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from memory.cache_paths import repo_cache_dir
+from tools.file_discovery import tree_blobs
+
+_CACHE_FILE = "ownership.sqlite"
+# First entry for a commit: "<sha> <orig line> <final line> <lines>" followed by "author <name>"
+_ENTRY = re.compile(rb"^([0-9a-f]{40}) \d+ \d+ (\d+)$", re.MULTILINE)
+_AUTHOR = re.compile(rb"^([0-9a-f]{40}) \d+ \d+ \d+\nauthor (.*)$", re.MULTILINE)
+_TIMEOUT = 300
+
+
+class OwnershipTable(NamedTuple):
+    authors: List[str]
+    directories: List[str]
+    lines: np.ndarray  # int64 (directories, authors): surviving lines
+    files: int
+
+
+def blame_file(repo_path: str, rev: str, path: str) -> Optional[Dict[str, int]]:
+    """Surviving lines per author of one file at `rev`, or None if blame failed."""
+    try:
+        result = subprocess.run(["git", "-C", repo_path, "blame", "--incremental", rev, "--", path],
+                                capture_output=True, timeout=_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    out = result.stdout
+    names = {sha: name.decode("utf-8", errors="replace") for sha, name in _AUTHOR.findall(out)}
+    counts: Dict[str, int] = {}
+    for sha, lines in _ENTRY.findall(out):
+        author = names.get(sha, "unknown")
+        counts[author] = counts.get(author, 0) + int(lines)
+    return counts
+
+
+def _blame_chunk(repo_path: str, rev: str, paths: List[str]) -> List[Optional[Dict[str, int]]]:
+    return [blame_file(repo_path, rev, p) for p in paths]
+
+
+class OwnershipEngine:
+    def __init__(self, repo_path: str, cache_dir: Optional[str] = None, workers: Optional[int] = None,
+                 chunk_size: int = 32):
+        self.repo_path = os.path.abspath(repo_path)
+        self.cache_dir = cache_dir or repo_cache_dir(repo_path)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.conn = sqlite3.connect(os.path.join(self.cache_dir, _CACHE_FILE), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # One row per (path, blob, author); an empty file is stored as a single row without an author
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS blame (path TEXT NOT NULL, blob TEXT NOT NULL, author TEXT NOT NULL, "
+            "lines INTEGER, PRIMARY KEY (path, blob, author))"
+        )
+
+    def measure(self, rev: str = "HEAD", depth: int = 1) -> OwnershipTable:
+        """Ownership of the code files at `rev`, re-blaming only files whose blob changed."""
+        blobs = tree_blobs(self.repo_path, rev)
+        rows, stale = self._cached(blobs)
+        done = {path for path, _, _ in rows}
+        todo = [p for p in blobs if p not in done]
+
+        fresh = []
+        for path, counts in zip(todo, self._blame_parallel(rev, todo)):
+            if counts is None:
+                continue
+            entries = [(path, blobs[path], author, n) for author, n in counts.items()] or [(path, blobs[path], "", 0)]
+            fresh.extend(entries)
+            rows.extend((path, author, n) for _, _, author, n in entries)
+        with self.conn:
+            self.conn.executemany("DELETE FROM blame WHERE path = ? AND blob = ?", stale)
+            self.conn.executemany("INSERT OR REPLACE INTO blame VALUES (?, ?, ?, ?)", fresh)
+        print(f"[Ownership] Blamed {len(todo)} files, {len(blobs) - len(todo)} from cache")
+        return build_table(rows, depth)
+
+    def _cached(self, blobs: Dict[str, str]) -> Tuple[List[Tuple[str, str, int]], List[Tuple[str, str]]]:
+        """(path, author, lines) rows for files whose blob is unchanged, and the stale (path, blob) keys."""
+        rows, stale = [], set()
+        for path, blob, author, lines in self.conn.execute("SELECT path, blob, author, lines FROM blame"):
+            if blobs.get(path) == blob:
+                rows.append((path, author, lines))
+            else:
+                stale.add((path, blob))
+        return rows, list(stale)
+
+    def _blame_parallel(self, rev: str, paths: List[str]) -> Iterator[Optional[Dict[str, int]]]:
+        if not paths:
+            return iter(())
+        chunks = [paths[i:i + self.chunk_size] for i in range(0, len(paths), self.chunk_size)]
+        if len(chunks) == 1 or self.workers == 1:
+            return (counts for chunk in chunks for counts in _blame_chunk(self.repo_path, rev, chunk))
+        return self._pool_results(rev, chunks)
+
+    def _pool_results(self, rev: str, chunks: List[List[str]]) -> Iterator[Optional[Dict[str, int]]]:
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(chunks))) as pool:
+            for chunk_result in pool.map(_blame_chunk, [self.repo_path] * len(chunks), [rev] * len(chunks), chunks):
+                yield from chunk_result
+
+    def close(self):
+        self.conn.close()
+
+
+def build_table(rows: Iterable[Tuple[str, str, int]], depth: int = 1) -> OwnershipTable:
+    """Fold (path, author, lines) rows into a (directory x author) matrix.
+
+    Directories are the first `depth` path components; files at the root
+    are grouped under ".".
+    """
+    authors: Dict[str, int] = {}
+    directories: Dict[str, int] = {}
+    dir_ids, author_ids, counts = [], [], []
+    files = set()
+    for path, author, lines in rows:
+        files.add(path)
+        if not lines:
+            continue
+        parts = path.split("/")[:-1][:depth]
+        dir_ids.append(directories.setdefault("/".join(parts) or ".", len(directories)))
+        author_ids.append(authors.setdefault(author, len(authors)))
+        counts.append(lines)
+    n_authors = max(len(authors), 1)
+    flat = np.asarray(dir_ids, dtype=np.int64) * n_authors + np.asarray(author_ids, dtype=np.int64)
+    matrix = np.bincount(flat, weights=np.asarray(counts, dtype=np.float64), minlength=len(directories) * n_authors)
+    return OwnershipTable(list(authors), list(directories),
+                          matrix.astype(np.int64).reshape(len(directories), n_authors)[:, :len(authors)], len(files))
+
+
+def bus_factor(lines: np.ndarray, share: float = 0.5) -> int:
+    """Fewest authors who together wrote at least `share` of the lines."""
+    total = lines.sum()
+    if not total:
+        return 0
+    cumulative = np.cumsum(np.sort(lines)[::-1])
+    return int(np.searchsorted(cumulative, share * total) + 1)
+
+
+def summarize_ownership(table: OwnershipTable, top_authors: int = 10, top_directories: int = 15,
+                        owners_per_directory: int = 3) -> Dict[str, Any]:
+    """Top owners overall and per directory (largest directories first)."""
+    if not table.authors:
+        return {"files": table.files, "total_lines": 0, "authors": {}, "bus_factor": 0, "directories": []}
+    per_author = table.lines.sum(axis=0)
+    per_directory = table.lines.sum(axis=1)
+    total = int(per_author.sum())
+    order = np.argsort(-per_author, kind="stable")[:top_authors]
+    directories = []
+    for d in np.argsort(-per_directory, kind="stable")[:top_directories]:
+        row = table.lines[d]
+        owners = [a for a in np.argsort(-row, kind="stable")[:owners_per_directory] if row[a]]
+        directories.append({
+            "directory": table.directories[d],
+            "lines": int(per_directory[d]),
+            "owners": {table.authors[a]: int(row[a]) for a in owners},
+            "owner_share": round(float(row[owners[0]] / per_directory[d]), 3),
+            "authors": int(np.count_nonzero(row)),
+            "bus_factor": bus_factor(row),
+        })
+    return {
+        "files": table.files,
+        "total_lines": total,
+        "authors": {table.authors[a]: int(per_author[a]) for a in order},
+        "bus_factor": bus_factor(per_author),
+        "directories": directories,
+    }
+
+
+def describe_ownership(summary: Dict[str, Any], max_directories: int = 8) -> List[str]:
+    """Compact prompt lines for a `summarize_ownership` summary."""
+    if not summary or not summary.get("total_lines"):
+        return []
+    total = summary["total_lines"]
+    lines = [
+        f"{total} surviving lines in {summary['files']} files; bus factor {summary['bus_factor']} "
+        f"(authors who wrote half of today's code)",
+        "Top owners: " + ", ".join(f"{a} ({n / total:.0%})" for a, n in list(summary["authors"].items())[:5]),
+    ]
+    for d in summary["directories"][:max_directories]:
+        owner = next(iter(d["owners"]))
+        lines.append(f"{d['directory']}: {d['lines']} lines, {owner} owns {d['owner_share']:.0%}, "
+                     f"{d['authors']} authors, bus factor {d['bus_factor']}")
+    return lines
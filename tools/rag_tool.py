@@ -1,44 +1,173 @@
-from typing import List, Tuple
-from sentence_transformers import SentenceTransformer
-import faiss
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
+from tools.bm25 import BM25Index, reciprocal_rank_fusion
+from tools.embedding_cache import EmbeddingCache, embedding_key
+from tools.metadata_store import MetadataStore
+from tools.model_registry import get_model
+from tools.vector_index import VectorIndex
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+_DOCS_FILE = "docs.jsonl"
 
 
 class RAGTool:
-    def __init__(self):
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+    def __init__(self, batch_size: int = 64, model_name: str = DEFAULT_MODEL,
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 index_type: str = "auto", metric: str = "l2", target_recall: float = 0.95):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.embedding_cache = embedding_cache
+        self.index_type = index_type
+        self.metric = metric
+        self.target_recall = target_recall
         self.index = None
         self.text_store = []
+        self.metadata = MetadataStore()  # columnar, row-aligned with text_store
+        self.lexical = BM25Index()  # built alongside the vector index
+
+    @property
+    def model(self):
+        """Shared model from the process-wide registry, loaded on first encode."""
+        return get_model(self.model_name)
 
     # -----------------------------
     # Build vector store
     # -----------------------------
-    def add_documents(self, documents: List[str]):
-        embeddings = self.model.encode(documents)
-        embeddings = np.array(embeddings).astype("float32")
+    def add_documents(self, documents: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+                      batch_size: Optional[int] = None):
+        """Encode documents in batches and append them to the index in bulk."""
+        if not documents:
+            return
+        embeddings = self.encode(documents, batch_size=batch_size)
 
         if self.index is None:
-            self.index = faiss.IndexFlatL2(embeddings.shape[1])
+            self.index = VectorIndex(embeddings.shape[1], self.index_type, self.metric, self.target_recall)
 
         self.index.add(embeddings)
+        self.lexical.add(documents)
         self.text_store.extend(documents)
+        self.metadata.append(metadatas or [{} for _ in documents])
+
+    def encode(self, documents: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Embed documents, encoding only those missing from the embedding cache."""
+        batch_size = batch_size or self.batch_size
+        if self.embedding_cache is None:
+            return np.asarray(self.model.encode(documents, batch_size=batch_size), dtype="float32")
+
+        keys = [embedding_key(self.model_name, doc) for doc in documents]
+        cached = self.embedding_cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing:
+            fresh = np.asarray(
+                self.model.encode([documents[i] for i in missing], batch_size=batch_size), dtype="float32"
+            )
+            self.embedding_cache.put_many((keys[i], fresh[j]) for j, i in enumerate(missing))
+            cached.update((keys[i], fresh[j]) for j, i in enumerate(missing))
+        return np.stack([cached[key] for key in keys]).astype("float32")
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, directory: str):
+        """Write the FAISS index, texts and metadata columns to `directory`."""
+        if self.index is None:
+            return
+        self.index.save(directory)
+        self.lexical.save(directory)
+        self.metadata.save(directory)
+        docs_path = os.path.join(directory, _DOCS_FILE)
+        with open(docs_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(json.dumps({"model": self.model_name}) + "\n")
+            for text in self.text_store:
+                f.write(json.dumps({"text": text}, ensure_ascii=False) + "\n")
+        os.replace(docs_path + ".tmp", docs_path)
+
+    def load(self, directory: str, mmap: bool = True) -> bool:
+        """Load a store written by `save`; returns False if none exists.
+
+        With `mmap=True` the index is memory-mapped rather than read into RAM.
+        """
+        docs_path = os.path.join(directory, _DOCS_FILE)
+        if not (os.path.exists(os.path.join(directory, "index.faiss")) and os.path.exists(docs_path)):
+            return False
+
+        with open(docs_path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("model", self.model_name) != self.model_name:
+                return False  # vectors from a different model are not comparable
+            entries = [json.loads(line) for line in f if line.strip()]
+
+        self.index = VectorIndex.load(directory, mmap=mmap)
+        self.index_type, self.metric = self.index.requested_type, self.index.metric
+        self.text_store = [e["text"] for e in entries]
+        self.metadata = MetadataStore.load(directory)
+        if self.metadata is None or len(self.metadata) != len(self.text_store):
+            # stores written before metadata columns existed kept it per entry
+            self.metadata = MetadataStore()
+            self.metadata.append([e.get("metadata", {}) for e in entries])
+        self.lexical = BM25Index.load(directory)
+        if self.lexical is None or len(self.lexical) != len(self.text_store):
+            self.lexical = BM25Index()
+            self.lexical.add(self.text_store)
+        return True
 
     # -----------------------------
     # Query vector store
     # -----------------------------
-    def query(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+    def query(self, query: str, k: int = 5, mode: str = "hybrid",
+              where: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """Return the top-k (text, score) pairs for a query.
+
+        mode="vector" scores are L2 distances (cosine similarities when the
+        store uses metric="cosine"); mode="lexical" returns BM25 scores;
+        mode="hybrid" fuses both rankings by reciprocal rank fusion and
+        returns the fused scores (higher is better).
+
+        `where` pre-filters on metadata (see MetadataStore.mask), e.g.
+        {"type": "chunk", "language": "Python", "path_prefix": "agents/"};
+        only matching documents are scored.
+        """
+        return [(self.text_store[i], score) for i, score in self.search(query, k, mode, where)]
+
+    def search(self, query: str, k: int = 5, mode: str = "hybrid",
+               where: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """Like `query`, but returns (document id, score) pairs."""
         if self.index is None:
             return []
 
-        q_embed = self.model.encode([query]).astype("float32")
-        distances, indices = self.index.search(q_embed, k)
+        mask = self.metadata.mask(where) if where else None
+        if mask is not None and not mask.any():
+            return []
+
+        if mode == "lexical":
+            return self._lexical_search(query, k, mask)
+
+        candidates = k if mode == "vector" else max(k * 4, 20)
+        vector_hits = self._vector_search(query, candidates, mask)
+        if mode == "vector":
+            return vector_hits
+
+        lexical_hits = self._lexical_search(query, candidates, mask)
+        fused = reciprocal_rank_fusion([[i for i, _ in vector_hits], [i for i, _ in lexical_hits]])
+        return fused[:k]
+
+    def get_metadata(self, doc_id: int) -> Dict[str, Any]:
+        return self.metadata.row(doc_id)
 
-        results = []
-        for idx, dist in zip(indices[0], distances[0]):
-            if idx < len(self.text_store):
-                results.append((self.text_store[idx], float(dist)))
+    def _vector_search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        q_embed = np.asarray(self.model.encode([query]), dtype="float32")
+        distances, indices = self.index.search(q_embed, k, mask=mask)
+        return [
+            (int(idx), float(dist))
+            for idx, dist in zip(indices[0], distances[0])
+            if 0 <= idx < len(self.text_store)
+        ]
 
-        return results
+    def _lexical_search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        allowed = mask.__getitem__ if mask is not None else None
+        return self.lexical.search(query, k, allowed=allowed)
 
 
 # Module-level convenience functions
@@ -47,17 +176,17 @@ def embed_and_store(text: str, metadata: dict = None, store=None):
     if store is None:
         return
     try:
-        store.add_documents([text])
+        store.add_documents([text], metadatas=[metadata or {}])
     except Exception:
         pass
 
 
-def search_context(query: str, store=None, k: int = 5) -> str:
+def search_context(query: str, store=None, k: int = 5, where: Optional[Dict[str, Any]] = None) -> str:
     """Search vector store for context related to a query."""
     if store is None:
         return ""
     try:
-        results = store.query(query, k=k)
+        results = store.query(query, k=k, where=where) if where else store.query(query, k=k)
         context = "\n".join([text for text, _ in results])
         return context
     except Exception:
@@ -0,0 +1,243 @@
+"""
+Structural refactor detection from rename detection and numstat.
+
+Commit messages are a poor signal for refactors: "merge" matches every
+merge commit, and large moves often come with bland messages. This
+detector scores what a commit did instead, in one streaming pass over
+`CommitRecord`s (oldest first):
+
+- files moved to another directory, and files renamed in place, as
+  reported by git's rename detection
+- directory reshuffles: the distinct (old directory, new directory)
+  pairs that files moved between, and moves into directories never
+  seen before
+- balanced churn: lines deleted and added in similar amounts, the
+  signature of code extracted, merged or rewritten rather than grown
+
+Commits scoring at least `min_score` are clustered with nearby
+candidates into episodes. Only the open episode and a bounded heap of
+the best finished episodes are kept, so memory does not grow with the
+history. Merge commits carry no numstat and never score. Results are
+saved with the HEAD they cover (`save_episodes`), so runs where nothing
+new was committed skip the scan.
+"""
+
+import heapq
+import json
+import math
+import os
+import posixpath
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from tools.commit_stream import CommitRecord
+
+# Score weights; with the default threshold a commit needs about three
+# moves, or a few hundred lines both deleted and added, to count
+_MOVE_WEIGHT = 2.0
+_RENAME_WEIGHT = 1.0
+_NEW_DIRECTORY_WEIGHT = 2.0
+_BALANCED_WEIGHT = 2.0
+_BALANCED_UNIT = 25  # lines; the balanced-churn term grows with log2(1 + lines / unit)
+
+
+class CommitScore(NamedTuple):
+    score: float
+    moved: int
+    renamed: int
+    balanced_lines: int
+    new_directories: int
+    moves: Counter  # (old directory, new directory) -> files
+    examples: List[str]  # "old -> new" for the first few moves
+
+
+class RefactorEpisode(NamedTuple):
+    start: int  # timestamp of the first commit
+    end: int
+    commits: int
+    score: float
+    files_moved: int
+    files_renamed: int
+    balanced_lines: int
+    new_directories: int
+    moves: List[Tuple[str, int]]  # ("old/dir -> new/dir", files), most files first
+    authors: List[str]
+    top_commits: List[Tuple[str, str, float]]  # (sha, subject, score), best first
+    examples: List[str]
+
+    def describe(self) -> str:
+        start = datetime.fromtimestamp(self.start, timezone.utc).strftime("%Y-%m-%d")
+        end = datetime.fromtimestamp(self.end, timezone.utc).strftime("%Y-%m-%d")
+        period = start if start == end else f"{start} to {end}"
+        evidence = []
+        if self.files_moved:
+            moves = ", ".join(f"{pair} x{n}" for pair, n in self.moves[:2])
+            evidence.append(f"{self.files_moved} files moved ({moves})")
+        if self.files_renamed:
+            evidence.append(f"{self.files_renamed} renamed in place")
+        if self.new_directories:
+            evidence.append(f"{self.new_directories} new directories")
+        if self.balanced_lines:
+            evidence.append(f"~{self.balanced_lines} lines rewritten or moved between files")
+        commits = "; ".join(f"[{sha[:7]}] {subject[:60]}" for sha, subject, _ in self.top_commits[:2])
+        return (f"{period}: {self.commits} commit{'s' if self.commits != 1 else ''} by {', '.join(self.authors[:3])}, "
+                f"{', '.join(evidence)} (score {self.score:.0f}); {commits}")
+
+
+def score_commit(record: CommitRecord, known_directories: Set[str], max_examples: int = 3) -> CommitScore:
+    """Structural score of one commit; `known_directories` is updated with the directories it touches."""
+    moved = renamed = added = deleted = 0
+    moves: Counter = Counter()
+    new_directories = set()
+    examples = []
+    for f in record.files:
+        directory = posixpath.dirname(f.path) or "."
+        if f.old_path and f.old_path != f.path:
+            old_directory = posixpath.dirname(f.old_path) or "."
+            if old_directory != directory:
+                moved += 1
+                moves[(old_directory, directory)] += 1
+                if directory not in known_directories:
+                    new_directories.add(directory)
+                if len(examples) < max_examples:
+                    examples.append(f"{f.old_path} -> {f.path}")
+            else:
+                renamed += 1
+        else:
+            added += f.added
+            deleted += f.deleted
+    known_directories.update(posixpath.dirname(f.path) or "." for f in record.files)
+
+    balanced = min(added, deleted)
+    ratio = balanced / max(added, deleted) if balanced else 0.0
+    score = (_MOVE_WEIGHT * moved + _RENAME_WEIGHT * renamed + len(moves)
+             + _NEW_DIRECTORY_WEIGHT * len(new_directories)
+             + _BALANCED_WEIGHT * ratio * math.log2(1 + balanced / _BALANCED_UNIT))
+    return CommitScore(round(score, 2), moved, renamed, balanced, len(new_directories), moves, examples)
+
+
+class _Episode:
+    """Running totals of the episode being built."""
+
+    def __init__(self, record: CommitRecord, scored: CommitScore):
+        self.start = self.end = record.timestamp
+        self.commits = 0
+        self.score = 0.0
+        self.moved = self.renamed = self.balanced = self.new_directories = 0
+        self.moves: Counter = Counter()
+        self.authors: Counter = Counter()
+        self.top: List[Tuple[float, str, str]] = []
+        self.examples: List[str] = []
+        self.add(record, scored)
+
+    def add(self, record: CommitRecord, scored: CommitScore):
+        self.end = max(self.end, record.timestamp)
+        self.commits += 1
+        self.score += scored.score
+        self.moved += scored.moved
+        self.renamed += scored.renamed
+        self.balanced += scored.balanced_lines
+        self.new_directories += scored.new_directories
+        self.moves.update(scored.moves)
+        self.authors[record.author] += 1
+        self.top = sorted(self.top + [(scored.score, record.sha, record.message)], reverse=True)[:3]
+        self.examples.extend(scored.examples[:3 - len(self.examples)])
+
+    def finish(self) -> RefactorEpisode:
+        return RefactorEpisode(
+            start=self.start,
+            end=self.end,
+            commits=self.commits,
+            score=round(self.score, 1),
+            files_moved=self.moved,
+            files_renamed=self.renamed,
+            balanced_lines=self.balanced,
+            new_directories=self.new_directories,
+            moves=[(f"{old} -> {new}", n) for (old, new), n in self.moves.most_common(5)],
+            authors=[a for a, _ in self.authors.most_common()],
+            top_commits=[(sha, message, score) for score, sha, message in self.top],
+            examples=self.examples,
+        )
+
+
+class RefactorDetector:
+    """Scores commits as they stream by and keeps the best refactor episodes."""
+
+    def __init__(self, limit: int = 10, min_score: float = 6.0, max_gap_commits: int = 5,
+                 max_gap_days: float = 7.0):
+        self.limit = limit
+        self.min_score = min_score
+        self.max_gap_commits = max_gap_commits
+        self.max_gap_seconds = max_gap_days * 86400
+        self.known_directories: Set[str] = set()
+        self._episode: Optional[_Episode] = None
+        self._since_candidate = 0
+        self._best: List[Tuple[float, int, RefactorEpisode]] = []  # min-heap on score
+        self._finished = 0
+
+    def add(self, record: CommitRecord):
+        """Feed the next commit (oldest first)."""
+        if len(record.parents) > 1 or not record.files:
+            self._since_candidate += 1
+            return
+        scored = score_commit(record, self.known_directories)
+        if scored.score < self.min_score:
+            self._since_candidate += 1
+            return
+        episode = self._episode
+        if (episode is not None and self._since_candidate <= self.max_gap_commits
+                and record.timestamp - episode.end <= self.max_gap_seconds):
+            episode.add(record, scored)
+        else:
+            self._close()
+            self._episode = _Episode(record, scored)
+        self._since_candidate = 0
+
+    def _close(self):
+        if self._episode is None:
+            return
+        episode = self._episode.finish()
+        self._episode = None
+        self._finished += 1
+        entry = (episode.score, self._finished, episode)
+        if len(self._best) < self.limit:
+            heapq.heappush(self._best, entry)
+        elif entry > self._best[0]:
+            heapq.heapreplace(self._best, entry)
+
+    def episodes(self) -> List[RefactorEpisode]:
+        """The highest-scoring episodes, best first."""
+        self._close()
+        return [episode for _, _, episode in sorted(self._best, reverse=True)]
+
+
+def detect_refactors(records: Iterable[CommitRecord], limit: int = 10, **kwargs) -> List[RefactorEpisode]:
+    """Rank refactor episodes in a chronological stream of commits."""
+    detector = RefactorDetector(limit=limit, **kwargs)
+    for record in records:
+        detector.add(record)
+    return detector.episodes()
+
+
+def save_episodes(path: str, head: Optional[str], episodes: List[RefactorEpisode]):
+    """Write episodes with the HEAD they were computed at."""
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"head": head, "episodes": [list(e) for e in episodes]}, f)
+    os.replace(path + ".tmp", path)
+
+
+def load_episodes(path: str, head: Optional[str]) -> Optional[List[RefactorEpisode]]:
+    """Episodes saved at `path` if they were computed at `head`, else None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("head") != head:
+        return None
+    episodes = []
+    for values in state["episodes"]:
+        episode = RefactorEpisode(*values)
+        episodes.append(episode._replace(moves=[tuple(m) for m in episode.moves],
+                                         top_commits=[tuple(c) for c in episode.top_commits]))
+    return episodes
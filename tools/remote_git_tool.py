@@ -5,14 +5,24 @@ Uses GitHub API for reliable, fast access to commit history.
 
 import subprocess
 import json
-from typing import List, Dict, Any, Optional
-from collections import Counter
+from typing import List, Dict, Any, NamedTuple, Optional, Union
+from tools.commit_table import CommitTable, as_table
 
 try:
     import requests
 except ImportError:
     requests = None
 
+# Fixed page size, so a listing offset maps to a page and a position in it
+_PER_PAGE = 100
+
+
+class CommitFetch(NamedTuple):
+    commits: List[Dict[str, Any]]  # newest first
+    complete: bool  # reached `stop_at` or the end of history
+    start: Optional[str]  # SHA the listing is pinned to; None if nothing was listed
+    offset: int  # listing position to resume from
+
 
 class RemoteGitTool:
     """Analyze Git repositories remotely using GitHub API."""
@@ -45,61 +55,79 @@ class RemoteGitTool:
         except Exception as e:
             raise Exception(f"Invalid GitHub repository: {str(e)}")
     
-    def get_remote_commits(self, max_commits: int = 100) -> List[Dict[str, Any]]:
-        """Fetch commit history from GitHub API."""
+    def get_remote_commits(self, max_commits: int = 100, stop_at: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Fetch commit history from GitHub API, newest first.
+
+        If `stop_at` is a full commit SHA, paging stops as soon as that commit
+        is reached, so only commits newer than it are fetched.
+        """
+        return self.fetch_commits(max_commits, stop_at=stop_at).commits
+
+    def fetch_commits(self, max_commits: int = 100, stop_at: Optional[str] = None, start: Optional[str] = None,
+                      offset: int = 0) -> CommitFetch:
+        """Page through the commits listed from `start` (default branch if None), newest first.
+
+        Listing begins `offset` commits into the list and ends at `stop_at`,
+        the end of history, `max_commits`, or an API error. The result says
+        whether the walk finished; if not, calling again with the returned
+        `start` and `offset` continues where it left off. Once the first page
+        is read the listing is pinned to its newest commit, so commits pushed
+        meanwhile do not shift the pages.
+        """
         if not self.is_github or not requests:
             print("[RemoteGitTool] GitHub API unavailable, trying git command")
-            return self._get_commits_via_git()
-        
+            return CommitFetch(self._get_commits_via_git(), False, None, 0)
+
+        commits: List[Dict[str, Any]] = []
+        position = offset
+        complete = False
+        api_url = f"https://api.github.com/repos/{self.repo_path}/commits"
         try:
-            commits = []
-            api_url = f"https://api.github.com/repos/{self.repo_path}/commits"
-            
-            # Paginate through commits
-            page = 1
-            per_page = min(100, max_commits)
-            
             while len(commits) < max_commits:
-                params = {
-                    "per_page": per_page,
-                    "page": page
-                }
-                
+                page_start = position - position % _PER_PAGE
+                params = {"per_page": _PER_PAGE, "page": page_start // _PER_PAGE + 1}
+                if start:
+                    params["sha"] = start
+
                 response = requests.get(api_url, params=params, timeout=15)
-                
+
                 if response.status_code != 200:
                     print(f"[RemoteGitTool] GitHub API error: {response.status_code}")
                     break
-                
+
                 batch = response.json()
-                if not batch:
-                    break
-                
-                for commit in batch:
+                if start is None and batch:
+                    start = batch[0]["sha"]
+
+                for commit in batch[position - page_start:]:
                     if len(commits) >= max_commits:
                         break
-                    
-                    commit_obj = {
+                    if stop_at and commit["sha"] == stop_at:
+                        complete = True
+                        break
+
+                    commits.append({
+                        "sha": commit["sha"],
                         "hash": commit["sha"][:7],
                         "author": commit["commit"]["author"].get("name", "Unknown"),
                         "email": commit["commit"]["author"].get("email", ""),
                         "date": commit["commit"]["author"].get("date", ""),
                         "message": commit["commit"]["message"].split('\n')[0]
-                    }
-                    commits.append(commit_obj)
-                
-                if len(batch) < per_page:
+                    })
+                    position += 1
+
+                # A short page that was read to its end is the end of history
+                if complete or (len(batch) < _PER_PAGE and position == page_start + len(batch)):
+                    complete = True
                     break
-                
-                page += 1
-            
-            print(f"[RemoteGitTool] Fetched {len(commits)} commits from GitHub API")
-            return commits
-            
+
         except Exception as e:
             print(f"[RemoteGitTool] GitHub API error: {e}")
-            return []
-    
+
+        print(f"[RemoteGitTool] Fetched {len(commits)} commits from GitHub API"
+              + ("" if complete else " (incomplete)"))
+        return CommitFetch(commits, complete, start, position)
+
     def _get_commits_via_git(self) -> List[Dict[str, Any]]:
         """Fallback: try git command with shorter timeout."""
         try:
@@ -158,37 +186,13 @@ class RemoteGitTool:
             print(f"[RemoteGitTool] Could not fetch repo info: {e}")
             return {}
     
-    def analyze_commit_patterns(self, commits: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def analyze_commit_patterns(self, commits: Union[CommitTable, List[Dict[str, Any]]]) -> Dict[str, Any]:
         """Analyze patterns from commit messages."""
-        keywords = Counter()
-        message_types = Counter()
-        authors = Counter()
-        
-        for c in commits:
-            msg = c.get('message', '').lower()
-            author = c.get('author', 'unknown')
-            authors[author] += 1
-            
-            # Classify commit type
-            if any(w in msg for w in ['fix', 'bug', 'issue', 'resolve', 'patch', 'hotfix']):
-                message_types['bug_fix'] += 1
-            elif any(w in msg for w in ['feat', 'feature', 'add', 'new', 'implement', 'introduce']):
-                message_types['feature'] += 1
-            elif any(w in msg for w in ['refactor', 'clean', 'improve', 'optimize', 'perf', 'performance']):
-                message_types['refactor'] += 1
-            elif any(w in msg for w in ['doc', 'readme', 'comment', 'docs', 'documentation']):
-                message_types['documentation'] += 1
-            elif any(w in msg for w in ['test', 'tests', 'testing', 'coverage']):
-                message_types['tests'] += 1
-            else:
-                message_types['other'] += 1
-            
-            # Extract keywords
-            words = [w for w in msg.split() if len(w) > 4 and not w.startswith('#') and not w.startswith('(')]
-            keywords.update(words)
-        
+        table = as_table(commits)
+        batch = table.classify()
+
         return {
-            "types": dict(message_types),
-            "keywords": dict(keywords.most_common(15)),
-            "top_authors": dict(authors.most_common(10))
+            "types": batch.type_counts(),
+            "keywords": dict(batch.keywords.most_common(15)),
+            "top_authors": table.author_counts(10)
         }
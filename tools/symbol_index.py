@@ -0,0 +1,399 @@
+"""
+Symbol-level provenance: which commits shaped each function and class.
+
+Top-level functions and classes at HEAD are found with the chunker's
+block finder (`ast` for Python, the brace scanner for C-like languages).
+A single streaming `git log -p -U0 --first-parent` pass then walks the
+history from newest to oldest and reads only hunk headers. For every
+commit that touched a file, each tracked symbol span is checked against
+the commit's hunks and then translated into the coordinates of the
+parent commit. A symbol stops being tracked at the commit that created
+it. Renames are followed. Merges count as one change against their first
+parent.
+
+The result is stored in SQLite: symbols, commits, and a symbol -> commit
+posting table. When HEAD moves, only the new commits are walked. Spans
+are carried back to the previous HEAD, and the symbol with the same file
+and name there passes on its stored commits. A query by name is one
+indexed lookup, with no `git log -L` or blame per question.
+"""
+
+import codecs
+import os
+import re
+import sqlite3
+import subprocess
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from memory.cache_paths import repo_cache_dir
+from tools.blob_reader import get_blob_reader
+from tools.chunker import BRACE_EXTENSIONS, PYTHON_EXTENSIONS, top_level_blocks
+from tools.commit_stream import iter_log_records
+from tools.file_discovery import tree_blobs
+
+_CACHE_FILE = "symbols.sqlite"
+_LOG_FORMAT = "%x1e%H%x1f%an%x1f%ct%x1f%s"
+_EXTENSIONS = tuple(sorted(PYTHON_EXTENSIONS | BRACE_EXTENSIONS))
+_PATHSPECS = tuple(f"*{ext}" for ext in _EXTENSIONS)
+# Patch lines the walk needs; everything else (the changed lines themselves) is skipped in C
+_PATCH_LINE = re.compile(
+    rb"^(?:diff --git |@@ |rename from |rename to |new file mode|deleted file mode|--- |\+\+\+ ).*$", re.MULTILINE
+)
+_HUNK = re.compile(rb"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_PARSE_CHUNK = 512
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, blob TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT,
+    start_line INTEGER,
+    end_line INTEGER
+);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols(name);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols(path);
+CREATE TABLE IF NOT EXISTS commits (
+    seq INTEGER PRIMARY KEY, sha TEXT UNIQUE NOT NULL, author TEXT, timestamp INTEGER, subject TEXT
+);
+CREATE TABLE IF NOT EXISTS symbol_commits (
+    symbol_id INTEGER NOT NULL, commit_seq INTEGER NOT NULL, PRIMARY KEY (symbol_id, commit_seq)
+) WITHOUT ROWID;
+"""
+
+
+class Symbol(NamedTuple):
+    path: str
+    name: str
+    kind: str  # "function" or "class"
+    start_line: int  # 1-based, inclusive
+    end_line: int
+
+
+class FileDiff(NamedTuple):
+    old_path: Optional[str]  # None when the commit added the file
+    new_path: Optional[str]  # None when the commit deleted it
+    hunks: List[Tuple[int, int, int, int]]  # (old start, old count, new start, new count)
+
+
+class SymbolIndex:
+    """On-disk symbol -> commits index for one local repository."""
+
+    def __init__(self, repo_path: str, cache_dir: Optional[str] = None, workers: Optional[int] = None):
+        self.repo_path = os.path.abspath(repo_path)
+        self.cache_dir = cache_dir or repo_cache_dir(repo_path)
+        self.workers = workers or os.cpu_count() or 1
+        self.conn = sqlite3.connect(os.path.join(self.cache_dir, _CACHE_FILE), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    # -----------------------------
+    # Building
+    # -----------------------------
+    @property
+    def head(self) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'head'").fetchone()
+        return row[0] if row else None
+
+    def update(self) -> int:
+        """Bring the index up to date with HEAD; returns the number of commits that touched a symbol."""
+        head = _git(self.repo_path, "rev-parse", "HEAD")
+        old_head = self.head
+        if not head or head == old_head:
+            return 0
+        if old_head and not _git_ok(self.repo_path, "merge-base", "--is-ancestor", old_head, head):
+            print("[SymbolIndex] History was rewritten; rebuilding index")
+            self.clear()
+            old_head = None
+
+        blobs = tree_blobs(self.repo_path, head, _EXTENSIONS)
+        symbols = self._head_symbols(blobs)
+        spans: Dict[str, List[List[int]]] = {}
+        for i, s in enumerate(symbols):
+            spans.setdefault(s.path, []).append([i, s.start_line, s.end_line])
+
+        revisions = [head] + ([f"^{old_head}"] if old_head else [])
+        commits: List[Tuple[str, str, int, str]] = []
+        postings: List[Tuple[int, int]] = []  # (symbol index, commit index)
+        for commit, touched in walk_history(self.repo_path, revisions, spans):
+            postings.extend((i, len(commits)) for i in touched)
+            commits.append(commit)
+
+        # Symbols still tracked are now in the previous HEAD's coordinates
+        carried = {i: path for path, tracked in spans.items() for i, _, _ in tracked} if old_head else {}
+        self._store(head, blobs, symbols, carried, commits, postings)
+        return len(commits)
+
+    def _head_symbols(self, blobs: Dict[str, str]) -> List[Symbol]:
+        """Symbols of every file at HEAD; files whose blob did not change reuse their stored symbols."""
+        stored = dict(self.conn.execute("SELECT path, blob FROM files"))
+        symbols: List[Symbol] = []
+        unchanged = {path for path, blob in blobs.items() if stored.get(path) == blob}
+        if unchanged:
+            rows = self.conn.execute("SELECT path, name, kind, start_line, end_line FROM symbols ORDER BY id")
+            symbols.extend(Symbol(*row) for row in rows if row[0] in unchanged)
+        changed = [path for path in blobs if path not in unchanged]
+        if not changed:
+            return symbols
+        reader = get_blob_reader(self.repo_path)
+        chunks = [changed[i:i + _PARSE_CHUNK] for i in range(0, len(changed), _PARSE_CHUNK)]
+        contents = (list(zip(chunk, reader.read_many([blobs[path] for path in chunk]))) for chunk in chunks)
+        if len(chunks) == 1 or self.workers == 1:
+            for chunk in contents:
+                symbols.extend(_extract_chunk(chunk))
+            return symbols
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(chunks))) as pool:
+            # A bounded number of chunks in flight, so the blobs are never all in memory
+            pending = deque(pool.submit(_extract_chunk, chunk) for chunk in islice(contents, 2 * self.workers))
+            while pending:
+                symbols.extend(pending.popleft().result())
+                for chunk in islice(contents, 1):
+                    pending.append(pool.submit(_extract_chunk, chunk))
+        return symbols
+
+    def _store(self, head: str, blobs: Dict[str, str], symbols: List[Symbol], carried: Dict[int, str],
+               commits: List[Tuple[str, str, int, str]], postings: List[Tuple[int, int]]):
+        # Old symbols that survived to the new HEAD keep their id and postings,
+        # matched by their path at the previous HEAD and their name
+        previous: Dict[Tuple[str, str, str], List[int]] = {}
+        for symbol_id, path, name, kind in self.conn.execute("SELECT id, path, name, kind FROM symbols ORDER BY id"):
+            previous.setdefault((path, name, kind), []).append(symbol_id)
+        ids: List[Optional[int]] = [None] * len(symbols)
+        for i, path in carried.items():
+            matches = previous.get((path, symbols[i].name, symbols[i].kind))
+            if matches:
+                ids[i] = matches.pop(0)
+        stale = [(symbol_id,) for matches in previous.values() for symbol_id in matches]
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM symbol_commits WHERE symbol_id = ?", stale)
+            self.conn.executemany("DELETE FROM symbols WHERE id = ?", stale)
+            self.conn.executemany(
+                "UPDATE symbols SET path = ?, start_line = ?, end_line = ? WHERE id = ?",
+                [(s.path, s.start_line, s.end_line, ids[i]) for i, s in enumerate(symbols) if ids[i] is not None],
+            )
+            for i, s in enumerate(symbols):
+                if ids[i] is None:
+                    ids[i] = self.conn.execute(
+                        "INSERT INTO symbols (path, name, kind, start_line, end_line) VALUES (?, ?, ?, ?, ?)", s
+                    ).lastrowid
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO commits (sha, author, timestamp, subject) VALUES (?, ?, ?, ?)", commits
+            )
+            seqs = {}
+            for i in range(0, len(commits), 500):
+                batch = [c[0] for c in commits[i:i + 500]]
+                seqs.update(self.conn.execute(
+                    f"SELECT sha, seq FROM commits WHERE sha IN ({','.join('?' * len(batch))})", batch
+                ))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO symbol_commits (symbol_id, commit_seq) VALUES (?, ?)",
+                [(ids[i], seqs[commits[c][0]]) for i, c in postings],
+            )
+            self.conn.execute("DELETE FROM files")
+            self.conn.executemany("INSERT INTO files (path, blob) VALUES (?, ?)", blobs.items())
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('head', ?)", (head,))
+
+    def clear(self):
+        with self.conn:
+            for table in ("meta", "files", "symbols", "commits", "symbol_commits"):
+                self.conn.execute(f"DELETE FROM {table}")
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def find(self, name: str) -> List[Tuple[int, Symbol]]:
+        """(id, symbol) for every symbol called `name`."""
+        rows = self.conn.execute(
+            "SELECT id, path, name, kind, start_line, end_line FROM symbols WHERE name = ? ORDER BY path", (name,)
+        )
+        return [(row[0], Symbol(*row[1:])) for row in rows]
+
+    def commits(self, symbol_id: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Commits whose changes intersected the symbol, newest first."""
+        rows = self.conn.execute(
+            "SELECT c.sha, c.author, c.timestamp, c.subject FROM symbol_commits p "
+            "JOIN commits c ON c.seq = p.commit_seq WHERE p.symbol_id = ? "
+            "ORDER BY c.timestamp DESC, c.seq ASC LIMIT ?",
+            (symbol_id, -1 if limit is None else limit),
+        )
+        return [{"hash": sha[:7], "sha": sha, "author": author, "timestamp": timestamp, "message": subject}
+                for sha, author, timestamp, subject in rows]
+
+    def lookup(self, names: Sequence[str], limit: int = 3, commits_per_symbol: int = 10) -> List[Dict[str, Any]]:
+        """Up to `limit` symbols matching `names` (earlier names first), each with its commits."""
+        found = []
+        for name in dict.fromkeys(names):
+            for symbol_id, symbol in self.find(name):
+                found.append({**symbol._asdict(), "commits": self.commits(symbol_id, commits_per_symbol)})
+                if len(found) >= limit:
+                    return found
+        return found
+
+    def close(self):
+        self.conn.close()
+
+
+# -----------------------------
+# History walk
+# -----------------------------
+def walk_history(repo_path: str, revisions: Sequence[str], spans: Dict[str, List[List[int]]]):
+    """Yield ((sha, author, timestamp, subject), touched symbol ids) for each commit, newest first.
+
+    `spans` maps a path to [symbol id, start line, end line] entries in
+    HEAD coordinates. It is updated in place as the walk moves back in
+    time. When the walk ends it holds the symbols that predate the oldest
+    commit walked, in that commit's parent's coordinates.
+    """
+    cmd = ["git", "-c", "core.quotePath=false", "log", "-p", "-U0", "-M", "--first-parent", "-m", "--no-color",
+           "--no-ext-diff", "--no-textconv", "--src-prefix=a/", "--dst-prefix=b/", f"--format={_LOG_FORMAT}",
+           *revisions, "--", *_PATHSPECS]
+    for raw in iter_log_records(repo_path, cmd):
+        if not spans:
+            break
+        parsed = _parse_patch_record(raw)
+        if parsed is None:
+            continue
+        commit, diffs = parsed
+        touched: List[int] = []
+        moved: Dict[str, List[List[int]]] = {}
+        for diff in diffs:
+            tracked = spans.pop(diff.new_path, None) if diff.new_path else None
+            if not tracked:
+                continue
+            hunks = _Hunks(diff.hunks)
+            touched.extend(symbol_id for symbol_id, start, end in tracked if hunks.touches(start, end))
+            if diff.old_path is None:
+                continue  # the file, and every symbol in it, was created here
+            for entry in tracked:
+                entry[1], entry[2] = hunks.old_line(entry[1], True), hunks.old_line(entry[2], False)
+            moved.setdefault(diff.old_path, []).extend(entry for entry in tracked if entry[1] <= entry[2])
+        for path, tracked in moved.items():
+            spans.setdefault(path, []).extend(tracked)
+        if touched:
+            yield commit, touched
+
+
+class _Hunks:
+    """Line ranges of one file's -U0 hunks, for span tests and mapping lines to the parent."""
+
+    def __init__(self, hunks: List[Tuple[int, int, int, int]]):
+        # A zero-count range sits between `start` and `start + 1`; it becomes the empty range [start + 1, start]
+        self.new_first = [new_start + (new_count == 0) for _, _, new_start, new_count in hunks]
+        self.new_last = [first + h[3] - 1 for first, h in zip(self.new_first, hunks)]
+        self.old_first = [old_start + (old_count == 0) for old_start, old_count, _, _ in hunks]
+        self.old_count = [old_count for _, old_count, _, _ in hunks]
+
+    def touches(self, start: int, end: int) -> bool:
+        """True if a hunk changed lines in [start, end] or deleted lines strictly inside it."""
+        i = bisect_right(self.new_first, end) - 1
+        return i >= 0 and self.new_last[i] >= start
+
+    def old_line(self, line: int, is_start: bool) -> int:
+        i = bisect_right(self.new_first, line) - 1
+        if i < 0:
+            return line
+        if line <= self.new_last[i]:
+            # Inside a changed range: clamp to the range the hunk replaced
+            return self.old_first[i] if is_start else self.old_first[i] + self.old_count[i] - 1
+        return line + (self.old_first[i] + self.old_count[i]) - (self.new_last[i] + 1)
+
+
+def _parse_patch_record(raw: bytes) -> Optional[Tuple[Tuple[str, str, int, str], List[FileDiff]]]:
+    header, _, patch = raw.partition(b"\n")
+    fields = header.decode("utf-8", errors="replace").split("\x1f", 3)
+    if len(fields) != 4 or not fields[2].isdigit():
+        return None  # a stray record separator inside a patch
+    sha, author, timestamp, subject = fields
+    diffs: List[FileDiff] = []
+    current = None  # [old path, new path, hunks, still in the file header]
+    for match in _PATCH_LINE.finditer(patch):
+        line = match.group()
+        if line.startswith(b"diff --git "):
+            if current is not None:
+                diffs.append(FileDiff(*current[:3]))
+            path = _diff_git_path(line[11:])
+            current = [path, path, [], True]
+        elif current is None:
+            continue
+        elif line.startswith(b"@@ "):
+            hunk = _HUNK.match(line)
+            if hunk:
+                current[3] = False
+                old_start, old_count, new_start, new_count = hunk.groups()
+                current[2].append((int(old_start), 1 if old_count is None else int(old_count),
+                                   int(new_start), 1 if new_count is None else int(new_count)))
+        elif current[3]:
+            # Header lines; once hunks start, "--- "/"+++ " lines are changed content
+            if line.startswith(b"rename from "):
+                current[0] = _decode_path(line[12:])
+            elif line.startswith(b"rename to "):
+                current[1] = _decode_path(line[10:])
+            elif line.startswith(b"new file mode"):
+                current[0] = None
+            elif line.startswith(b"deleted file mode"):
+                current[1] = None
+            elif line.startswith(b"--- "):
+                current[0] = _prefixed_path(line[4:])
+            elif line.startswith(b"+++ "):
+                current[1] = _prefixed_path(line[4:])
+    if current is not None:
+        diffs.append(FileDiff(*current[:3]))
+    return (sha, author, int(timestamp), subject), diffs
+
+
+def _decode_path(raw: bytes) -> str:
+    raw = raw.rstrip(b"\t")  # git appends a tab to names containing spaces
+    if raw.startswith(b'"') and raw.endswith(b'"'):
+        raw = codecs.escape_decode(raw[1:-1])[0]
+    return raw.decode("utf-8", errors="replace")
+
+
+def _prefixed_path(raw: bytes) -> Optional[str]:
+    if raw.rstrip(b"\t") == b"/dev/null":
+        return None
+    path = _decode_path(raw)
+    return path[2:] if path[:2] in ("a/", "b/") else path
+
+
+def _diff_git_path(raw: bytes) -> str:
+    """Path from `a/<path> b/<path>`; exact for unrenamed files, which is all it is used for."""
+    if raw.startswith(b'"'):
+        end = raw.index(b'"', 1)
+        while raw[end - 1:end] == b"\\":
+            end = raw.index(b'"', end + 1)
+        return _prefixed_path(raw[:end + 1]) or ""
+    return _prefixed_path(raw[:(len(raw) - 1) // 2]) or ""
+
+
+# -----------------------------
+# Symbol extraction
+# -----------------------------
+def extract_symbols(path: str, content: str) -> List[Symbol]:
+    """Named top-level functions and classes of one file."""
+    return [Symbol(path, b.name, b.kind, b.start_line, b.end_line)
+            for b in top_level_blocks(content, path) if b.name and b.kind != "statement"]
+
+
+def _extract_chunk(files: List[Tuple[str, Optional[bytes]]]) -> List[Symbol]:
+    symbols = []
+    for path, data in files:
+        if data is not None and b"\0" not in data[:8192]:
+            symbols.extend(extract_symbols(path, data.decode("utf-8", errors="replace")))
+    return symbols
+
+
+def _git(repo_path: str, *args: str) -> Optional[str]:
+    result = subprocess.run(["git", "-C", repo_path, *args], capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def _git_ok(repo_path: str, *args: str) -> bool:
+    return subprocess.run(["git", "-C", repo_path, *args], capture_output=True).returncode == 0
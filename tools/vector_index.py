@@ -0,0 +1,274 @@
+"""
+FAISS index backends for RAGTool with automatic selection.
+
+Supported backends are exact `flat`, `ivf_flat`, `ivf_pq` and `hnsw`.
+With `index_type="auto"` the index starts exact and is rebuilt into an
+approximate backend once the corpus grows past the size where brute
+force stops being cheap; IVF training happens as part of that rebuild,
+so callers never train anything themselves. `metric="cosine"` stores
+L2-normalised vectors in an inner-product index, in which case search
+scores are similarities (higher is better) rather than distances.
+
+The recall a backend is tuned for (`target_recall`) also holds for
+searches filtered with a metadata mask. The selector alone does not
+guarantee it, because the traversal never reaches most allowed rows when
+the mask is selective. Such searches are scored exactly, and broader
+ones widen efSearch/nprobe in proportion to the rows filtered out.
+"""
+
+import json
+import math
+import os
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Corpus sizes at which "auto" moves to an approximate backend
+FLAT_MAX = 20_000
+HNSW_MAX = 1_000_000
+# Vectors needed before an explicitly requested IVF backend is trained
+MIN_TRAINING_POINTS = {"ivf_flat": 1000, "ivf_pq": 39 * 256}
+_CONFIG_FILE = "index.json"
+# Filtered searches over at most this many rows are scored exactly
+_EXACT_FILTER_MAX = 4096
+# Upper bound for the widened HNSW beam of a filtered search
+_EF_SEARCH_MAX = 4096
+
+
+def choose_index_type(n: int, target_recall: float = 0.95) -> str:
+    """Pick a backend for a corpus of `n` vectors and a target recall."""
+    if n < FLAT_MAX or target_recall >= 0.999:
+        return "flat"
+    if n < HNSW_MAX:
+        return "hnsw" if target_recall >= 0.9 else "ivf_flat"
+    return "ivf_flat" if target_recall >= 0.99 else "ivf_pq"
+
+
+def _nlist(n: int) -> int:
+    # ~4*sqrt(n) lists, while keeping >= 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def _nprobe(nlist: int, target_recall: float) -> int:
+    fraction = 0.02 if target_recall < 0.9 else 0.05 if target_recall < 0.95 else 0.1 if target_recall < 0.99 else 0.25
+    return max(1, min(nlist, int(math.ceil(nlist * fraction))))
+
+
+def _ef_search(target_recall: float) -> int:
+    return 64 if target_recall < 0.9 else 128 if target_recall < 0.99 else 256
+
+
+def _pq_subquantizers(dim: int) -> int:
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if dim % m == 0 and dim // m >= 4:
+            return m
+    return 1
+
+
+class VectorIndex:
+    def __init__(self, dim: int, index_type: str = "auto", metric: str = "l2", target_recall: float = 0.95):
+        if index_type != "auto" and index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {index_type!r}; expected 'auto' or one of {INDEX_TYPES}")
+        if metric not in ("l2", "cosine"):
+            raise ValueError(f"Unknown metric {metric!r}; expected 'l2' or 'cosine'")
+        self.dim = dim
+        self.requested_type = index_type
+        self.metric = metric
+        self.target_recall = target_recall
+        self.read_only = False
+        self.index_path: Optional[str] = None
+        # IVF backends need training data, so they start out exact and are
+        # rebuilt once enough vectors exist
+        self.index_type = index_type if index_type in ("flat", "hnsw") else "flat"
+        self.index = self._new_index(self.index_type, 0)
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def higher_is_better(self) -> bool:
+        return self.metric == "cosine"
+
+    # -----------------------------
+    # Build
+    # -----------------------------
+    def add(self, vectors: np.ndarray):
+        vectors = self._prepare(vectors)
+        if self.read_only:
+            self._materialize()
+        self.index.add(vectors)
+        self._maybe_rebuild()
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if self.metric == "cosine":
+            vectors = vectors.copy()
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _faiss_metric(self) -> int:
+        return faiss.METRIC_INNER_PRODUCT if self.metric == "cosine" else faiss.METRIC_L2
+
+    def _new_index(self, index_type: str, n: int):
+        metric = self._faiss_metric()
+        if index_type == "flat":
+            return faiss.IndexFlatIP(self.dim) if self.metric == "cosine" else faiss.IndexFlatL2(self.dim)
+        if index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dim, 32, metric)
+            index.hnsw.efConstruction = 80
+            index.hnsw.efSearch = _ef_search(self.target_recall)
+            return index
+        quantizer = faiss.IndexFlatIP(self.dim) if self.metric == "cosine" else faiss.IndexFlatL2(self.dim)
+        nlist = _nlist(n)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, self.dim, nlist, metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, self.dim, nlist, _pq_subquantizers(self.dim), 8, metric)
+        index.nprobe = _nprobe(nlist, self.target_recall)
+        return index
+
+    def _target_type(self) -> str:
+        n = self.index.ntotal
+        if self.requested_type == "auto":
+            return choose_index_type(n, self.target_recall)
+        if n < MIN_TRAINING_POINTS.get(self.requested_type, 0):
+            return "flat"
+        return self.requested_type
+
+    def _maybe_rebuild(self):
+        target = self._target_type()
+        if target != self.index_type:
+            self._rebuild(target)
+
+    def _rebuild(self, index_type: str):
+        """Move every stored vector into a freshly built (and trained) index."""
+        n = self.index.ntotal
+        vectors = self._reconstruct_all()
+        index = self._new_index(index_type, n)
+        if not index.is_trained:
+            sample = vectors
+            if n > 256 * _nlist(n):
+                rng = np.random.default_rng(0)
+                sample = vectors[rng.choice(n, 256 * _nlist(n), replace=False)]
+            index.train(sample)
+        index.add(vectors)
+        self.index = index
+        self.index_type = index_type
+        print(f"[VectorIndex] Rebuilt {n} vectors as {index_type}")
+
+    def _reconstruct_all(self) -> np.ndarray:
+        if isinstance(self.index, faiss.IndexIVF):
+            self.index.make_direct_map()
+        return self.index.reconstruct_n(0, self.index.ntotal)
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def search(self, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Search the index; `mask` restricts scoring to rows where it is True.
+
+        A filtered search returns min(k, allowed rows) hits per query on every
+        backend. Approximate backends traverse the graph or lists as if the
+        filter were absent, so selective filters would miss most allowed rows.
+        Those are scored exactly instead; broader ones widen the search by
+        ntotal / allowed and fall back to exact scoring for queries that
+        still come up short.
+        """
+        query = self._prepare(query)
+        allowed = int(mask[:self.index.ntotal].sum()) if mask is not None else self.index.ntotal
+        k = min(k, allowed)
+        if k <= 0:
+            return np.empty((len(query), 0), dtype="float32"), np.empty((len(query), 0), dtype="int64")
+        if mask is None:
+            return self.index.search(query, k)
+
+        mask = mask[:self.index.ntotal]
+        if isinstance(self.index, faiss.IndexFlat):
+            return self._selector_search(query, k, mask, faiss.SearchParameters)
+        if allowed <= _EXACT_FILTER_MAX:
+            return self._exact_subset(query, k, mask)
+
+        scale = self.index.ntotal / allowed
+        if isinstance(self.index, faiss.IndexIVF):
+            nprobe = min(self.index.nlist, int(math.ceil(self.index.nprobe * scale)))
+            distances, ids = self._selector_search(query, k, mask, faiss.SearchParametersIVF, nprobe=nprobe)
+        else:
+            ef = max(k, min(_EF_SEARCH_MAX, int(math.ceil(self.index.hnsw.efSearch * scale))))
+            distances, ids = self._selector_search(query, k, mask, faiss.SearchParametersHNSW, efSearch=ef)
+        short = (ids < 0).any(axis=1)
+        if short.any():
+            distances[short], ids[short] = self._exact_subset(query[short], k, mask)
+        return distances, ids
+
+    def _selector_search(self, query: np.ndarray, k: int, mask: np.ndarray, params_type,
+                         **params) -> Tuple[np.ndarray, np.ndarray]:
+        """Search with a bitmap selector, so only rows where `mask` is True are scored."""
+        bits = np.packbits(mask.astype(np.uint8), bitorder="little")
+        selector = faiss.IDSelectorBitmap(self.index.ntotal, faiss.swig_ptr(bits))
+        return self.index.search(query, k, params=params_type(sel=selector, **params))
+
+    def _exact_subset(self, query: np.ndarray, k: int, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force search over the stored vectors of the rows where `mask` is True."""
+        rows = np.flatnonzero(mask).astype("int64")
+        if isinstance(self.index, faiss.IndexIVF) and self.index.direct_map.type == faiss.DirectMap.NoMap:
+            self.index.make_direct_map()
+        flat = faiss.IndexFlatIP(self.dim) if self.metric == "cosine" else faiss.IndexFlatL2(self.dim)
+        flat.add(self.index.reconstruct_batch(rows))
+        distances, local = flat.search(query, k)
+        return distances, np.where(local >= 0, rows[np.maximum(local, 0)], -1)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self, directory: str, filename: str = "index.faiss"):
+        os.makedirs(directory, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(directory, filename))
+        config = {
+            "dim": self.dim,
+            "index_type": self.index_type,
+            "requested_type": self.requested_type,
+            "metric": self.metric,
+            "target_recall": self.target_recall,
+        }
+        with open(os.path.join(directory, _CONFIG_FILE), "w", encoding="utf-8") as f:
+            json.dump(config, f)
+
+    @classmethod
+    def load(cls, directory: str, filename: str = "index.faiss", mmap: bool = True) -> "VectorIndex":
+        path = os.path.join(directory, filename)
+        config = {}
+        config_path = os.path.join(directory, _CONFIG_FILE)
+        if os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+
+        index = None
+        if mmap:
+            try:
+                index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                index = None  # index type without mmap support
+        read_only = index is not None
+        if index is None:
+            index = faiss.read_index(path)
+
+        self = cls.__new__(cls)
+        self.dim = index.d
+        self.requested_type = config.get("requested_type", "auto")
+        self.metric = config.get("metric", "l2")
+        self.target_recall = config.get("target_recall", 0.95)
+        self.index_type = config.get("index_type", "flat")
+        self.index = index
+        self.read_only = read_only
+        self.index_path = path
+        return self
+
+    def _materialize(self):
+        """Replace a memory-mapped read-only index with a writable copy."""
+        if self.index_path:
+            self.index = faiss.read_index(self.index_path)
+        self.read_only = False
@@ -2,15 +2,16 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import pandas as pd
 import streamlit as st
 import asyncio
-from orchestrator.agent_manager import AgentManager
+import time
 from agents.excavator import ExcavatorAgent
 from agents.remote_excavator import RemoteExcavatorAgent
 from agents.historian import HistorianAgent
 from agents.narrator import NarratorAgent
-from memory.session_memory import SessionMemory
-from memory.long_term_memory import LongTermMemory
+from tools.commit_table import CommitTable
+from tools.embedding_cache import EmbeddingCache
 from tools.rag_tool import RAGTool
 
 
@@ -30,6 +31,96 @@ def load_repo(repo_path):
     return os.path.isdir(os.path.join(repo_path, ".git"))
 
 
+def stream_answer(result, question: str):
+    """Render the Narrator's answer to a question as it is generated."""
+    with st.spinner("🔎 Searching code context and history..."):
+        answer_stream = result["narrator"].answer_stream(
+            question,
+            excavation_data=result.get("excavation"),
+            historian_data=result.get("historian")
+        )
+    st.markdown("**Answer:**")
+    st.write_stream(answer_stream)
+
+
+def show_activity(activity):
+    """Charts for the Historian's activity summary."""
+    st.subheader("⏱️ Activity Over Time")
+    periods = activity["periods"]
+    velocity = activity["velocity"]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Commits / week (overall)", velocity["commits_per_week"])
+    with col2:
+        st.metric("Commits / week (last 90 days)", velocity["recent_commits_per_week"],
+                  delta=f"{velocity['trend_pct']}%" if "trend_pct" in velocity else None)
+    with col3:
+        st.metric("Active contributors (latest)", activity["contributors"]["active"][-1])
+
+    st.write(f"**Commits per {activity['freq']}:**")
+    st.line_chart(pd.DataFrame(
+        {"commits": activity["commits"], "rolling mean": activity["rolling_mean"]}, index=periods
+    ))
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**By commit type:**")
+        st.area_chart(pd.DataFrame(activity["by_type"], index=periods))
+    with col2:
+        st.write("**Contributors (active / joined / left):**")
+        st.line_chart(pd.DataFrame(activity["contributors"], index=periods))
+    if activity["by_directory"]:
+        st.write("**Top directories:**")
+        st.line_chart(pd.DataFrame(activity["by_directory"], index=periods))
+    for key, label in (("bursts", "Bursts"), ("lulls", "Lulls")):
+        if activity[key]:
+            st.caption(f"{label}: " + "; ".join(
+                f"{e['start']}" + (f" to {e['end']}" if e["end"] != e["start"] else "") + f" ({e['commits']} commits)"
+                for e in activity[key]
+            ))
+
+
+def show_ownership(ownership):
+    """Surviving lines per author and the owners of the largest directories."""
+    st.subheader("👥 Code Ownership")
+    st.caption("Who wrote the lines that exist today, from git blame.")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Surviving lines", ownership["total_lines"])
+    with col2:
+        st.metric("Files blamed", ownership["files"])
+    with col3:
+        st.metric("Bus factor", ownership["bus_factor"])
+    st.bar_chart(ownership["authors"])
+    st.dataframe([
+        {
+            "Directory": d["directory"],
+            "Lines": d["lines"],
+            "Main owner": next(iter(d["owners"])),
+            "Owner share": f"{d['owner_share']:.0%}",
+            "Authors": d["authors"],
+            "Bus factor": d["bus_factor"],
+        }
+        for d in ownership["directories"]
+    ])
+
+
+def show_coupling(engine, candidates: int = 500):
+    """Let the user pick a file and list the files most often changed with it."""
+    if engine is None or not len(engine):
+        return
+    st.subheader("🔗 Change Coupling")
+    paths = [h["path"] for h in engine.top_hotspots(candidates)]
+    path = st.selectbox("File", paths)
+    coupled = engine.coupled_files(path, 15)
+    if coupled:
+        st.dataframe([
+            {"File": c["path"], "Changed together": c["co_changes"], "Confidence": f"{c['confidence']:.0%}"}
+            for c in coupled
+        ])
+    else:
+        st.caption("No other file changes together with this one.")
+
+
 def main():
     st.set_page_config(page_title="Codebase Archaeologist", layout="wide")
 
@@ -102,58 +193,35 @@ def main():
             if is_git_url(repo_input):
                 with st.spinner(f"🔗 Connecting to remote repository {repo_input}..."):
                     # Initialize remote excavator (no cloning!)
-                    vector_store = RAGTool()
+                    vector_store = RAGTool(embedding_cache=EmbeddingCache())
                     excavator = RemoteExcavatorAgent(repo_input, vector_store=vector_store)
-                    historian = HistorianAgent(vector_store=vector_store)
-                    narrator = NarratorAgent(historian_agent=historian, vector_store=vector_store)
-                    
-                    # Note: Using simplified orchestration for remote repos
-                    with st.spinner("🔍 Analyzing commits remotely..."):
-                        excavation_data = excavator.run()
-                    
-                    with st.spinner("📜 Analyzing timeline..."):
-                        hist_output = historian.run(excavation_data)
-                    
-                    with st.spinner("📖 Generating narrative..."):
-                        narrative = narrator.generate_report({**excavation_data, **hist_output})
-                    
-                    result = {
-                        "excavation": excavation_data,
-                        "historian": hist_output,
-                        "narrative": narrative,
-                        "duration_seconds": 0,  # Not tracking for remote
-                        "vector_store": vector_store,
-                        "narrator": narrator
-                    }
             else:
                 # Local repo analysis
                 if not load_repo(repo_path):
                     st.error("❌ Invalid repository (no .git directory found)")
                     return
 
-                # Initialize memory and vector store
-                session_mem = SessionMemory()
-                long_term = LongTermMemory()
-                vector_store = RAGTool()
-
-                # Initialize agents
+                vector_store = RAGTool(embedding_cache=EmbeddingCache())
                 excavator = ExcavatorAgent(repo_path, vector_store=vector_store)
-                historian = HistorianAgent(vector_store=vector_store)
-                narrator = NarratorAgent(historian_agent=historian, vector_store=vector_store)
-
-                # Orchestrator
-                manager = AgentManager(
-                    excavator=excavator,
-                    historian=historian,
-                    narrator=narrator,
-                    session_memory=session_mem,
-                    long_term_memory=long_term
-                )
-
-                with st.spinner("🔍 Agents are analyzing the repository..."):
-                    result = manager.run_sequential()
-                    result["vector_store"] = vector_store
-                    result["narrator"] = narrator
+
+            historian = HistorianAgent(vector_store=vector_store)
+            narrator = NarratorAgent(historian_agent=historian, vector_store=vector_store)
+
+            start = time.time()
+            with st.spinner("🔍 Agents are analyzing the repository..."):
+                excavation_data = excavator.run()
+                # Statistics are ready now; the LLM summary streams in below
+                hist_output, timeline_stream = historian.run_stream(excavation_data)
+
+            result = {
+                "excavation": excavation_data,
+                "historian": hist_output,
+                "narrative": "",
+                "duration_seconds": 0,
+                "vector_store": vector_store,
+                "narrator": narrator,
+                "hotspot_engine": getattr(excavator, "hotspot_engine", None)
+            }
 
             st.success("✔ Analysis complete")
             st.session_state.analysis_result = result
@@ -220,9 +288,40 @@ def main():
                         for refactor in result["historian"]["refactor_events"]:
                             st.caption(refactor)
 
-            # Timeline Summary (LLM Analysis)
+            # Activity over time: binned series, bursts/lulls and contributor curves
+            if result["historian"].get("activity"):
+                show_activity(result["historian"]["activity"])
+
+            # Hotspots: decayed churn, ownership spread and change coupling
+            if result["historian"].get("hotspot_details"):
+                st.subheader("🔥 Hotspots")
+                details = result["historian"]["hotspot_details"]
+                st.bar_chart({d["path"]: d["churn"] for d in details})
+                st.dataframe([
+                    {
+                        "File": d["path"],
+                        "Decayed churn": d["churn"],
+                        "Commits": d["touches"],
+                        "Authors": d["authors"],
+                        "Author entropy (bits)": d["author_entropy"],
+                        "Often changed with": ", ".join(c["path"] for c in d.get("coupled_with", [])),
+                    }
+                    for d in details
+                ])
+
+            # Ownership: surviving lines per author and directory
+            if result["historian"].get("ownership", {}).get("total_lines"):
+                show_ownership(result["historian"]["ownership"])
+
+            # Timeline Summary (LLM Analysis), rendered as it is generated
             st.subheader("📜 Historical Analysis")
-            st.write(result["historian"]["timeline_summary"])
+            st.write_stream(timeline_stream)
+
+            st.subheader("📖 Project Narrative")
+            result["narrative"] = st.write_stream(
+                narrator.generate_report_stream({**result["excavation"], **result["historian"]})
+            )
+            result["duration_seconds"] = time.time() - start
 
             # Q&A Section
             st.subheader("❓ Ask Questions About This Code")
@@ -234,18 +333,16 @@ def main():
             )
             
             if question and st.button("🤖 Get Answer"):
-                with st.spinner("🔎 Searching code context and history..."):
-                    answer = result["narrator"].answer(
-                        question, 
-                        excavation_data=result.get("excavation"),
-                        historian_data=result.get("historian")
-                    )
-                st.info(f"**Answer:** {answer}")
+                stream_answer(result, question)
 
             # Full JSON for advanced users
             with st.expander("📋 Full Analysis JSON"):
                 # Remove non-serializable objects for JSON display
-                display_result = {k: v for k, v in result.items() if k not in ["vector_store", "narrator"]}
+                display_result = {k: v for k, v in result.items() if k not in ["vector_store", "narrator", "hotspot_engine"]}
+                commits = display_result["excavation"].get("commits")
+                if isinstance(commits, CommitTable):
+                    # Only a preview; the table itself is not JSON-serialisable
+                    display_result["excavation"] = {**display_result["excavation"], "commits": commits[:20].to_dicts()}
                 st.json(display_result)
 
         except Exception as e:
@@ -264,14 +361,9 @@ def main():
         )
         
         if question and st.button("🤖 Get Answer"):
-            result = st.session_state.analysis_result
-            with st.spinner("🔎 Searching code context and history..."):
-                answer = result["narrator"].answer(
-                    question,
-                    excavation_data=result.get("excavation"),
-                    historian_data=result.get("historian")
-                )
-            st.info(f"**Answer:** {answer}")
+            stream_answer(st.session_state.analysis_result, question)
+
+        show_coupling(st.session_state.analysis_result.get("hotspot_engine"))
 
 
 if __name__ == "__main__":